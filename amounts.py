@@ -0,0 +1,41 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# Every amount in the system is an integer number of minor units (cents).
+# Conversion happens only at the user-facing edges.
+DECIMALS = 2
+UNIT_SCALE = 10 ** DECIMALS
+ZAKAT_RATE_BPS = 250   # 2.5% in basis points
+
+
+def to_units(value):
+    """
+    Convert a user amount ("12.34", 12.34, Decimal) to integer minor units,
+    rounding half up at the last decimal place
+    """
+    try:
+        value = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {value!r}")
+    if not value.is_finite():
+        raise ValueError(f"Invalid amount: {value}")
+    return int((value * UNIT_SCALE).to_integral_value(ROUND_HALF_UP))
+
+
+def from_units(units):
+    """Minor units as a float, for charts and number inputs only"""
+    return units / UNIT_SCALE
+
+
+def format_amount(units):
+    """Exact decimal text for an amount in minor units"""
+    sign = "-" if units < 0 else ""
+    whole, fraction = divmod(abs(units), UNIT_SCALE)
+    return f"{sign}{whole}.{fraction:0{DECIMALS}d}"
+
+
+def calculate_zakat(units):
+    """
+    Zakat (2.5%) on an amount in minor units, rounded half up.
+    Works element-wise on NumPy int64 arrays as well.
+    """
+    return (units * ZAKAT_RATE_BPS + 5000) // 10000
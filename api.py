@@ -0,0 +1,303 @@
+"""
+Asynchronous HTTP/JSON API in front of BlockchainSystem, using only the
+standard library.
+
+    python api.py [port] [data_dir]
+
+All amounts are integer minor units (cents), as in amounts.py.
+
+    GET  /status                      chain height, mempool size, difficulty, block cache stats
+    POST /accounts                    {"name": "A", "balance": 10000[, "public_key": hex]}
+    GET  /accounts/<name>[?height=N]  balance, optionally as of block N
+    GET  /accounts/<name>/transactions[?limit=N&before=H:P]
+                                      confirmed transactions, newest first, paginated
+    POST /transactions                {"sender", "receiver", "amount", "fee"}, signed by this
+                                      node's wallet if the sender has a key; a client-signed
+                                      transaction adds "nonce", "timestamp" and "signature" (hex)
+    GET  /transactions/<hash>         where a confirmed transaction is, and its details
+    POST /transactions/batch          {"senders": [...], "receivers": [...], "amounts": [...]}
+    POST /mine                        mine the best pending transactions
+    GET  /blocks/<height>             block header and transactions
+    GET  /validate[?full=1]           chain validation and supply reconciliation
+    GET  /metrics                     counters, gauges and timings in Prometheus text format
+"""
+import asyncio, json, sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs, unquote
+from amounts import format_amount, calculate_zakat
+from transaction import Transaction
+from main import BlockchainSystem
+import metrics
+
+MAX_BODY = 16 * 1024 * 1024
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+def _units(value, name):
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f"'{name}' must be an integer number of minor units.")
+    return value
+
+
+class NodeAPI:
+    def __init__(self, system, executor_workers=2):
+        """
+        Serves a BlockchainSystem over HTTP/1.1 with keep-alive.
+
+        Requests are handled concurrently on one event loop. Anything that
+        changes state holds a single write lock so the system only ever sees
+        one writer. Admission, signature checks and validation run on a
+        thread pool while holding it, keeping the event loop free for
+        reads; mining holds it only to build the block and to connect it,
+        and searches the nonce on another thread in between, so neither
+        reads nor other writes wait for proof-of-work.
+        """
+        self.system = system
+        self.executor = ThreadPoolExecutor(max_workers=executor_workers)
+        self._lock = None
+        self._routes = {
+            ("GET", "status"): self.status,
+            ("POST", "accounts"): self.create_account,
+            ("GET", "accounts"): self.balance,
+            ("POST", "transactions"): self.create_transaction,
+            ("GET", "transactions"): self.transaction,
+            ("POST", "transactions/batch"): self.submit_batch,
+            ("POST", "mine"): self.mine,
+            ("GET", "blocks"): self.block,
+            ("GET", "validate"): self.validate,
+            ("GET", "metrics"): self.metrics,
+        }
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Start listening; returns the asyncio server"""
+        self._lock = asyncio.Lock()
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    async def _in_executor(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: self.system.collect(func, *args))
+
+    # ------------------------------------------------------------------ HTTP
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                parts = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = headers.get("content-length", "0")
+                keep_alive = False
+                if len(parts) != 3 or not length.isdigit():
+                    # The rest of the stream cannot be framed, so answer and hang up
+                    status, payload = 400, {"error": "Malformed request line or Content-Length."}
+                elif int(length) > MAX_BODY:
+                    status, payload = 413, {"error": "Request body too large."}
+                else:
+                    method, target, version = parts
+                    body = await reader.readexactly(int(length)) if int(length) else b""
+                    status, payload = await self.dispatch(method, target, body)
+                    keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+                if isinstance(payload, str):
+                    data, content_type = payload.encode(), "text/plain; version=0.0.4"
+                else:
+                    data, content_type = json.dumps(payload).encode(), "application/json"
+                head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                        f"Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\n")
+                if not keep_alive:
+                    head += "Connection: close\r\n"
+                writer.write(head.encode("latin-1") + b"\r\n" + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, body):
+        """Route one request; returns (status, JSON payload or plain text)"""
+        url = urlsplit(target)
+        path = url.path.strip("/")
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        resource, _, argument = path.partition("/")
+        handler = self._routes.get((method, path)) or self._routes.get((method, resource))
+        if handler is None:
+            known = any(key[1] in (path, resource) for key in self._routes)
+            return (405, {"error": f"{method} not allowed here."}) if known else (404, {"error": "Not found."})
+        try:
+            data = json.loads(body) if body else {}
+            if handler in (self.balance, self.block, self.transaction):
+                return await handler(unquote(argument), query)
+            return await handler(data, query)
+        except (KeyError, TypeError, ValueError) as e:
+            return 400, {"error": f"Bad request: {e}"}
+        except Exception as e:
+            return 500, {"error": str(e)}
+
+    # -------------------------------------------------------------- handlers
+
+    async def status(self, data, query):
+        chain = self.system.blockchain.chain
+        return 200, {
+            "height": len(chain) - 1,
+            "tip": chain[-1].hash,
+            "difficulty": self.system.blockchain.difficulty,
+            "validated_height": self.system.blockchain.validated_height,
+            "mempool": len(self.system.mempool),
+            "mempool_bytes": self.system.mempool.size_bytes,
+            "block_cache": chain.cache.stats() if hasattr(chain, "cache") else None,
+        }
+
+    async def create_account(self, data, query):
+        name, balance = str(data["name"]), _units(data["balance"], "balance")
+        public_key = str(data["public_key"]) if data.get("public_key") is not None else None
+        async with self._lock:
+            ok, messages = self.system.collect(self.system.create_account, name, balance, public_key)
+        return (200 if ok else 409), {"ok": ok, "messages": messages}
+
+    async def balance(self, name, query):
+        if name.endswith("/transactions"):
+            return await self.history(name[:-len("/transactions")], query)
+        if "height" in query:
+            height = int(query["height"])
+            async with self._lock:   # The history query shares the SQLite connection with commits
+                units = self.system.get_balance(name, height)
+        elif name in self.system.accounts:
+            height = None
+            units = self.system.get_balance(name)
+        else:
+            return 404, {"error": f"Account '{name}' does not exist."}
+        return 200, {"account": name, "height": height, "balance": units, "display": format_amount(units),
+                     "available": self.system.get_available_balance(name) if height is None else None}
+
+    async def history(self, name, query):
+        limit = min(int(query.get("limit", 50)), 1000)
+        before = tuple(int(part) for part in query["before"].split(":")) if "before" in query else None
+        if before is not None and len(before) != 2:
+            raise ValueError("'before' must be height:position.")
+        async with self._lock:   # Index queries share the SQLite connection with commits
+            page = self.system.account_history(name, limit, before)
+        items = [dict(tx.to_dict(), height=height, position=position)
+                 for height, position, tx in page]
+        cursor = f"{page[-1][0]}:{page[-1][1]}" if len(page) == limit else None
+        return 200, {"account": name, "transactions": items, "next": cursor}
+
+    async def transaction(self, tx_hash, query):
+        async with self._lock:
+            found = self.system.find_transaction(tx_hash)
+        if found is None:
+            return 404, {"error": f"No confirmed transaction {tx_hash}."}
+        height, position, tx = found
+        return 200, dict(tx.to_dict(), height=height, position=position)
+
+    async def create_transaction(self, data, query):
+        amount = _units(data["amount"], "amount")
+        fee = _units(data.get("fee", 0), "fee")
+        if "signature" in data:
+            tx = Transaction(str(data["sender"]), str(data["receiver"]), amount,
+                             zakat=calculate_zakat(amount), fee=fee, nonce=_units(data["nonce"], "nonce"),
+                             timestamp=float(data["timestamp"]), signature=bytes.fromhex(data["signature"]))
+            async with self._lock:
+                ok, _ = await self._in_executor(self.system.accept_transaction, tx)
+            if not ok:
+                return 400, {"ok": False, "messages": ["Transaction rejected (signature, nonce or balance)."]}
+            return 200, {"ok": True, "hash": tx.hash, "nonce": tx.nonce, "messages": []}
+        async with self._lock:
+            tx, messages = await self._in_executor(
+                self.system.create_transaction, str(data["sender"]), str(data["receiver"]), amount, fee)
+        if not tx:
+            return 400, {"ok": False, "messages": messages}
+        return 200, {"ok": True, "hash": tx.hash, "nonce": tx.nonce, "messages": messages}
+
+    async def submit_batch(self, data, query):
+        senders, receivers, amounts = data["senders"], data["receivers"], data["amounts"]
+        if not all(isinstance(column, list) for column in (senders, receivers, amounts)):
+            raise ValueError("senders, receivers and amounts must be lists.")
+        for amount in amounts:
+            _units(amount, "amounts")
+        async with self._lock:
+            report, _ = await self._in_executor(self.system.submit_batch, senders, receivers, amounts)
+        return 200, {"accepted": len(report.accepted), "rejected": len(report.failures),
+                     "failures": report.failures}
+
+    async def mine(self, data, query):
+        async with self._lock:
+            block, messages = self.system.collect(self.system.block_template)
+        ok = False
+        if block:
+            # On the loop's default executor, so proof-of-work never holds up
+            # the pool that locked writes wait on
+            stats = await asyncio.get_running_loop().run_in_executor(
+                None, self.system.blockchain.mine, block)
+            async with self._lock:
+                ok, connected = self.system.collect(self.system.connect_mined_block, block, stats)
+            messages += connected
+        chain = self.system.blockchain.chain
+        payload = {"ok": ok, "messages": messages}
+        if ok:
+            payload.update(height=len(chain) - 1, hash=chain[-1].hash, transactions=len(chain[-1].transactions))
+        return (200 if ok else 409), payload
+
+    async def block(self, argument, query):
+        chain = self.system.blockchain.chain
+        height = int(argument)
+        if not 0 <= height < len(chain):
+            return 404, {"error": f"No block at height {height}."}
+        return 200, dict(chain[height].to_dict(), height=height)
+
+    async def validate(self, data, query):
+        full = query.get("full", "0") not in ("0", "false", "")
+        async with self._lock:
+            (valid, supply), messages = await self._in_executor(
+                lambda: (self.system.blockchain.is_valid(full=full), self.system.reconcile_supply()))
+        return 200, {"valid": valid, "supply_conserved": supply, "messages": messages}
+
+    async def metrics(self, data, query):
+        return 200, metrics.render()
+
+
+async def serve(system, host="127.0.0.1", port=8080):
+    """Run the API until cancelled"""
+    api = NodeAPI(system)
+    server = await api.start(host, port)
+    print(f"Listening on http://{host}:{server.sockets[0].getsockname()[1]}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        api.close()
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    data_dir = sys.argv[2] if len(sys.argv) > 2 else None
+    system = BlockchainSystem(data_dir=data_dir)
+    metrics.enable()
+    metrics.dump_on_signal()
+    try:
+        asyncio.run(serve(system, port=port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if data_dir:
+            system.blockchain.chain.close()
+        system.accounts.close()
+        system.index.close()
+
+
+if __name__ == "__main__":
+    main()
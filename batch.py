@@ -0,0 +1,89 @@
+import numpy as np
+
+from amounts import calculate_zakat
+
+
+class BatchReport:
+    def __init__(self, size):
+        self.size = size
+        self.accepted = []   # Indices admitted, in order
+        self.failures = []   # (index, reason) pairs, in order
+
+    @property
+    def ok(self):
+        return not self.failures
+
+    def summary(self):
+        return f"{len(self.accepted)} of {self.size} transactions accepted, {len(self.failures)} rejected"
+
+
+def check_batch(accounts, senders, receivers, amounts, reserved=None):
+    """
+    Validate a batch of transfers against `accounts` with vectorized checks.
+    Amounts are integer minor units, so every sum below is exact.
+
+    A transfer needs the sender's balance, less funds already `reserved`
+    (a callable, e.g. Mempool.pending_debit) and less earlier transfers in
+    the batch, to cover amount + zakat; credits only land when mined. One
+    grouped cumulative sum finds each sender's first overdraft; transfers
+    before it are accepted as a block and only that sender's remaining
+    transfers are settled one by one, so the outcome matches submitting the
+    transfers one at a time in order.
+
+    Returns (report, zakat per transfer).
+    """
+    senders = np.asarray(senders, dtype=str)
+    receivers = np.asarray(receivers, dtype=str)
+    amounts = np.asarray(amounts)
+    if len(amounts) and amounts.dtype.kind not in "iu":
+        raise ValueError("amounts must be integer minor units.")
+    amounts = amounts.astype(np.int64, copy=False)
+    size = len(amounts)
+    if not len(senders) == len(receivers) == size:
+        raise ValueError("senders, receivers and amounts must have the same length.")
+    report = BatchReport(size)
+    zakat = calculate_zakat(amounts)
+    total = amounts + zakat
+
+    # Integer codes for every account named in the batch
+    names, codes = np.unique(np.concatenate([senders, receivers]), return_inverse=True)
+    names = names.tolist()
+    sender_codes, receiver_codes = codes[:size], codes[size:]
+    exists = np.array([name in accounts for name in names], dtype=bool)
+    available = np.array([accounts[name] - (reserved(name) if reserved else 0) if name in accounts else 0
+                          for name in names], dtype=np.int64)
+
+    reasons = np.full(size, "", dtype=object)
+    reasons[~(amounts > 0)] = "Invalid amount"
+    reasons[~exists[receiver_codes]] = "Receiver account does not exist"
+    reasons[~exists[sender_codes]] = "Sender account does not exist"
+    valid = np.flatnonzero(reasons == "")
+
+    # Each sender's running debit, in submission order
+    order = valid[np.lexsort((valid, sender_codes[valid]))]
+    group = sender_codes[order]
+    debit = total[order]
+    running = np.cumsum(debit)
+    group_start = np.flatnonzero(np.r_[True, group[1:] != group[:-1]]) if len(order) else order
+    group_end = np.r_[group_start[1:], len(order)].astype(int)
+    running -= np.repeat(running[group_start] - debit[group_start], group_end - group_start)
+    overdraft = running > available[group]
+
+    accepted = np.ones(len(order), dtype=bool)
+    for start, end in zip(group_start.tolist(), group_end.tolist()):
+        hits = np.flatnonzero(overdraft[start:end])
+        if not len(hits):
+            continue
+        # Settle this sender's transfers from its first overdraft onwards
+        first = start + int(hits[0])
+        remaining = int(available[group[start]]) - int(running[first] - debit[first])
+        for position, amount in enumerate(debit[first:end].tolist(), first):
+            if remaining < amount:
+                accepted[position] = False
+                reasons[order[position]] = "Insufficient balance"
+            else:
+                remaining -= amount
+
+    report.accepted = np.sort(order[accepted]).tolist()
+    report.failures = [(i, reasons[i]) for i in np.flatnonzero(reasons != "").tolist()]
+    return report, zakat
@@ -0,0 +1,76 @@
+"""
+Benchmark runner: times the core paths on synthetic workloads and writes
+the results as JSON, optionally comparing them with an earlier run.
+
+    python -m benchmarks [--size N] [--only case,...] [--output FILE]
+                         [--baseline FILE] [--threshold 0.10] [--no-memory]
+
+Exits with status 1 when any case is slower than the baseline by more than
+the threshold (a fraction of its throughput). The individual studies are
+still run as `python -m benchmarks.bench_<name>`.
+"""
+import argparse, json, multiprocessing, platform, sys, time
+from benchmarks.suite import CASES, measure, compare
+
+
+def _size(text):
+    size = int(text)
+    if size < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--size", type=_size, default=200, help="workload scale (default 200)")
+    parser.add_argument("--only", default="", help=f"comma-separated cases: {', '.join(CASES)}")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed throughput drop (default 0.10)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    args = parser.parse_args(argv)
+
+    names = [name for name in args.only.split(",") if name] or list(CASES)
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+
+    print(f"{'case':>18} {'ops':>6} {'ops/s':>11} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9} {'peak MB':>8}")
+    results = {}
+    for name in names:
+        result = measure(CASES[name], args.size, memory=not args.no_memory)
+        results[name] = result
+        peak = "-" if result["peak_mb"] is None else f"{result['peak_mb']:.1f}"
+        print(f"{name:>18} {result['ops']:6d} {result['ops_per_sec']:11,.1f} {result['p50_us']:9.1f} "
+              f"{result['p95_us']:9.1f} {result['p99_us']:9.1f} {peak:>8}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "created": time.time(),
+                "size": args.size,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": multiprocessing.cpu_count(),
+                "results": results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("size") != args.size:
+            print(f"Warning: baseline was run with --size {baseline.get('size')}, this run with {args.size}")
+        rows, regressions = compare(results, baseline["results"], args.threshold)
+        print(f"\n{'case':>18} {'baseline ops/s':>15} {'ops/s':>11} {'change':>8}")
+        for name, before, after, change in rows:
+            flag = "  SLOWER" if name in regressions else ""
+            print(f"{name:>18} {before:15,.1f} {after:11,.1f} {change:+8.1%}{flag}")
+        if regressions:
+            print(f"{len(regressions)} case(s) slower than the baseline by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Load generator for the HTTP API: concurrent keep-alive clients submit
+transfers (and read balances) while another client mines periodically.
+Reports p50/p99 latency per request type and accepted transactions per second.
+
+    python -m benchmarks.bench_api [clients] [requests per client] [difficulty]
+"""
+import asyncio, json, sys, threading, time
+from api import NodeAPI
+from main import BlockchainSystem
+
+ACCOUNTS = 100
+
+
+class _Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, port):
+        return cls(*await asyncio.open_connection("127.0.0.1", port))
+
+    async def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line == b"\r\n":
+                break
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        return status, json.loads(await self.reader.readexactly(length))
+
+    def close(self):
+        self.writer.close()
+
+
+def _start_server(system):
+    """Run the API on its own thread and event loop; returns (port, stop)"""
+    ready = threading.Event()
+    state = {}
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        api = NodeAPI(system)
+        state["server"] = loop.run_until_complete(api.start(port=0))
+        state["port"] = state["server"].sockets[0].getsockname()[1]
+        state["loop"] = loop
+        ready.set()
+        loop.run_forever()
+        # The clients have disconnected; let their handlers see EOF and finish
+        state["server"].close()
+        tasks = asyncio.all_tasks(loop)
+        if tasks:
+            loop.run_until_complete(asyncio.wait(tasks, timeout=5))
+        loop.close()
+        api.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    ready.wait()
+
+    def stop():
+        state["loop"].call_soon_threadsafe(state["loop"].stop)
+        thread.join()
+    return state["port"], stop
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+async def _load(port, clients, requests_per_client):
+    latencies = {"transfer": [], "balance": [], "mine": []}
+    accepted = 0
+    done = asyncio.Event()
+
+    async def sender(worker):
+        nonlocal accepted
+        client = await _Client.connect(port)
+        for i in range(requests_per_client):
+            account = (worker * requests_per_client + i) % ACCOUNTS
+            start = time.perf_counter()
+            if i % 10 == 9:
+                await client.request("GET", f"/accounts/account{account}")
+                latencies["balance"].append(time.perf_counter() - start)
+                continue
+            status, _ = await client.request("POST", "/transactions", {
+                "sender": f"account{account}", "receiver": f"account{(account + 1) % ACCOUNTS}",
+                "amount": 100, "fee": i % 7})
+            latencies["transfer"].append(time.perf_counter() - start)
+            accepted += status == 200
+        client.close()
+
+    async def miner():
+        client = await _Client.connect(port)
+        while not done.is_set():
+            await asyncio.sleep(0.05)
+            start = time.perf_counter()
+            await client.request("POST", "/mine")
+            latencies["mine"].append(time.perf_counter() - start)
+        client.close()
+
+    setup = await _Client.connect(port)
+    for i in range(ACCOUNTS):
+        await setup.request("POST", "/accounts", {"name": f"account{i}", "balance": 10_000_000})
+    setup.close()
+
+    mining = asyncio.ensure_future(miner())
+    start = time.perf_counter()
+    await asyncio.gather(*(sender(worker) for worker in range(clients)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await mining
+    return latencies, accepted, elapsed
+
+
+def run(clients=32, requests_per_client=200, difficulty=0):
+    system = BlockchainSystem(difficulty=difficulty)
+    port, stop = _start_server(system)
+    latencies, accepted, elapsed = asyncio.run(_load(port, clients, requests_per_client))
+    stop()
+
+    print(f"{clients} clients x {requests_per_client} requests, difficulty {difficulty}, "
+          f"{len(system.blockchain.chain) - 1} blocks mined")
+    print(f"{'request':>9} {'count':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for kind, samples in latencies.items():
+        print(f"{kind:>9} {len(samples):7d} {_percentile(samples, 0.5) * 1000:8.2f} {_percentile(samples, 0.99) * 1000:8.2f}")
+    print(f"accepted transactions: {accepted} in {elapsed:.2f}s ({accepted / elapsed:,.0f} tx/s)")
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,47 @@
+"""
+Bulk ingestion: create_transaction one at a time versus submit_batch,
+checking that both leave identical balances.
+
+    python -m benchmarks.bench_batch [transfers] [accounts]
+"""
+import contextlib, io, random, sys, time
+import batch   # Import NumPy up front so it is not timed
+from main import BlockchainSystem
+
+
+def _system(accounts):
+    system = BlockchainSystem()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(accounts):
+            system.create_account(f"account{i}", 100000)
+    return system
+
+
+def run(transfers=20000, accounts=200):
+    rng = random.Random(42)
+    senders = [f"account{rng.randrange(accounts)}" for _ in range(transfers)]
+    receivers = [f"account{rng.randrange(accounts)}" for _ in range(transfers)]
+    amounts = [rng.randint(100, 15000) for _ in range(transfers)]   # minor units
+
+    serial = _system(accounts)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        outcomes = [serial.create_transaction(s, r, a) for s, r, a in zip(senders, receivers, amounts)]
+    serial_time = time.perf_counter() - start
+
+    batched = _system(accounts)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = batched.submit_batch(senders, receivers, amounts)
+    batch_time = time.perf_counter() - start
+
+    same_outcome = [i for i, ok in enumerate(outcomes) if ok] == report.accepted
+    drift = max(abs(serial.mempool.pending_debit(name) - batched.mempool.pending_debit(name)) for name in serial.accounts)
+    print(f"{transfers} transfers over {accounts} accounts, {len(report.failures)} rejected")
+    print(f"create_transaction: {serial_time:.3f}s ({transfers / serial_time:,.0f} tx/s)")
+    print(f"submit_batch:       {batch_time:.3f}s ({transfers / batch_time:,.0f} tx/s)")
+    print(f"same accepted set: {same_outcome}, max reserved-funds difference: {drift}")
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,56 @@
+"""
+Reading blocks back from the block store: header-only walks with lazy
+versus eager body decoding, and repeated reads of a hot set of recent
+blocks through the decoded-block LRU cache at several sizes.
+
+    python -m benchmarks.bench_block_cache [blocks] [transactions per block]    (default 2000 200)
+"""
+import random, sys, tempfile, time
+from block import Block
+from storage import BlockStore
+from transaction import Transaction
+
+
+def run(blocks=2000, per_block=200):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BlockStore(tmp)
+        prev = "0"
+        for height in range(blocks):
+            txs = [Transaction(f"account{i}", f"account{i + 1}", 1000 + i, nonce=height) for i in range(per_block)]
+            block = Block(txs, prev, "0000")
+            store.append(block)
+            prev = block.hash
+        store.sync()
+        size = sum(len(store.read_raw(h)) for h in range(blocks))
+        print(f"{blocks} blocks of {per_block} transactions, {size / 1e6:.1f} MB serialized")
+
+        start = time.perf_counter()
+        eager = [Block.from_bytes(store.read_raw(h)).timestamp for h in range(blocks)]
+        eager_time = time.perf_counter() - start
+        start = time.perf_counter()
+        lazy = [Block.from_bytes(store.read_raw(h), lazy=True).timestamp for h in range(blocks)]
+        lazy_time = time.perf_counter() - start
+        assert eager == lazy
+        print(f"Header walk: eager {eager_time * 1000:.0f} ms, lazy {lazy_time * 1000:.0f} ms "
+              f"({eager_time / lazy_time:.0f}x)")
+
+        # 90% of reads go to the newest 5% of blocks, the rest anywhere
+        rng = random.Random(3)
+        hot = max(1, blocks // 20)
+        reads = [blocks - 1 - rng.randrange(hot) if rng.random() < 0.9 else rng.randrange(blocks)
+                 for _ in range(20_000)]
+        print(f"{'cache MB':>8} {'reads/s':>9} {'hit rate':>8}")
+        for cache_mb in (0, 1, 4, 16, 64):
+            reader = BlockStore(tmp, cache_bytes=cache_mb * 1024 * 1024)
+            start = time.perf_counter()
+            for height in reads:
+                reader[height].transactions
+            elapsed = time.perf_counter() - start
+            stats = reader.cache.stats()
+            print(f"{cache_mb:8d} {len(reads) / elapsed:9,.0f} {stats['hits'] / len(reads):8.0%}")
+            reader.close()
+        store.close()
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,56 @@
+"""
+Block execution throughput: serial apply versus independent account
+groups on worker processes, as blocks grow.
+
+    python -m benchmarks.bench_execution [max transactions] [accounts per group]    (default 200000 4)
+
+Senders pay receivers within small groups of accounts (a stand-in for
+traffic that is mostly local), so a block splits into many groups that
+share only the zakat and fee credits. Every parallel result is checked
+against the serial one.
+"""
+import multiprocessing, random, sys, time
+from transaction import Transaction
+from amounts import calculate_zakat
+from execution import BlockExecutor, access_groups, stage_serial
+
+ACCOUNTS = 10_000
+
+
+def _block(count, group_size, rng):
+    transactions = []
+    for _ in range(count):
+        base = rng.randrange(ACCOUNTS // group_size) * group_size
+        sender, receiver = rng.sample(range(base, base + group_size), 2)
+        amount = rng.randrange(100, 10_000)
+        transactions.append(Transaction(f"account{sender}", f"account{receiver}", amount,
+                                        zakat=calculate_zakat(amount), fee=rng.randrange(0, 50)))
+    return transactions
+
+
+def run(largest=200_000, group_size=4):
+    accounts = {f"account{i}": 10**12 for i in range(ACCOUNTS)}
+    rng = random.Random(11)
+    workers = sorted({2, multiprocessing.cpu_count()})
+    print(f"{ACCOUNTS} accounts in groups of {group_size}; {multiprocessing.cpu_count()} CPUs")
+    print(f"{'block':>7} {'groups':>6} {'serial tx/s':>12} " + " ".join(f"{f'{w} procs tx/s':>13}" for w in workers))
+
+    for count in [n for n in (1000, 10_000, 50_000, 200_000, 1_000_000) if n <= largest]:
+        transactions = _block(count, group_size, rng)
+        start = time.perf_counter()
+        expected = stage_serial(accounts, transactions)
+        serial = time.perf_counter() - start
+
+        rates = []
+        for w in workers:
+            executor = BlockExecutor(w, parallel_threshold=0)
+            start = time.perf_counter()
+            staged = executor.stage(accounts, transactions)
+            rates.append(count / (time.perf_counter() - start))
+            assert staged == expected, "parallel result differs from serial"
+        print(f"{count:7d} {len(access_groups(transactions)):6d} {count / serial:12,.0f} "
+              + " ".join(f"{rate:13,.0f}" for rate in rates))
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
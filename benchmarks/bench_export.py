@@ -0,0 +1,74 @@
+"""
+Chain export and import: file size against the old JSON export, export
+throughput, and import time with serial versus process-pool body checks.
+
+    python -m benchmarks.bench_export [blocks] [transactions per block]
+
+Import memory is reported as the peak traced allocation, which stays
+bounded by the verification window rather than the chain length.
+"""
+import contextlib, io, json, multiprocessing, os, random, sys, tempfile, time, tracemalloc
+from main import BlockchainSystem
+from chainfile import export_chain, import_chain
+
+ACCOUNTS = 50
+
+
+def _build(blocks, per_block, data_dir):
+    system = BlockchainSystem(data_dir=data_dir, block_max_txs=per_block)
+    for i in range(ACCOUNTS):
+        system.create_account(f"account{i}", 10_000_000_000)
+    rng = random.Random(3)
+    for _ in range(blocks):
+        for _ in range(per_block):
+            sender, receiver = rng.sample(range(ACCOUNTS), 2)
+            system.create_transaction(f"account{sender}", f"account{receiver}", rng.randint(100, 10000))
+        system.mine_block()
+    return system
+
+
+def _json_size(system):
+    return sum(len(json.dumps({"hash": block.hash, "prev_hash": block.prev_hash,
+                               "transactions": [tx.to_dict() for tx in block.transactions]}))
+               for block in system.blockchain.chain)
+
+
+def run(blocks=2000, per_block=50):
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        system = _build(blocks, per_block, os.path.join(tmp, "source"))
+        path = os.path.join(tmp, "chain.mbchain")
+        start = time.perf_counter()
+        with open(path, "wb") as out:
+            export_chain(system, out)
+        export_time = time.perf_counter() - start
+        size = os.path.getsize(path)
+        raw = sum(len(system.blockchain.chain.read_raw(h)) for h in range(len(system.blockchain.chain)))
+        json_size = _json_size(system)
+
+        imports = []
+        for workers in sorted({1, multiprocessing.cpu_count()}):
+            tracemalloc.start()
+            start = time.perf_counter()
+            imported = import_chain(path, data_dir=os.path.join(tmp, f"import{workers}"), workers=workers)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            assert dict(imported.accounts) == dict(system.accounts)
+            imported.blockchain.chain.close()
+            imported.accounts.close()
+            imported.index.close()
+            imports.append((workers, elapsed, peak))
+        system.blockchain.chain.close()
+        system.accounts.close()
+        system.index.close()
+
+    print(f"Chain: {blocks} blocks x {per_block} transactions")
+    print(f"Export file {size / 1e6:.2f} MB (raw blocks {raw / 1e6:.2f} MB, JSON {json_size / 1e6:.2f} MB), "
+          f"written at {raw / export_time / 1e6:.1f} MB/s")
+    print(f"{'workers':>7} {'import s':>9} {'blocks/s':>9} {'peak MB':>8}")
+    for workers, elapsed, peak in imports:
+        print(f"{workers:7d} {elapsed:9.2f} {blocks / elapsed:9,.0f} {peak / 1e6:8.1f}")
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
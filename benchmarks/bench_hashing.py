@@ -0,0 +1,47 @@
+"""
+Per-nonce hashing cost: legacy string concatenation versus the
+canonical header with a precomputed SHA-256 midstate.
+
+    python -m benchmarks.bench_hashing [nonces]
+"""
+import hashlib, json, sys, time
+from block import Block, NONCE
+from transaction import Transaction
+
+
+def _legacy_hash(block, transactions_str, nonce):
+    block_string = transactions_str + str(block.timestamp) + str(block.roll_no) + str(block.prev_hash) + str(block.difficulty) + str(nonce)
+    return hashlib.sha256(block_string.encode()).hexdigest()
+
+
+def _time_legacy(block, nonces):
+    # The old blocks carried this JSON text as their transactions
+    transactions_str = json.dumps([tx.to_dict() for tx in block.transactions], indent=2)
+    start = time.perf_counter()
+    for nonce in range(nonces):
+        _legacy_hash(block, transactions_str, nonce)
+    return time.perf_counter() - start
+
+
+def _time_midstate(block, nonces):
+    start = time.perf_counter()
+    midstate = block.midstate()
+    for nonce in range(nonces):
+        sha = midstate.copy()
+        sha.update(NONCE.pack(nonce))
+        sha.hexdigest()
+    return time.perf_counter() - start
+
+
+def run(nonces=20000):
+    print(f"{'txs':>7} {'legacy us/hash':>15} {'midstate us/hash':>17} {'speedup':>8}")
+    for tx_count in (1, 10, 100, 1000, 10000):
+        transactions = [Transaction(f"A{i}", f"B{i}", 1000, zakat=25) for i in range(tx_count)]
+        block = Block(transactions=transactions, prev_hash="0", roll_no="0000")
+        legacy = _time_legacy(block, nonces)
+        midstate = _time_midstate(block, nonces)
+        print(f"{tx_count:7d} {legacy / nonces * 1e6:15.2f} {midstate / nonces * 1e6:17.2f} {legacy / midstate:7.1f}x")
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,41 @@
+"""
+Mempool operation cost as the pool grows: admission (with eviction once
+full) and block selection should stay roughly logarithmic.
+
+    python -m benchmarks.bench_mempool [sizes...]    (default 1000 10000 100000)
+"""
+import random, sys, time
+from mempool import Mempool
+from transaction import Transaction
+
+
+def run(sizes=(1000, 10000, 100000)):
+    rng = random.Random(7)
+    print(f"{'pool txs':>9} {'add us/op':>10} {'evicting add us/op':>19} {'pop_block us/tx':>16}")
+    for size in sizes:
+        transactions = [Transaction(f"sender{i % 500}", "receiver", 100, fee=rng.randrange(100), nonce=i // 500)
+                        for i in range(size * 2)]
+        probe = len(transactions[0].serialize())
+        pool = Mempool(max_bytes=sum(len(tx.serialize()) for tx in transactions[:size]))
+
+        start = time.perf_counter()
+        for tx in transactions[:size]:
+            pool.add(tx)
+        add_time = (time.perf_counter() - start) / size
+
+        start = time.perf_counter()
+        for tx in transactions[size:]:
+            try:
+                pool.add(tx)
+            except Exception:
+                pass   # Refused: fee too low for a full pool
+        evict_time = (time.perf_counter() - start) / size
+
+        start = time.perf_counter()
+        selected = pool.pop_block(max_bytes=probe * 1000)
+        pop_time = (time.perf_counter() - start) / max(len(selected), 1)
+        print(f"{size:9d} {add_time * 1e6:10.2f} {evict_time * 1e6:19.2f} {pop_time * 1e6:16.2f}")
+
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or (1000, 10000, 100000))
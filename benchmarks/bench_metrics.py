@@ -0,0 +1,51 @@
+"""
+Overhead of the metrics layer: a timed call and a counter increment with
+metrics disabled and enabled, against an uninstrumented call, and the
+effect on transaction admission.
+
+    python -m benchmarks.bench_metrics [calls]    (default 1000000)
+"""
+import contextlib, io, sys, time
+import metrics
+from main import BlockchainSystem
+
+
+def _plain(x):
+    return x
+
+
+_timed = metrics.timed("bench_call_seconds")(_plain)
+_counter = metrics.counter("bench_calls_total")
+
+
+def _per_call(func, calls):
+    start = time.perf_counter()
+    for i in range(calls):
+        func(i)
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def _admission(transfers):
+    system = BlockchainSystem(mempool_bytes=1 << 30)
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink):
+        system.create_account("A", 10**12)
+        system.create_account("B", 10**12)
+        start = time.perf_counter()
+        for i in range(transfers):
+            system.create_transaction("A", "B", 100 + i)
+    return transfers / (time.perf_counter() - start)
+
+
+def run(calls=1_000_000):
+    print(f"{'':>10} {'call ns':>8} {'timed ns':>9} {'counter ns':>11} {'admission tx/s':>15}")
+    for on in (False, True):
+        metrics.enable(on)
+        print(f"{'enabled' if on else 'disabled':>10} {_per_call(_plain, calls):8.0f} "
+              f"{_per_call(_timed, calls):9.0f} {_per_call(_counter.inc, calls):11.0f} "
+              f"{_admission(calls // 50):15,.0f}")
+    metrics.enable(False)
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
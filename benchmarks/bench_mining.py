@@ -0,0 +1,28 @@
+"""
+Proof-of-work throughput versus worker count.
+
+    python -m benchmarks.bench_mining [difficulty] [blocks]
+"""
+import multiprocessing, sys
+from block import Block
+from miner import ParallelMiner
+from transaction import Transaction
+
+
+def run(difficulty=18, blocks=3):
+    print(f"Mining {blocks} blocks at difficulty {difficulty} bits")
+    for workers in range(1, multiprocessing.cpu_count() + 1):
+        miner = ParallelMiner(workers)
+        per_worker = [0.0] * workers
+        for i in range(blocks):
+            block = Block(transactions=[Transaction("bench", f"account{i}", 100 + i)], prev_hash="0",
+                          roll_no="0000", difficulty=difficulty)
+            for stats in miner.mine(block):
+                per_worker[stats['worker']] += stats['hash_rate'] / blocks
+        rates = ", ".join(f"{rate:,.0f}" for rate in per_worker)
+        print(f"workers={workers:2d}  total={sum(per_worker):12,.0f} H/s  per-worker=[{rates}]")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    run(*args)
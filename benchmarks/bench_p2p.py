@@ -0,0 +1,107 @@
+"""
+Gossip between local nodes: how long a mined block takes to reach every
+node, and how fast a fresh node syncs a chain from its peers in parallel.
+
+    python -m benchmarks.bench_p2p [blocks to sync] [transactions per block]
+
+Every node runs in this process on its own localhost port.
+"""
+import asyncio, contextlib, io, random, sys, time
+from block import Block
+from main import BlockchainSystem
+from p2p import Node
+
+ACCOUNTS = 20
+NODE_COUNTS = (2, 4, 8, 16)
+
+
+def _system(genesis):
+    system = BlockchainSystem(genesis=genesis)
+    for i in range(ACCOUNTS):
+        system.create_account(f"account{i}", 10_000_000)
+    return system
+
+
+def _build_chain(genesis, blocks, per_block):
+    """Mine a chain offline once so every run syncs the same blocks"""
+    seed = _system(genesis)
+    rng = random.Random(5)
+    for _ in range(blocks):
+        for _ in range(per_block):
+            sender, receiver = rng.sample(range(ACCOUNTS), 2)
+            seed.create_transaction(f"account{sender}", f"account{receiver}", rng.randint(100, 10000))
+        seed.mine_block()
+    return list(seed.blockchain.chain)[1:]
+
+
+async def _network(genesis, count, chain=()):
+    """
+    Start `count` nodes already holding `chain`; each links to its
+    predecessor and one random earlier node
+    """
+    systems = [_system(genesis) for _ in range(count)]
+    for system in systems:
+        for block in chain:
+            system.accept_block(block)
+    nodes = [Node(system) for system in systems]
+    for node in nodes:
+        await node.start()
+    rng = random.Random(count)
+    for i in range(1, count):
+        for j in {i - 1, rng.randrange(i)}:
+            await nodes[i].connect("127.0.0.1", nodes[j].port)
+    return nodes
+
+
+async def _propagation(genesis, count, rounds=10):
+    nodes = await _network(genesis, count)
+    rng = random.Random(1)
+    latencies = []
+    for _ in range(rounds):
+        origin = rng.choice(nodes)
+        sender, receiver = rng.sample(range(ACCOUNTS), 2)
+        await origin.create_transaction(f"account{sender}", f"account{receiver}", 500)
+        block = await origin.mine_block()
+        start = time.perf_counter()
+        await asyncio.gather(*(node.wait_for_block(block.hash) for node in nodes))
+        latencies.append(time.perf_counter() - start)
+    for node in nodes:
+        await node.close()
+    return sum(latencies) / len(latencies), max(latencies)
+
+
+async def _sync(genesis, count, chain):
+    sources = await _network(genesis, count - 1, chain)
+    fresh = Node(_system(genesis))
+    await fresh.start()
+    for node in sources:
+        await fresh.connect("127.0.0.1", node.port)
+    start = time.perf_counter()
+    await fresh.sync()
+    elapsed = time.perf_counter() - start
+    synced = fresh.height
+    for node in sources + [fresh]:
+        await node.close()
+    return synced, elapsed
+
+
+def run(blocks=500, per_block=20):
+    genesis = Block(transactions=[], prev_hash="0", roll_no="0000")
+    results = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        chain = _build_chain(genesis, blocks, per_block)
+        size = sum(len(block.serialize()) for block in chain)
+        for count in NODE_COUNTS:
+            mean, worst = asyncio.run(_propagation(genesis, count))
+            synced, elapsed = asyncio.run(_sync(genesis, count, chain))
+            results.append((count, mean, worst, synced, elapsed))
+
+    print(f"Sync chain: {blocks} blocks x {per_block} transactions ({size / 1e6:.1f} MB)")
+    print(f"{'nodes':>5} {'propagation ms':>15} {'worst ms':>9} {'synced':>7} {'blocks/s':>9} {'MB/s':>6}")
+    for count, mean, worst, synced, elapsed in results:
+        print(f"{count:5d} {mean * 1000:15.2f} {worst * 1000:9.2f} {synced:7d} "
+              f"{synced / elapsed:9,.0f} {size / elapsed / 1e6:6.1f}")
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
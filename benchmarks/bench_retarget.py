@@ -0,0 +1,60 @@
+"""
+Difficulty retargeting on a simulated network: block times are drawn from
+the exponential distribution that proof-of-work produces, the hash rate
+jumps up and then drops mid-run, and the mean interval per phase shows the
+difficulty pulling block times back to the target. Also times the
+incremental window update against rescanning the window per block.
+
+    python -m benchmarks.bench_retarget [blocks per phase] [window]    (default 2000 60)
+"""
+import math, random, sys, time
+from retarget import Retargeter
+
+TARGET = 10.0                          # Seconds between blocks
+PHASES = ((1e5, "base"), (8e5, "8x hash rate"), (5e4, "1/2 hash rate"))
+
+
+def _rescan(tail, target, current):
+    """Next difficulty recomputed from every (timestamp, difficulty) in the window"""
+    if len(tail) < 2:
+        return current
+    work = sum(1 << d for _, d in tail[1:])
+    rate = work / max(tail[-1][0] - tail[0][0], 1e-3)
+    return max(current - 2, min(current + 2, round(math.log2(max(rate * target, 1)))))
+
+
+def run(per_phase=2000, window=60):
+    rng = random.Random(5)
+    rules = Retargeter(TARGET, window)
+    difficulty = round(math.log2(PHASES[0][0] * TARGET))
+    now = 0.0
+    blocks = []
+    print(f"Target {TARGET:.0f} s, window {window} blocks")
+    print(f"{'phase':>14} {'mean s':>7} {'last 25% s':>10} {'difficulty':>10}")
+    for hash_rate, label in PHASES:
+        intervals = []
+        for _ in range(per_phase):
+            interval = rng.expovariate(hash_rate / (1 << difficulty))
+            now += interval
+            intervals.append(interval)
+            blocks.append((now, difficulty))
+            rules.push(now, difficulty)
+            difficulty = rules.next_difficulty(difficulty)
+        tail = intervals[-len(intervals) // 4:]
+        print(f"{label:>14} {sum(intervals) / len(intervals):7.1f} {sum(tail) / len(tail):10.1f} {difficulty:10d}")
+
+    start = time.perf_counter()
+    replay = Retargeter(TARGET, window)
+    for timestamp, d in blocks:
+        replay.push(timestamp, d)
+        replay.next_difficulty(d)
+    incremental = (time.perf_counter() - start) / len(blocks)
+    start = time.perf_counter()
+    for i in range(1, len(blocks) + 1):
+        _rescan(blocks[max(0, i - window):i], TARGET, blocks[i - 1][1])
+    rescan = (time.perf_counter() - start) / len(blocks)
+    print(f"Per block: incremental {incremental * 1e6:.1f} us, rescanning the window {rescan * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
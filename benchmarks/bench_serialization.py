@@ -0,0 +1,49 @@
+"""
+Block body size and encode/decode time: the old json.dumps(indent=2) of
+preformatted string dicts versus packed Transaction records.
+
+    python -m benchmarks.bench_serialization [transactions]
+"""
+import json, sys, time
+from block import Block
+from transaction import Transaction
+from amounts import calculate_zakat
+
+
+def _legacy_entries(transactions):
+    return [{
+        'main_transaction': f"{tx.sender} -> {tx.receiver}: {tx.amount}",
+        'zakat_transaction': f"{tx.sender} -> ZAKAT_FUND: {tx.zakat}",
+        'total_deducted': tx.total_deducted,
+        'timestamp': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(tx.timestamp))
+    } for tx in transactions]
+
+
+def _timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(tx_count=10000):
+    transactions = [Transaction(f"account{i % 50}", f"account{(i + 1) % 50}", 1000 + i, zakat=calculate_zakat(1000 + i), nonce=i)
+                    for i in range(tx_count)]
+    block = Block(transactions=transactions, prev_hash="0", roll_no="0000")
+    legacy = _legacy_entries(transactions)
+
+    json_encode, json_blob = _timed(lambda: json.dumps(legacy, indent=2))
+    json_decode, _ = _timed(lambda: json.loads(json_blob))
+    packed_encode, packed_blob = _timed(block.serialize)
+    packed_decode, _ = _timed(lambda: Block.from_bytes(packed_blob))
+
+    print(f"{tx_count} transactions")
+    print(f"{'format':>8} {'bytes':>12} {'encode ms':>10} {'decode ms':>10}")
+    print(f"{'json':>8} {len(json_blob.encode()):12,d} {json_encode * 1000:10.2f} {json_decode * 1000:10.2f}")
+    print(f"{'packed':>8} {len(packed_blob):12,d} {packed_encode * 1000:10.2f} {packed_decode * 1000:10.2f}")
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
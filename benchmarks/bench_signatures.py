@@ -0,0 +1,58 @@
+"""
+Cost of transaction authentication: Ed25519 signing, block signature
+checks serial versus on a process pool, and the verification cache that
+lets transactions checked on mempool admission skip re-verification.
+
+    python -m benchmarks.bench_signatures [transactions]    (default 20000)
+
+Requires the optional `cryptography` package.
+"""
+import multiprocessing, sys, time
+from transaction import Transaction
+from signing import generate_keypair, sign, SignatureVerifier
+
+ACCOUNTS = 100
+
+
+def _signed(count):
+    keys = [generate_keypair() for _ in range(ACCOUNTS)]
+    items = []
+    start = time.perf_counter()
+    for i in range(count):
+        private_key, public_key = keys[i % ACCOUNTS]
+        tx = Transaction(f"account{i % ACCOUNTS}", f"account{(i + 1) % ACCOUNTS}", 1000 + i, nonce=i // ACCOUNTS)
+        items.append((sign(tx, private_key), public_key))
+    return items, time.perf_counter() - start
+
+
+def _timed_check(verifier, items):
+    start = time.perf_counter()
+    assert verifier.check_all(items) == -1
+    return time.perf_counter() - start
+
+
+def run(count=20000):
+    items, signing_time = _signed(count)
+    print(f"{count} transactions from {ACCOUNTS} accounts")
+    print(f"Signing: {count / signing_time:,.0f} tx/s")
+
+    print(f"{'workers':>7} {'verify s':>9} {'tx/s':>9} {'cached s':>9}")
+    for workers in sorted({1, 2, multiprocessing.cpu_count()}):
+        verifier = SignatureVerifier(workers, parallel_threshold=0)
+        cold = _timed_check(verifier, items)
+        warm = _timed_check(verifier, items)
+        print(f"{workers:7d} {cold:9.3f} {count / cold:9,.0f} {warm:9.4f}")
+
+    # Mempool admission checks one transaction at a time; the block then hits the cache
+    verifier = SignatureVerifier(1)
+    start = time.perf_counter()
+    for tx, public_key in items:
+        verifier.check(tx, public_key)
+    admission = time.perf_counter() - start
+    block = _timed_check(verifier, items)
+    print(f"Admission one by one: {admission:.3f} s; block check afterwards: {block * 1000:.1f} ms "
+          f"({verifier.hits} cache hits)")
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,107 @@
+"""
+Startup cost of the CLI in main.py and of the Streamlit app, each measured
+in fresh interpreters against a stored chain: module import, opening the
+chain (with the blocks read from disk) next to decoding every block, and
+the app's first page render.
+
+    python -m benchmarks.bench_startup [blocks] [repeats]    (default 2000 5)
+"""
+import contextlib, io, json, os, statistics, subprocess, sys, tempfile, time
+from main import BlockchainSystem
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child before the measured code. `count_reads()` hooks the
+# block store so the blocks read from disk are counted; cases that open a
+# chain call it once their imports are done.
+PRELUDE = """
+import json, sys, time
+reads = []
+def count_reads():
+    import storage
+    read_raw = storage.BlockStore.read_raw
+    storage.BlockStore.read_raw = lambda self, height: reads.append(height) or read_raw(self, height)
+data_dir = sys.argv[1]
+start = time.perf_counter()
+"""
+
+CASES = {
+    "cli import": "import main",
+    "cli open": """
+import main
+count_reads()
+start = time.perf_counter()
+system = main.BlockchainSystem("3669", data_dir=data_dir)
+system.blockchain.chain[-1].hash
+""",
+    "cli full load": """
+import main
+count_reads()
+start = time.perf_counter()
+system = main.BlockchainSystem("3669", data_dir=data_dir)
+for block in system.blockchain.chain:
+    block.transactions
+""",
+    "app import": "import streamlit_app",
+    # Includes importing the app; the test harness is loaded beforehand
+    "app first render": """
+from streamlit.testing.v1 import AppTest
+count_reads()
+sys.argv = ["streamlit_app.py", data_dir]
+app = AppTest.from_file("streamlit_app.py", default_timeout=120)
+start = time.perf_counter()
+app.run()
+assert not app.exception, app.exception
+""",
+}
+
+
+def _build(data_dir, blocks):
+    with contextlib.redirect_stdout(io.StringIO()):
+        system = BlockchainSystem("3669", data_dir=data_dir)
+        for i in range(20):
+            system.create_account(f"acct{i}", 10**9)
+        for b in range(blocks):
+            system.create_transaction(f"acct{b % 20}", f"acct{(b + 1) % 20}", 100 + b)
+            system.mine_block()
+    system.blockchain.chain.close()
+    system.accounts.close()
+    system.index.close()
+
+
+def _child(code, data_dir):
+    script = PRELUDE + code + """
+print(json.dumps([time.perf_counter() - start, len(reads), "pandas" in sys.modules]))
+"""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    start = time.perf_counter()
+    done = subprocess.run([sys.executable, "-c", script, data_dir], cwd=ROOT, env=env,
+                          capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if done.returncode:
+        raise Exception(done.stderr.strip().splitlines()[-1])
+    seconds, reads, pandas = json.loads(done.stdout.strip().splitlines()[-1])
+    return wall, seconds, reads, pandas
+
+
+def run(blocks=2000, repeats=5):
+    with tempfile.TemporaryDirectory() as data_dir:
+        _build(data_dir, blocks)
+        print(f"{blocks} stored blocks, median of {repeats} fresh processes")
+        print(f"{'':>17} {'process ms':>11} {'measured ms':>12} {'blocks read':>12} {'pandas':>7}")
+        for name, code in CASES.items():
+            if name.startswith("app"):
+                try:
+                    import streamlit   # noqa: F401
+                except ImportError:
+                    print(f"{name:>17}  skipped (streamlit not installed)")
+                    continue
+            samples = [_child(code, data_dir) for _ in range(repeats)]
+            wall = statistics.median(s[0] for s in samples) * 1e3
+            seconds = statistics.median(s[1] for s in samples) * 1e3
+            _, _, reads, pandas = samples[-1]
+            print(f"{name:>17} {wall:11.1f} {seconds:12.1f} {reads:12} {'yes' if pandas else 'no':>7}")
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
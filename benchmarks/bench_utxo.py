@@ -0,0 +1,64 @@
+"""
+UTXO ledger: building a large coin set through the write-back cache
+onto the on-disk hash table, random lookups, and block checks with
+sequential versus concurrent per-transaction validation.
+
+    python -m benchmarks.bench_utxo [coins] [transactions per block]    (default 1000000 2000)
+
+Peak resident memory shows the cache bound holding while the table grows;
+the table itself is paged in and out by the OS through mmap.
+"""
+import os, random, resource, sys, tempfile, time
+from utxo import UTXOLedger
+
+ACCOUNTS = 1000
+CACHE = 50_000
+
+
+def run(coins=1_000_000, per_block=2000):
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = UTXOLedger(tmp, max_cached=CACHE)
+        rng = random.Random(7)
+        kept = set(rng.sample(range(coins), min(100_000, coins)))   # Only these outpoints are remembered
+        keys = {}
+        start = time.perf_counter()
+        for i in range(coins):
+            key = ledger.mint(f"account{i % ACCOUNTS}", 1_000 + i % 5000)
+            if i in kept:
+                keys[i] = key
+        ledger.flush()
+        build = time.perf_counter() - start
+        size = os.path.getsize(os.path.join(tmp, "utxo.dat"))
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{coins:,} coins minted in {build:.1f} s ({coins / build:,.0f}/s); "
+              f"table {size / 1e6:.0f} MB, cache {CACHE:,} entries, peak RSS {peak:.0f} MB")
+
+        sample = list(keys.values())
+        start = time.perf_counter()
+        for key in sample:
+            ledger.coins.peek(key)
+        lookup = time.perf_counter() - start
+        print(f"Random lookups: {len(sample) / lookup:,.0f}/s")
+
+        # One block spending random coins, each to a random receiver
+        spends = rng.sample(sorted(keys), per_block)
+        transactions = [ledger.transfer(f"account{i % ACCOUNTS}", [keys[i]], f"account{(i + 1) % ACCOUNTS}", 500)
+                        for i in spends]
+        print(f"{'workers':>7} {'check ms':>9} {'tx/s':>9}")
+        for workers in (1, 2, 4, 8):
+            ledger.workers = workers
+            start = time.perf_counter()
+            ledger.check_block(transactions)
+            elapsed = time.perf_counter() - start
+            print(f"{workers:7d} {elapsed * 1000:9.1f} {per_block / elapsed:9,.0f}")
+
+        start = time.perf_counter()
+        ledger.apply_block(transactions, 1)
+        ledger.flush()
+        print(f"Apply + flush: {(time.perf_counter() - start) * 1000:.1f} ms; "
+              f"{len(ledger.coins):,} unspent coins")
+        ledger.close()
+
+
+if __name__ == "__main__":
+    run(*[int(a) for a in sys.argv[1:]])
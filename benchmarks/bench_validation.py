@@ -0,0 +1,45 @@
+"""
+Chain validation cost: incremental checkpointed check versus full audits
+(serial and process-pool) on synthetic chains.
+
+    python -m benchmarks.bench_validation [heights...]    (default 10000 100000 1000000)
+"""
+import multiprocessing, sys, time
+from block import Block
+from miner import Blockchain
+from transaction import Transaction
+from amounts import calculate_zakat
+
+
+def build_chain(height):
+    """Synthetic difficulty-0 chain with one small transaction per block"""
+    blockchain = Blockchain("0000")
+    for i in range(height):
+        prev = blockchain.chain[-1]
+        tx = Transaction("A", "B", i, zakat=calculate_zakat(i), nonce=i)
+        blockchain.chain.append(Block(transactions=[tx], prev_hash=prev.hash, roll_no="0000"))
+    return blockchain
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def run(heights=(10000, 100000, 1000000)):
+    workers = multiprocessing.cpu_count()
+    print(f"{'blocks':>9} {'first check s':>14} {'incremental ms':>15} {'audit x1 s':>11} {'audit x' + str(workers) + ' s':>11}")
+    for height in heights:
+        blockchain = build_chain(height)
+        first, ok = _timed(blockchain.is_valid)
+        assert ok
+        blockchain.add_block([Transaction("A", "B", 100, zakat=3, nonce=height)], "0000")
+        incremental, _ = _timed(blockchain.is_valid)
+        serial, _ = _timed(lambda: blockchain.audit(workers=1))
+        parallel, _ = _timed(lambda: blockchain.audit(workers=workers))
+        print(f"{height:9d} {first:14.2f} {incremental * 1000:15.3f} {serial:11.2f} {parallel:11.2f}")
+
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or (10000, 100000, 1000000))
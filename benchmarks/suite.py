@@ -0,0 +1,152 @@
+"""
+Benchmark cases for the regression runner (`python -m benchmarks`).
+
+Each case builds its synthetic workload from `size` and returns
+(op, count): `op(i)` performs one unit of work and is timed on its own,
+which gives both throughput and latency percentiles. Every case runs at
+least one timed op, however small `size` is.
+"""
+import contextlib, io, random, time, tracemalloc
+from block import Block
+from miner import Blockchain
+from main import BlockchainSystem
+from transaction import Transaction
+from amounts import calculate_zakat
+
+
+def _transactions(count, accounts=100, seed=0):
+    rng = random.Random(seed)
+    txs = []
+    for i in range(count):
+        amount = rng.randrange(100, 10_000)
+        txs.append(Transaction(f"account{i % accounts}", f"account{(i + 1) % accounts}", amount,
+                               zakat=calculate_zakat(amount), nonce=i // accounts))
+    return txs
+
+
+def _system(accounts=100, **options):
+    system = BlockchainSystem(mempool_bytes=1 << 30, **options)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(accounts):
+            system.create_account(f"account{i}", 10**12)
+    return system
+
+
+def block_hash(size):
+    """Block.compute_hash over a block of 100 transactions, one nonce per op"""
+    block = Block(_transactions(100), "0", "0000")
+    return (lambda i: block.compute_hash(i)), max(size * 20, 1)
+
+
+def add_block(size):
+    """Blockchain.add_block of a 50-transaction block at difficulty 0"""
+    chain = Blockchain()
+    txs = _transactions(50)
+    return (lambda i: chain.add_block(txs, "0000")), max(size // 5, 1)
+
+
+def is_valid(size):
+    """Blockchain.is_valid re-checking a chain of `size` blocks from genesis"""
+    chain = Blockchain()
+    txs = _transactions(10)
+    for _ in range(size):
+        chain.add_block(txs, "0000")
+
+    def op(i):
+        chain._checkpoint(0)
+        assert chain.is_valid()
+    return op, 5
+
+
+def create_transaction(size):
+    """BlockchainSystem.create_transaction into the mempool"""
+    system = _system()
+    sink = io.StringIO()
+
+    def op(i):
+        with contextlib.redirect_stdout(sink):
+            assert system.create_transaction(f"account{i % 100}", f"account{(i + 1) % 100}", 1000 + i)
+        sink.seek(0)
+        sink.truncate()
+    return op, max(size * 2, 1)
+
+
+def mine_block(size):
+    """BlockchainSystem.mine_block of 200 pending transactions: staging, state, undo data and index"""
+    system = _system(block_max_txs=200)
+    count = max(size // 5, 1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range((count + 1) * 200):
+            system.create_transaction(f"account{i % 100}", f"account{(i + 1) % 100}", 1000 + i % 5000)
+    sink = io.StringIO()
+
+    def op(i):
+        with contextlib.redirect_stdout(sink):
+            assert system.mine_block()
+        sink.seek(0)
+        sink.truncate()
+    return op, count
+
+
+def stage_block(size):
+    """BlockchainSystem.stage_transactions of a 1000-transaction block against account state"""
+    system = _system()
+    txs = _transactions(1000)
+    return (lambda i: system.stage_transactions(txs)), max(size // 50, 5)
+
+
+CASES = {f.__name__: f for f in (block_hash, add_block, is_valid, create_transaction, mine_block, stage_block)}
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(case, size, memory=True):
+    """
+    Time every op of one case; with `memory` the case is run a second time
+    under tracemalloc for its peak traced allocation (setup included)
+    """
+    op, count = case(size)
+    op(0)   # Warm-up
+    latencies = []
+    for i in range(1, count + 1):
+        start = time.perf_counter()
+        op(i)
+        latencies.append(time.perf_counter() - start)
+    total = sum(latencies)
+    latencies.sort()
+    result = {
+        "ops": count,
+        "seconds": total,
+        "ops_per_sec": count / total,
+        "p50_us": _percentile(latencies, 0.50) * 1e6,
+        "p95_us": _percentile(latencies, 0.95) * 1e6,
+        "p99_us": _percentile(latencies, 0.99) * 1e6,
+        "peak_mb": None,
+    }
+    if memory:
+        tracemalloc.start()
+        op, count = case(size)
+        for i in range(count + 1):
+            op(i)
+        result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return result
+
+
+def compare(results, baseline, threshold):
+    """
+    (case, baseline ops/s, current ops/s, change) for every case in both
+    runs, and the names of those whose throughput fell by more than `threshold`
+    """
+    rows, regressions = [], []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change = current["ops_per_sec"] / before["ops_per_sec"] - 1
+        rows.append((name, before["ops_per_sec"], current["ops_per_sec"], change))
+        if change < -threshold:
+            regressions.append(name)
+    return rows, regressions
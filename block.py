@@ -1,16 +1,262 @@
-import hashlib, time
+import hashlib, struct, time
+from merkle import MerkleTree, hash_leaf, verify_proof
+from transaction import Transaction
+
+# Canonical header layout (big-endian):
+#   prev_hash (32) | merkle_root (32) | timestamp (f64) | difficulty (u32)
+#   | roll_no length (u16) + utf-8 bytes | nonce (u64)
+# The nonce sits last so everything before it can be hashed once per block.
+_FIXED = struct.Struct(">32s32sdI")
+_ROLL_LEN = struct.Struct(">H")
+NONCE = struct.Struct(">Q")
+_TX_COUNT = struct.Struct(">I")
+
+
+def hash_meets_difficulty(block_hash, difficulty):
+    """
+    Check that a hex digest has at least `difficulty` leading zero bits
+    """
+    if difficulty <= 0:
+        return True
+    return int(block_hash, 16) >> (256 - difficulty) == 0
+
+
+def difficulty_target(difficulty):
+    """
+    Exclusive upper bound a digest must fall below, as an integer
+    """
+    return 1 << (256 - max(difficulty, 0))
+
+
+def hash_to_bytes(block_hash):
+    """
+    Convert a hex hash (or the genesis "0") to its 32-byte form
+    """
+    return bytes.fromhex(block_hash.rjust(64, "0"))
+
+
+def transaction_hash(tx):
+    """
+    Merkle leaf hash of a single transaction record
+    """
+    return hash_leaf(tx.serialize())
+
+
+def _hash_from_bytes(raw):
+    """Inverse of hash_to_bytes; the all-zero hash maps back to the genesis "0" """
+    return "0" if not any(raw) else raw.hex()
+
+
+def split_serialized(data):
+    """
+    Split serialize() output into (header, body) without decoding the body
+    """
+    (roll_len,) = _ROLL_LEN.unpack_from(data, _FIXED.size)
+    end = _FIXED.size + _ROLL_LEN.size + roll_len + NONCE.size
+    return data[:end], data[end:]
+
+
+def parse_header(header):
+    """
+    (prev_hash, merkle_root, difficulty, block hash) of a serialized header
+    """
+    prev_hash, merkle_root, _, difficulty = _FIXED.unpack_from(header, 0)
+    return _hash_from_bytes(prev_hash), merkle_root.hex(), difficulty, hashlib.sha256(header).hexdigest()
+
+
+def body_merkle_root(body):
+    """
+    Merkle root of a serialized block body, hashing the raw transaction records
+    """
+    (count,) = _TX_COUNT.unpack_from(body, 0)
+    offset = _TX_COUNT.size
+    leaves = []
+    for _ in range(count):
+        end = Transaction.unpack_from(body, offset)[1]
+        leaves.append(hash_leaf(bytes(body[offset:end])))
+        offset = end
+    if offset != len(body):
+        raise ValueError("Trailing bytes after the block body.")
+    return MerkleTree(leaves).root.hex()
+
+
+def _decode_body(data, tx_type, offset=0):
+    """Transactions of a serialized body starting at `offset` in `data`"""
+    (count,) = _TX_COUNT.unpack_from(data, offset)
+    offset += _TX_COUNT.size
+    transactions = []
+    for _ in range(count):
+        tx, offset = tx_type.unpack_from(data, offset)
+        transactions.append(tx)
+    return transactions
+
 
 class Block:
-    def __init__(self, transactions, prev_hash, roll_no):
+    def __init__(self, transactions, prev_hash, roll_no, difficulty=0, nonce=0):
         self.transactions = transactions
         self.timestamp = time.time()
         self.roll_no = roll_no
         self.prev_hash = prev_hash
+        self.difficulty = difficulty   # Required leading zero bits of the hash
+        self.nonce = nonce
+        self.merkle_root = self.compute_merkle_root()
         self.hash = self.compute_hash()   # Generate hash immediately
 
-    def compute_hash(self):
+    @property
+    def transactions(self):
+        # A block read with lazy=True decodes its body on first access.
+        # Readers may race here: the transactions are published before the
+        # body is dropped, so one of the two is always set.
+        transactions = self._transactions
+        if transactions is None:
+            body = self._body
+            if body is None:   # Another reader finished decoding meanwhile
+                return self._transactions
+            transactions = _decode_body(body, self._tx_type)
+            self._transactions = transactions
+            self._body = None
+        return transactions
+
+    @transactions.setter
+    def transactions(self, transactions):
+        self._transactions = transactions
+        self._body = None
+        self._tree = None
+
+    @property
+    def tx_count(self):
+        """
+        Number of transactions, without decoding a lazy body
+        """
+        body = self._body
+        if body is not None:
+            return _TX_COUNT.unpack_from(body, 0)[0]
+        return len(self._transactions)
+
+    @property
+    def is_decoded(self):
+        """
+        Whether the transactions exist as objects; false for a lazily read
+        block until they are first used
+        """
+        return self._body is None
+
+    def transaction_hashes(self):
+        """
+        Leaf hashes of the block transactions
+        """
+        return [transaction_hash(tx) for tx in self.transactions]
+
+    def compute_merkle_root(self):
+        """
+        Merkle root over the transaction hashes, as hex
+        """
+        return MerkleTree(self.transaction_hashes()).root.hex()
+
+    def merkle_tree(self):
+        """
+        Merkle tree over the transactions, built on first use and kept, so
+        proofs for many transactions of one block share a single build
+        """
+        if self._tree is None:
+            self._tree = MerkleTree(self.transaction_hashes())
+        return self._tree
+
+    def inclusion_proof(self, index):
+        """
+        O(log n) proof that transaction `index` is committed by merkle_root
+        """
+        return self.merkle_tree().proof(index)
+
+    def verify_transaction(self, tx, proof):
+        """
+        Check a transaction against this block's header without its body
+        """
+        return verify_proof(transaction_hash(tx), proof, self.merkle_root)
+
+    def header_prefix(self):
+        """
+        Canonical header bytes up to (but excluding) the nonce
+        """
+        roll_no = str(self.roll_no).encode()
+        return (_FIXED.pack(hash_to_bytes(self.prev_hash), bytes.fromhex(self.merkle_root),
+                            self.timestamp, self.difficulty)
+                + _ROLL_LEN.pack(len(roll_no)) + roll_no)
+
+    def midstate(self):
+        """
+        SHA-256 state after absorbing the header prefix; .copy() it per nonce
+        """
+        return hashlib.sha256(self.header_prefix())
+
+    def compute_hash(self, nonce=None):
         """
-        Compute SHA-256 hash of block contents
+        Compute SHA-256 hash of the canonical block header
         """
-        block_string = str(self.transactions) + str(self.timestamp) + str(self.roll_no) + str(self.prev_hash)
-        return hashlib.sha256(block_string.encode()).hexdigest()
\ No newline at end of file
+        if nonce is None:
+            nonce = self.nonce
+        sha = self.midstate()
+        sha.update(NONCE.pack(nonce))
+        return sha.hexdigest()
+
+    def has_valid_proof(self):
+        """
+        Check that the stored hash satisfies the block difficulty
+        """
+        return hash_meets_difficulty(self.hash, self.difficulty)
+
+    def serialize(self):
+        """
+        Canonical header followed by the transaction count and records
+        """
+        raw = self._body
+        if raw is not None:
+            return self.header_prefix() + NONCE.pack(self.nonce) + raw
+        body = b"".join(tx.serialize() for tx in self.transactions)
+        return self.header_prefix() + NONCE.pack(self.nonce) + _TX_COUNT.pack(len(self.transactions)) + body
+
+    @classmethod
+    def from_bytes(cls, data, tx_type=Transaction, lazy=False):
+        """
+        Rebuild a block from serialize() output without re-mining it.
+        `tx_type` decodes the records, e.g. utxo.CoinTransaction. With
+        `lazy` only the header is decoded; the body is kept as bytes until
+        the transactions are first used.
+        """
+        prev_hash, merkle_root, timestamp, difficulty = _FIXED.unpack_from(data, 0)
+        offset = _FIXED.size
+        (roll_len,) = _ROLL_LEN.unpack_from(data, offset)
+        offset += _ROLL_LEN.size
+        roll_no = bytes(data[offset:offset + roll_len]).decode()
+        offset += roll_len
+        (nonce,) = NONCE.unpack_from(data, offset)
+        offset += NONCE.size
+
+        block = cls.__new__(cls)
+        if lazy:
+            block._transactions = None
+            block._body = bytes(data[offset:])
+            block._tx_type = tx_type
+            block._tree = None
+        else:
+            block.transactions = _decode_body(data, tx_type, offset)
+        block.timestamp = timestamp
+        block.roll_no = roll_no
+        block.prev_hash = _hash_from_bytes(prev_hash)
+        block.difficulty = difficulty
+        block.nonce = nonce
+        block.merkle_root = merkle_root.hex()
+        block.hash = block.compute_hash()
+        return block
+
+    def to_dict(self):
+        return {
+            'timestamp': self.timestamp,
+            'prev_hash': self.prev_hash,
+            'hash': self.hash,
+            'roll_no': self.roll_no,
+            'merkle_root': self.merkle_root,
+            'difficulty': self.difficulty,
+            'nonce': self.nonce,
+            'transactions': [tx.to_dict() for tx in self.transactions]
+        }
@@ -0,0 +1,278 @@
+"""
+Streaming binary export and import of a whole chain.
+
+File layout (big-endian):
+    magic "MBCHAIN2" | block count (u32) | mint count (u32) | key count (u32)
+    headers:  block count x (length (u16) + serialized header)
+    mints:    mint count x (height (u32) | amount (i64) | name length (u16) + utf-8)
+    keys:     key count x (public key (32 bytes) | name length (u16) + utf-8)
+    bodies:   chunks of (block count (u32) | compressed length (u32) | zlib data),
+              the data being the serialized bodies of consecutive blocks
+
+Headers come first so an importer can check the whole hash chain and
+proof-of-work before touching any body. Mints are the off-chain account
+openings recorded by the state store; replaying them with the blocks
+rebuilds every balance. Account public keys come along so signatures can
+be checked on import. Both directions stream, so memory use does not
+grow with the chain.
+
+    python chainfile.py export <data_dir> <file>
+    python chainfile.py import <file> <data_dir>
+"""
+import itertools, multiprocessing, struct, sys, zlib
+from block import Block, split_serialized, parse_header, body_merkle_root, hash_meets_difficulty
+from transaction import Transaction
+
+MAGIC = b"MBCHAIN2"
+_COUNTS = struct.Struct(">III")
+_KEY = struct.Struct(">32sH")
+_HEADER_LEN = struct.Struct(">H")
+_MINT = struct.Struct(">IqH")
+_CHUNK = struct.Struct(">II")
+_TX_COUNT = struct.Struct(">I")
+
+
+def _block_bytes(chain, height):
+    # A BlockStore hands out stored bytes without decoding the block
+    return chain.read_raw(height) if hasattr(chain, "read_raw") else chain[height].serialize()
+
+
+def export_chain(system, out, chunk_blocks=256, level=6):
+    """
+    Write the chain and its account openings to a binary file object
+    """
+    chain = system.blockchain.chain
+    accounts = system.accounts
+    # Accounts opened since the last block are exported as if opened before the next one
+    pending = [(len(chain), account, amount) for account, amount in accounts.pending_mints]
+    mints = itertools.chain(
+        accounts.db.execute("SELECT height, account, amount FROM mints ORDER BY height, rowid"), pending)
+    (mint_count,) = accounts.db.execute("SELECT COUNT(*) FROM mints").fetchone()
+    out.write(MAGIC + _COUNTS.pack(len(chain), mint_count + len(pending), len(accounts.public_keys)))
+
+    for height in range(len(chain)):
+        header, _ = split_serialized(_block_bytes(chain, height))
+        out.write(_HEADER_LEN.pack(len(header)) + header)
+    for height, account, amount in mints:
+        name = account.encode()
+        out.write(_MINT.pack(height, amount, len(name)) + name)
+    for account, public_key in accounts.public_keys.items():
+        name = account.encode()
+        out.write(_KEY.pack(public_key, len(name)) + name)
+
+    for first in range(0, len(chain), chunk_blocks):
+        last = min(first + chunk_blocks, len(chain))
+        compressor = zlib.compressobj(level)
+        data = b"".join(compressor.compress(bytes(split_serialized(_block_bytes(chain, height))[1]))
+                        for height in range(first, last)) + compressor.flush()
+        out.write(_CHUNK.pack(last - first, len(data)) + data)
+
+
+def _read_exact(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Chain file is truncated.")
+    return data
+
+
+def _read_header(f):
+    (length,) = _HEADER_LEN.unpack(_read_exact(f, _HEADER_LEN.size))
+    return _read_exact(f, length)
+
+
+def _split_bodies(data, count):
+    """Cut decompressed chunk data into `count` serialized bodies"""
+    bodies = []
+    offset = 0
+    for _ in range(count):
+        (tx_count,) = _TX_COUNT.unpack_from(data, offset)
+        end = offset + _TX_COUNT.size
+        for _ in range(tx_count):
+            end = Transaction.unpack_from(data, end)[1]
+        bodies.append(data[offset:end])
+        offset = end
+    if offset != len(data):
+        raise ValueError("Chunk holds more data than its blocks.")
+    return bodies
+
+
+def _verify_chunk(task):
+    """
+    Pool task: decompress one chunk and check every body against the merkle
+    root from its header. Returns the offset of the first bad block, or -1.
+    """
+    roots, data = task
+    try:
+        bodies = _split_bodies(zlib.decompress(data), len(roots))
+        for offset, (root, body) in enumerate(zip(roots, bodies)):
+            if body_merkle_root(body) != root:
+                return offset
+    except (ValueError, struct.error, zlib.error):
+        return 0
+    return -1
+
+
+def import_chain(source, data_dir=None, workers=None, window=None, **options):
+    """
+    Build a BlockchainSystem from an export. The header chain is verified
+    first; body chunks are then checked against their merkle roots on a
+    process pool while the main process replays already-verified blocks,
+    committing each chunk's state and index writes together.
+    Raises ValueError if anything fails to verify.
+    """
+    from main import BlockchainSystem
+
+    f = open(source, "rb") if isinstance(source, str) else source
+    try:
+        if _read_exact(f, len(MAGIC)) != MAGIC:
+            raise ValueError("Not a chain export file.")
+        count, mint_count, key_count = _COUNTS.unpack(_read_exact(f, _COUNTS.size))
+        if count == 0:
+            raise ValueError("Chain export holds no blocks.")
+
+        # Pass 1: the header chain alone
+        headers_at = f.tell()
+        prev = None
+        for height in range(count):
+            prev_hash, _, difficulty, block_hash = parse_header(_read_header(f))
+            if (height and prev_hash != prev) or not hash_meets_difficulty(block_hash, difficulty):
+                raise ValueError(f"Header chain breaks at height {height}.")
+            prev = block_hash
+
+        # Mints and keys are only skipped here and read again as they are needed
+        mints_at = f.tell()
+        last = 0
+        for _ in range(mint_count):
+            height, amount, length = _MINT.unpack(_read_exact(f, _MINT.size))
+            if not last <= height <= count:
+                raise ValueError("Mint records are out of order.")
+            last = height
+            _read_exact(f, length)
+        keys_at = f.tell()
+        for _ in range(key_count):
+            public_key, length = _KEY.unpack(_read_exact(f, _KEY.size))
+            _read_exact(f, length)
+        bodies_at = f.tell()
+
+        # Pass 2: bodies, read alongside a second walk over the headers and mints
+        cursors = {"headers": headers_at, "bodies": bodies_at, "mints": mints_at}
+        mints_left = mint_count
+
+        def read_chunk():
+            f.seek(cursors["bodies"])
+            blocks, length = _CHUNK.unpack(_read_exact(f, _CHUNK.size))
+            if not 0 < blocks <= count - read:
+                raise ValueError("Chunk block count does not match the headers.")
+            data = _read_exact(f, length)
+            cursors["bodies"] = f.tell()
+            f.seek(cursors["headers"])
+            headers = [_read_header(f) for _ in range(blocks)]
+            cursors["headers"] = f.tell()
+            return headers, data
+
+        def read_mints(height):
+            """The next mints, up to and including those for block `height`"""
+            nonlocal mints_left
+            found = []
+            f.seek(cursors["mints"])
+            while mints_left:
+                mint_height, amount, length = _MINT.unpack(_read_exact(f, _MINT.size))
+                if mint_height > height:
+                    break
+                found.append((_read_exact(f, length).decode(), amount))
+                cursors["mints"] = f.tell()
+                mints_left -= 1
+            return found
+
+        def open_target(genesis):
+            system = BlockchainSystem(data_dir=data_dir, genesis=genesis, **options)
+            if system.blockchain.chain[0].hash != genesis.hash or len(system.blockchain.chain) > 1:
+                raise ValueError("Target already holds a chain.")
+            f.seek(keys_at)
+            for _ in range(key_count):
+                public_key, length = _KEY.unpack(_read_exact(f, _KEY.size))
+                system.accounts.set_key(_read_exact(f, length).decode(), public_key)
+            opened = read_mints(0)
+            if opened:
+                for account, amount in opened:
+                    system.accounts.mint(account, amount)
+                system.accounts.commit(0)
+            return system
+
+        system = None
+        height = read = 0   # blocks replayed / blocks handed to the verifiers
+        workers = workers or multiprocessing.cpu_count()
+        window = window or workers * 2
+        pool = multiprocessing.Pool(workers) if workers > 1 else None
+        try:
+            pending = None
+            while read < count or pending is not None:
+                # Keep the next window verifying while this one is replayed
+                batch = []
+                while read < count and len(batch) < window:
+                    batch.append(read_chunk())
+                    read += len(batch[-1][0])
+                tasks = [([parse_header(h)[1] for h in headers], data) for headers, data in batch]
+                current, pending = pending, (
+                    (batch, pool.map_async(_verify_chunk, tasks) if pool else list(map(_verify_chunk, tasks)))
+                    if batch else None)
+                if current is None:
+                    continue
+
+                chunks, results = current
+                results = results.get() if pool else results
+                for (headers, data), result in zip(chunks, results):
+                    if result != -1:
+                        raise ValueError(f"Block body does not match its header at height {height + result}.")
+                    bodies = _split_bodies(zlib.decompress(data), len(headers))
+                    blocks = (Block.from_bytes(header + body) for header, body in zip(headers, bodies))
+                    if system is None:
+                        system = open_target(next(blocks))
+                        height += 1
+                    # One SQLite transaction per store for the whole chunk
+                    with system.accounts.batch(), system.index.batch():
+                        for block in blocks:
+                            if not _replay(system, block, read_mints(height)):
+                                raise ValueError(f"Block {height} does not apply to the replayed state.")
+                            height += 1
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        for account, amount in read_mints(count):
+            system.accounts.mint(account, amount)
+        return system
+    finally:
+        if f is not source:
+            f.close()
+
+
+def _replay(system, block, mints):
+    """Re-open the accounts first committed with this block, then connect it"""
+    for account, amount in mints:
+        system.accounts.mint(account, amount)
+    return system._connect(block, verified=True)
+
+
+def main():
+    if len(sys.argv) != 4 or sys.argv[1] not in ("export", "import"):
+        print(__doc__.strip().splitlines()[-2].strip())
+        print(__doc__.strip().splitlines()[-1].strip())
+        return
+    from main import BlockchainSystem
+
+    if sys.argv[1] == "export":
+        system = BlockchainSystem(data_dir=sys.argv[2])
+        with open(sys.argv[3], "wb") as out:
+            export_chain(system, out)
+        print(f"Exported {len(system.blockchain.chain)} blocks to {sys.argv[3]}")
+    else:
+        system = import_chain(sys.argv[2], data_dir=sys.argv[3])
+        print(f"Imported {len(system.blockchain.chain)} blocks into {sys.argv[3]}")
+    system.blockchain.chain.close()
+    system.accounts.close()
+    system.index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import threading
+from contextlib import contextmanager
+
+
+class RWLock:
+    def __init__(self):
+        """
+        Any number of readers at once, or a single writer. A waiting writer
+        holds back new readers, so a steady stream of reads cannot starve
+        mutations. Not reentrant: don't take it again while holding it.
+        """
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def reading(self):
+        with self._cond:
+            while self._writing or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def writing(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+class Engine:
+    def __init__(self, system):
+        """
+        One BlockchainSystem shared by every session of a process (e.g. all
+        Streamlit users), so the chain and state exist once however many
+        sessions are open. Reads run concurrently under the shared side of
+        a readers-writer lock; mutations take the exclusive side one at a
+        time and get back the messages the system reported.
+        """
+        self.system = system
+        self.lock = RWLock()
+
+    def read(self, func, *args):
+        """func(system, *args) under the shared lock"""
+        with self.lock.reading():
+            return func(self.system, *args)
+
+    def write(self, func, *args):
+        """func(system, *args) under the exclusive lock; returns (result, messages)"""
+        with self.lock.writing():
+            return self.system.collect(func, self.system, *args)
+
+    def mine(self, roll_no=None):
+        """
+        Mine a block; returns (result, messages). The template is built and
+        the block connected under the exclusive lock, but the proof-of-work
+        runs with no lock held, so other sessions keep reading and writing.
+        If the chain moves on meanwhile, the block is discarded.
+        """
+        block, messages = self.write(lambda system: system.block_template(roll_no))
+        if not block:
+            return False, messages
+        stats = self.system.blockchain.mine(block)
+        result, more = self.write(lambda system: system.connect_mined_block(block, stats))
+        return result, messages + more
+
+    def replace(self, system):
+        """
+        Swap in another system, e.g. an imported chain, once no reader is
+        using the current one, and close the old one's stores
+        """
+        with self.lock.writing():
+            old, self.system = self.system, system
+        if hasattr(old.blockchain.chain, "close"):
+            old.blockchain.chain.close()
+        old.accounts.close()
+        old.index.close()
@@ -0,0 +1,136 @@
+import heapq, os
+from collections import ChainMap
+from transaction import ZAKAT_ACCOUNT, FEE_ACCOUNT
+
+# Credit-only accounts: every transaction adds to them and none reads them,
+# so their credits are merged as sums instead of ordering transactions
+POOLED_ACCOUNTS = (ZAKAT_ACCOUNT, FEE_ACCOUNT)
+
+
+def access_groups(transactions):
+    """
+    Indexes of `transactions` grouped by the accounts they touch: two
+    transactions share a group when they are linked through a sender or
+    receiver. Groups keep block order and are ordered by their first
+    transaction, so the grouping is deterministic.
+    """
+    parent = {}
+
+    def find(account):
+        root = account
+        while parent[root] != root:
+            root = parent[root]
+        while parent[account] != root:
+            parent[account], account = root, parent[account]
+        return root
+
+    for tx in transactions:
+        a = find(parent.setdefault(tx.sender, tx.sender))
+        b = find(parent.setdefault(tx.receiver, tx.receiver))
+        if a != b:
+            parent[b] = a
+
+    groups = {}
+    for i, tx in enumerate(transactions):
+        groups.setdefault(find(tx.sender), []).append(i)
+    return list(groups.values())
+
+
+def _execute(task):
+    """
+    Pool task: apply (index, transaction) pairs in block order to the
+    starting balances of the accounts they touch. Returns the final
+    balances, the zakat and fee credits, and (index, message) for the
+    first failing transaction or None.
+    """
+    balances, items = task
+    zakat = fees = 0
+    for index, tx in items:
+        try:
+            tx.apply(balances)
+        except Exception as e:
+            return balances, zakat, fees, (index, str(e))
+        zakat += balances.pop(ZAKAT_ACCOUNT, 0)
+        fees += balances.pop(FEE_ACCOUNT, 0)
+    return balances, zakat, fees, None
+
+
+class BlockExecutor:
+    def __init__(self, workers=None, parallel_threshold=2048):
+        """
+        Applies a block's transactions with independent account groups on
+        separate worker processes.
+
+        Transactions that share no sender or receiver cannot affect each
+        other, so each group runs in block order against its own accounts
+        and the per-group results are disjoint. Zakat and fee credits are
+        sums, added to the pooled accounts once every group is done. The
+        outcome, including which failure is reported, is the same as
+        applying the block serially. Blocks below `parallel_threshold`
+        transactions, or that touch a pooled account directly, run serially.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.parallel_threshold = parallel_threshold
+
+    def _tasks(self, accounts, transactions, groups):
+        # Largest groups first onto the least loaded worker
+        loads = [(0, w) for w in range(self.workers)]
+        assigned = [[] for _ in range(self.workers)]
+        for group in sorted(groups, key=len, reverse=True):
+            load, w = heapq.heappop(loads)
+            assigned[w].extend(group)
+            heapq.heappush(loads, (load + len(group), w))
+
+        tasks = []
+        for indexes in assigned:
+            if not indexes:
+                continue
+            indexes.sort()
+            items = [(i, transactions[i]) for i in indexes]
+            touched = {name for _, tx in items for name in (tx.sender, tx.receiver)}
+            tasks.append(({name: accounts[name] for name in touched if name in accounts}, items))
+        return tasks
+
+    def stage(self, accounts, transactions):
+        """
+        Balances changed by applying `transactions` to `accounts` (any
+        mapping, left untouched). Raises the error of the first transaction
+        in block order that fails.
+        """
+        groups = None
+        if (self.workers > 1 and len(transactions) >= self.parallel_threshold
+                and not any(tx.sender in POOLED_ACCOUNTS or tx.receiver in POOLED_ACCOUNTS
+                            for tx in transactions)):
+            groups = access_groups(transactions)
+        if not groups or len(groups) == 1:
+            return stage_serial(accounts, transactions)
+
+        import multiprocessing
+        with multiprocessing.Pool(min(self.workers, len(groups))) as pool:
+            results = pool.map(_execute, self._tasks(accounts, transactions, groups))
+
+        failures = [failure for _, _, _, failure in results if failure is not None]
+        if failures:
+            raise Exception(min(failures)[1])
+        staged = {}
+        zakat = fees = 0
+        for balances, task_zakat, task_fees, _ in results:
+            staged.update(balances)
+            zakat += task_zakat
+            fees += task_fees
+        if zakat:
+            staged[ZAKAT_ACCOUNT] = accounts.get(ZAKAT_ACCOUNT, 0) + zakat
+        if fees:
+            staged[FEE_ACCOUNT] = accounts.get(FEE_ACCOUNT, 0) + fees
+        return staged
+
+
+def stage_serial(accounts, transactions):
+    """
+    Balances changed by applying `transactions` to `accounts` one after
+    another; the reference the parallel path must match
+    """
+    staged = ChainMap({}, accounts)
+    for tx in transactions:
+        tx.apply(staged)
+    return staged.maps[0]
@@ -1,104 +1,516 @@
-from transaction import Transaction
+import json, os, sys, threading
+from block import Block
+from transaction import Transaction, ZAKAT_ACCOUNT
+from amounts import to_units, format_amount, calculate_zakat
 from miner import Blockchain
-import json
+from storage import BlockStore
+from state import StateStore
+from mempool import Mempool
+from txindex import TxIndex, resolve
+from execution import BlockExecutor
+import metrics
+
+BLOCKS_MINED = metrics.counter("blockchain_blocks_mined_total", "Blocks mined by this node")
+BLOCKS_CONNECTED = metrics.counter("blockchain_blocks_connected_total", "Blocks connected from the network or an import")
+TXS_CONFIRMED = metrics.counter("blockchain_transactions_confirmed_total", "Transactions in connected or mined blocks")
 
 class BlockchainSystem:
-    def __init__(self, roll_no="0000"):
-        self.blockchain = Blockchain(roll_no)
-        self.accounts = {}
-        self.pending_transactions = []
+    def __init__(self, roll_no="0000", difficulty=0, workers=1, data_dir=None,
+                 mempool_bytes=5_000_000, block_max_bytes=1_000_000, block_max_txs=None, genesis=None,
+                 require_signatures=False, execution_workers=1, target_interval=None):
+        self.data_dir = data_dir
+        store = BlockStore(data_dir) if data_dir else None
+        # `target_interval` (seconds) turns on difficulty retargeting; `difficulty` is then the starting point
+        self.blockchain = Blockchain(roll_no, difficulty, workers, store=store, genesis=genesis,
+                                     target_interval=target_interval)
+        self.accounts = StateStore(os.path.join(data_dir, "state.db") if data_dir else ":memory:")
+        # Undo state committed for blocks that never reached the block store;
+        # account openings are off-chain, so they are minted again
+        mints = []
+        while self.accounts.height > len(self.blockchain.chain) - 1:
+            mints = self.accounts.rollback() + mints
+        for account, amount in mints:
+            self.accounts.mint(account, amount)
+        self.index = TxIndex(os.path.join(data_dir, "index.db") if data_dir else ":memory:")
+        self.index.catch_up(self.blockchain.chain)
+        self.mempool = Mempool(mempool_bytes)
+        self.block_max_bytes = block_max_bytes
+        self.block_max_txs = block_max_txs
         self.roll_no = roll_no
+        # Accounts with a registered key only move funds with a valid signature;
+        # require_signatures gives every new account a key and rejects keyless senders
+        self.require_signatures = require_signatures
+        self.workers = workers
+        self._verifier = None
+        # Large blocks with independent account groups are applied on this many processes
+        self.executor = BlockExecutor(execution_workers)
+        self.wallet_path = os.path.join(data_dir, "wallet.json") if data_dir else None
+        self.wallet = {}   # account -> private key for the accounts this node signs for
+        self._collecting = threading.local()   # Messages gathered by collect() in each thread
+        if self.wallet_path and os.path.exists(self.wallet_path):
+            with open(self.wallet_path) as f:
+                self.wallet = {name: bytes.fromhex(key) for name, key in json.load(f).items()}
+        # Gauges are read when metrics are rendered, so they cost nothing in between
+        metrics.gauge("blockchain_height", "Main chain height", lambda: len(self.blockchain.chain) - 1)
+        metrics.gauge("blockchain_difficulty", "Difficulty of the next block in bits", lambda: self.blockchain.difficulty)
+        metrics.gauge("blockchain_mempool_transactions", "Pending transactions", lambda: len(self.mempool))
+        metrics.gauge("blockchain_mempool_bytes", "Serialized size of pending transactions", lambda: self.mempool.size_bytes)
+        metrics.gauge("blockchain_hash_rate", "Hashes per second while mining the last block", self.blockchain.hash_rate)
+        self._replay_stored()
+
+    def _replay_stored(self):
+        """
+        Apply stored blocks the account state never committed, e.g. after a
+        crash between appending a block and committing its state. The store
+        is cut back at the first block that no longer applies.
+        """
+        chain = self.blockchain.chain
+        for height in range(max(self.accounts.height, 0) + 1, len(chain)):
+            block = chain[height]
+            try:
+                staged = self.stage_transactions(block.transactions)
+            except Exception as e:
+                self._report(f"Dropping stored blocks from #{height}: {str(e)}")
+                self.index.truncate(height - 1)
+                self.blockchain.truncate(height - 1)
+                self.blockchain.forget(block.hash)
+                return
+            self.apply_transactions(block.transactions, staged)
+            self.accounts.commit(height)
         
-    def create_account(self, account_name, initial_balance):
-        """Create a new account with initial balance"""
+    def _report(self, message):
+        """Print a message for the user, or keep it for collect() in this thread"""
+        messages = getattr(self._collecting, "messages", None)
+        if messages is None:
+            print(message)
+        else:
+            messages.append(message.strip())
+    
+    def collect(self, func, *args, **kwargs):
+        """
+        Call func(*args, **kwargs) and return (result, messages), with the
+        messages this system reported meanwhile instead of printing them.
+        Only calls on the current thread are collected.
+        """
+        outer = getattr(self._collecting, "messages", None)
+        self._collecting.messages = []
+        try:
+            result = func(*args, **kwargs)
+            return result, self._collecting.messages
+        finally:
+            self._collecting.messages = outer
+    
+    # All amounts below are integer minor units; main() converts user input
+
+    def create_account(self, account_name, initial_balance, public_key=None, signed=False):
+        """
+        Create a new account with initial balance (newly minted supply).
+        `public_key` (32 raw bytes or hex) ties the account to a key held
+        elsewhere; with `signed` or require_signatures a key pair is
+        generated and kept in this node's wallet.
+        """
         if account_name in self.accounts:
-            print(f"Account '{account_name}' already exists!")
+            self._report(f"Account '{account_name}' already exists!")
             return False
-        
-        self.accounts[account_name] = initial_balance
-        print(f"Account '{account_name}' created with balance: {initial_balance}")
+        if initial_balance < 0:
+            self._report("Initial balance cannot be negative!")
+            return False
+        if isinstance(public_key, str):
+            try:
+                public_key = bytes.fromhex(public_key)
+            except ValueError:
+                public_key = b""
+        if public_key is not None and len(public_key) != 32:
+            self._report("Public key must be 32 bytes (Ed25519)!")
+            return False
+
+        if public_key is None and (signed or self.require_signatures):
+            from signing import generate_keypair
+            private_key, public_key = generate_keypair()
+            self.wallet[account_name] = private_key
+            self._save_wallet()
+        if public_key is not None:
+            self.accounts.set_key(account_name, public_key)
+        self.accounts.mint(account_name, initial_balance)
+        self._report(f"Account '{account_name}' created with balance: {format_amount(initial_balance)}"
+                     + (f" (key {public_key.hex()[:16]}...)" if public_key is not None else ""))
         return True
     
-    def get_balance(self, account_name):
-        """Get account balance"""
+    def _save_wallet(self):
+        if self.wallet_path:
+            with open(os.open(self.wallet_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+                json.dump({name: key.hex() for name, key in self.wallet.items()}, f)
+    
+    @property
+    def verifier(self):
+        """Signature verifier, created when first needed (cryptography is optional)"""
+        if self._verifier is None:
+            from signing import SignatureVerifier
+            self._verifier = SignatureVerifier(self.workers)
+        return self._verifier
+    
+    def sign_transaction(self, tx):
+        """
+        Sign `tx` with the sender's wallet key if the sender has a key.
+        Raises if it needs a signature this node cannot make.
+        """
+        key = self.accounts.public_keys.get(tx.sender)
+        if key is None:
+            if self.require_signatures:
+                raise Exception(f"Account '{tx.sender}' has no signing key.")
+            return
+        if tx.sender not in self.wallet:
+            raise Exception(f"No private key for '{tx.sender}' in this node's wallet.")
+        from signing import sign
+        sign(tx, self.wallet[tx.sender])
+        # Verifying now also caches the result for when the block is mined
+        if not self.verifier.check(tx, key):
+            raise Exception(f"Wallet key for '{tx.sender}' does not match its registered key.")
+    
+    @metrics.timed("blockchain_signature_check_seconds", "Time to check the signatures of a batch of transactions")
+    def check_signatures(self, transactions):
+        """
+        Raise unless every transaction from an account with a key carries a
+        valid signature by it (and, with require_signatures, every sender has one)
+        """
+        keys = self.accounts.public_keys
+        if not keys and not self.require_signatures:
+            return
+        signed = []
+        for tx in transactions:
+            key = keys.get(tx.sender)
+            if key is not None:
+                signed.append((tx, key))
+            elif self.require_signatures:
+                raise Exception(f"Account '{tx.sender}' has no key to verify signatures with.")
+        bad = self.verifier.check_all(signed) if signed else -1
+        if bad != -1:
+            raise Exception(f"Invalid signature on a transaction from '{signed[bad][0].sender}'.")
+    
+    def get_available_balance(self, account_name):
+        """Balance not yet reserved by pending transactions"""
+        return self.accounts.get(account_name, 0) - self.mempool.pending_debit(account_name)
+    
+    def get_balance(self, account_name, height=None):
+        """Get account balance, optionally as of a given block height"""
+        if height is not None:
+            return self.accounts.balance_at(account_name, height)
         return self.accounts.get(account_name, 0)
     
     def calculate_zakat(self, amount):
         """Calculate zakat (2.5% of transaction amount)"""
-        return amount * 0.025
+        return calculate_zakat(amount)
     
-    def create_transaction(self, sender, receiver, amount):
-        """Create and add a transaction with automatic zakat deduction"""
+    @metrics.timed("blockchain_tx_admission_seconds", "Time to validate and queue one new transaction")
+    def create_transaction(self, sender, receiver, amount, fee=0):
+        """
+        Create a transaction with automatic zakat deduction and queue it in the
+        mempool. Funds are reserved now and move when the block is mined.
+        Returns the queued transaction, or False.
+        """
         try:
+            if amount <= 0 or fee < 0:
+                self._report("Amount must be positive and fee non-negative!")
+                return False
+            
             # Check if accounts exist
             if sender not in self.accounts:
-                print(f"Sender account '{sender}' does not exist!")
+                self._report(f"Sender account '{sender}' does not exist!")
                 return False
             if receiver not in self.accounts:
-                print(f"Receiver account '{receiver}' does not exist!")
+                self._report(f"Receiver account '{receiver}' does not exist!")
                 return False
             
             # Calculate zakat
             zakat_amount = self.calculate_zakat(amount)
-            total_deduction = amount + zakat_amount
+            total_deduction = amount + zakat_amount + fee
             
-            # Check if sender has sufficient balance
-            if self.accounts[sender] < total_deduction:
-                print(f"Insufficient balance! Required: {total_deduction} (Amount: {amount} + Zakat: {zakat_amount})")
+            # Check if sender has sufficient balance not already reserved
+            if self.get_available_balance(sender) < total_deduction:
+                self._report(f"Insufficient balance! Required: {format_amount(total_deduction)} "
+                             f"(Amount: {format_amount(amount)} + Zakat: {format_amount(zakat_amount)} + Fee: {format_amount(fee)}), "
+                             f"available: {format_amount(self.get_available_balance(sender))}")
                 return False
             
-            # Create main transaction
-            transaction = Transaction(sender, receiver, amount)
-            
-            # Apply transaction
-            self.accounts = transaction.apply(self.accounts)
-            
-            # Deduct zakat from sender
-            self.accounts[sender] -= zakat_amount
+            # Create transaction record (zakat travels with it)
+            nonce = self.mempool.next_nonce(sender, self.accounts.nonces.get(sender, 0))
+            transaction = Transaction(sender, receiver, amount, zakat=zakat_amount, fee=fee, nonce=nonce)
+            self.sign_transaction(transaction)
             
-            # Add zakat to a special zakat account (create if doesn't exist)
-            if "ZAKAT_FUND" not in self.accounts:
-                self.accounts["ZAKAT_FUND"] = 0
-            self.accounts["ZAKAT_FUND"] += zakat_amount
+            # Add to mempool, which may evict cheaper transactions when full
+            evicted = self.mempool.add(transaction)
             
-            # Add to pending transactions
-            self.pending_transactions.append({
-                'main_transaction': f"{sender} -> {receiver}: {amount}",
-                'zakat_transaction': f"{sender} -> ZAKAT_FUND: {zakat_amount}",
-                'total_deducted': total_deduction
-            })
+            self._report(f"Transaction successful! (pending until mined)")
+            self._report(f"Amount transferred: {format_amount(amount)}")
+            self._report(f"Zakat deducted: {format_amount(zakat_amount)}")
+            self._report(f"Total deducted from {sender}: {format_amount(total_deduction)}")
+            for tx in evicted:
+                self._report(f"Evicted from mempool (lower fee): {tx.sender} -> {tx.receiver}: {format_amount(tx.amount)}")
             
-            print(f"Transaction successful!")
-            print(f"Amount transferred: {amount}")
-            print(f"Zakat deducted: {zakat_amount}")
-            print(f"Total deducted from {sender}: {total_deduction}")
-            
-            return True
+            return transaction
             
         except Exception as e:
-            print(f"Transaction failed: {str(e)}")
+            self._report(f"Transaction failed: {str(e)}")
             return False
     
-    def mine_block(self):
-        """Mine a block with pending transactions"""
-        if not self.pending_transactions:
-            print("No pending transactions to mine!")
+    def submit_batch(self, senders, receivers, amounts):
+        """
+        Validate and queue many transfers at once, given as equal-length columns
+        (amounts as integer minor units). Same outcome as calling create_transaction for each in order.
+        """
+        from batch import check_batch   # NumPy is only needed for batch ingestion
+
+        report, zakat = check_batch(self.accounts, senders, receivers, amounts,
+                                    reserved=self.mempool.pending_debit)
+        admitted = []
+        for i in report.accepted:
+            sender = senders[i]
+            nonce = self.mempool.next_nonce(sender, self.accounts.nonces.get(sender, 0))
+            tx = Transaction(sender, receivers[i], int(amounts[i]), zakat=int(zakat[i]), nonce=nonce)
+            try:
+                self.sign_transaction(tx)
+                self.mempool.add(tx)
+                admitted.append(i)
+            except Exception as e:
+                report.failures.append((i, str(e)))
+        report.accepted = admitted
+        report.failures.sort()
+        
+        self._report(f"Batch processed: {report.summary()}")
+        for index, reason in report.failures:
+            self._report(f"  #{index}: {reason}")
+        return report
+    
+    @metrics.timed("blockchain_tx_admission_seconds", "Time to validate and queue one new transaction")
+    def accept_transaction(self, tx):
+        """
+        Queue a transaction created on another node after checking it the
+        way create_transaction would have. Returns True if it was admitted.
+        """
+        if tx.hash in self.mempool:
+            return False
+        if tx.sender not in self.accounts or tx.receiver not in self.accounts:
+            return False
+        if tx.amount <= 0 or tx.fee < 0 or tx.zakat != self.calculate_zakat(tx.amount):
+            return False
+        if tx.nonce != self.mempool.next_nonce(tx.sender, self.accounts.nonces.get(tx.sender, 0)):
             return False
+        if self.get_available_balance(tx.sender) < tx.total_deducted:
+            return False
+        try:
+            self.check_signatures([tx])
+            self.mempool.add(tx)
+        except Exception:
+            return False
+        return True
+    
+    def accept_block(self, block):
+        """
+        Take a block mined on another node. A block on the tip is connected
+        directly; one on another branch is kept, and the chain reorganizes
+        onto that branch once it has more cumulative work. Returns the blocks
+        newly connected to the main chain (empty if only stored), or False.
+        """
+        blockchain = self.blockchain
+        if block.prev_hash == blockchain.chain[-1].hash:
+            if not self._connect(block):
+                return False
+            self._drop_confirmed([block])
+            self._report(f"Block #{len(blockchain.chain) - 1} accepted from the network "
+                         f"({len(block.transactions)} transactions)")
+            return [block]
         
-        # Convert transactions to string format for block
-        transactions_str = json.dumps(self.pending_transactions, indent=2)
+        if blockchain.add_side_block(block) is None:
+            self._report(f"Rejected block {block.hash[:16]}: unknown parent or invalid")
+            return False
+        best_hash, best_work = blockchain.best_tip()
+        if best_hash == blockchain.chain[-1].hash:
+            self._report(f"Block {block.hash[:16]} stored on a side branch")
+            return []
+        return self.reorganize(best_hash)
+    
+    def reorganize(self, tip_hash):
+        """
+        Switch the main chain to the branch ending at `tip_hash`: undo state
+        back to the fork point with each block's undo data, then apply the
+        branch. If the branch turns out invalid the old chain is restored.
+        Returns the newly connected blocks, or False.
+        """
+        fork_height, branch = self.blockchain.branch(tip_hash)
+        old_blocks = self._disconnect(fork_height)
+        for i, block in enumerate(branch):
+            if not self._connect(block):
+                self.blockchain.forget(block.hash)
+                self._disconnect(fork_height)
+                for old in old_blocks:
+                    self._connect(old)
+                self._report(f"Reorganization to {tip_hash[:16]} failed; kept the current chain")
+                return False
         
-        # Add block to blockchain
-        success = self.blockchain.add_block(transactions_str, self.roll_no)
+        # Transactions only the old branch confirmed go back to the mempool
+        confirmed = {tx.hash for block in branch for tx in block.transactions}
+        returning = [tx for block in old_blocks for tx in block.transactions if tx.hash not in confirmed]
+        pending = list(self.mempool)
+        self.mempool = Mempool(self.mempool.max_bytes)
+        for tx in returning + pending:
+            if tx.hash not in confirmed:
+                self.accept_transaction(tx)
+        self._report(f"Reorganized: {len(old_blocks)} blocks replaced by {len(branch)} "
+                     f"from height {fork_height + 1}; tip is now #{len(self.blockchain.chain) - 1}")
+        return branch
+    
+    @metrics.timed("blockchain_block_connect_seconds", "Time to connect a block received from the network")
+    def _connect(self, block, verified=False):
+        """Apply a block on top of the tip: state, chain and undo data"""
+        try:
+            staged = self.stage_transactions(block.transactions)
+        except Exception as e:
+            self._report(f"Rejected block {block.hash[:16]}: {str(e)}")
+            return False
+        if not self.blockchain.append_block(block, verified):
+            self._report(f"Rejected block {block.hash[:16]}: does not extend the chain")
+            return False
+        self.apply_transactions(block.transactions, staged)
+        self.accounts.commit(len(self.blockchain.chain) - 1)
+        self.index.add_block(len(self.blockchain.chain) - 1, block)
+        BLOCKS_CONNECTED.inc()
+        TXS_CONFIRMED.inc(len(block.transactions))
+        return True
+    
+    def _disconnect(self, fork_height):
+        """
+        Undo main-chain blocks above `fork_height` using the state's undo
+        data (balances and sender nonces); returns them. Account openings
+        are off-chain, so they are minted again rather than lost with their
+        block.
+        """
+        blocks = self.blockchain.chain[fork_height + 1:]
+        mints = []
+        for block in reversed(blocks):
+            mints = self.accounts.rollback() + mints
+        self.index.truncate(fork_height)
+        self.blockchain.truncate(fork_height)
+        for account, amount in mints:
+            self.accounts.mint(account, amount)
+        return blocks
+    
+    def _drop_confirmed(self, blocks):
+        """
+        Remove transactions confirmed by `blocks` from the mempool. Each
+        sender's queue is pruned up to its confirmed nonce, which also drops
+        conflicting transactions and keeps the later nonces queued behind them.
+        """
+        senders = {tx.sender for block in blocks for tx in block.transactions}
+        for sender in senders:
+            self.mempool.prune(sender, self.accounts.nonces[sender])
+    
+    @metrics.timed("blockchain_block_validation_seconds", "Time to check a block's transactions against account state")
+    def stage_transactions(self, transactions):
+        """
+        Apply a block's transactions to an overlay of the account state.
+        Raises if any transaction fails; the state itself is untouched.
+        """
+        self.check_signatures(transactions)
+        expected = {}
+        for position, tx in enumerate(transactions):
+            nonce = expected.get(tx.sender, self.accounts.nonces.get(tx.sender, 0))
+            if tx.nonce != nonce:
+                # Transactions before the bad nonce are applied first so a
+                # balance error earlier in the block is the one reported
+                self.executor.stage(self.accounts, transactions[:position])
+                raise Exception(f"Transaction nonce out of order for '{tx.sender}'.")
+            expected[tx.sender] = nonce + 1
+        return self.executor.stage(self.accounts, transactions)
+    
+    @metrics.timed("blockchain_state_update_seconds", "Time to write a block's balance changes to account state")
+    def apply_transactions(self, transactions, staged=None):
+        """Apply a block's transactions to the account state, all or nothing"""
+        if staged is None:
+            staged = self.stage_transactions(transactions)
+        for account, balance in staged.items():
+            self.accounts[account] = balance
+        for tx in transactions:
+            self.accounts.set_nonce(tx.sender, tx.nonce + 1)
+    
+    @metrics.timed("blockchain_mine_block_seconds", "Time to assemble, mine and apply a block")
+    def mine_block(self, roll_no=None):
+        """
+        Mine a block with the highest fee-rate pending transactions,
+        stamped with `roll_no` (default: this node's)
+        """
+        block = self.block_template(roll_no)
+        if not block:
+            return False
+        return self.connect_mined_block(block, self.blockchain.mine(block))
+    
+    def block_template(self, roll_no=None):
+        """
+        First step of mining: an unmined block on the tip holding the best
+        pending transactions, checked against the account state. The
+        transactions stay pending until the block connects, so the nonce
+        search (blockchain.mine) can run while others use the system.
+        Returns the block, or False.
+        """
+        if not len(self.mempool):
+            self._report("No pending transactions to mine!")
+            return False
         
-        if success:
-            print(f"Block mined successfully! Block #{len(self.blockchain.chain) - 1}")
-            print(f"Transactions included: {len(self.pending_transactions)}")
-            self.pending_transactions = []  # Clear pending transactions
-            return True
-        else:
-            print("Failed to mine block!")
+        transactions = self.mempool.pop_block(self.block_max_bytes, self.block_max_txs)
+        self.mempool.restore(transactions)
+        try:
+            self.stage_transactions(transactions)
+        except Exception as e:
+            self._report(f"Failed to mine block: {str(e)}")
+            return False
+        # Transactions are committed through a merkle root
+        return Block(transactions=transactions, prev_hash=self.blockchain.chain[-1].hash,
+                     roll_no=roll_no or self.roll_no, difficulty=self.blockchain.difficulty)
+    
+    def connect_mined_block(self, block, mining_stats):
+        """
+        Last step of mining: add a block from block_template() once its
+        nonce is found. Fails if the chain moved on in the meantime.
+        """
+        self.blockchain.last_mining_stats = mining_stats
+        if block.prev_hash != self.blockchain.chain[-1].hash:
+            self._report("Failed to mine block: the chain changed while mining; try again.")
+            return False
+        try:
+            staged = self.stage_transactions(block.transactions)
+        except Exception as e:
+            self._report(f"Failed to mine block: {str(e)}")
+            return False
+        if not self.blockchain.append_block(block, verified=True):
+            self._report("Failed to mine block!")
             return False
+        
+        height = len(self.blockchain.chain) - 1
+        self.apply_transactions(block.transactions, staged)
+        self.accounts.commit(height)
+        self.index.add_block(height, block)
+        self._drop_confirmed([block])
+        BLOCKS_MINED.inc()
+        TXS_CONFIRMED.inc(len(block.transactions))
+        self._report(f"Block mined successfully! Block #{height}")
+        self._report(f"Transactions included: {len(block.transactions)} ({len(self.mempool)} still pending)")
+        if block.difficulty > 0:
+            self._report(f"Nonce: {block.nonce} (difficulty: {block.difficulty} bits)")
+            for stats in mining_stats:
+                self._report(f"  Worker {stats['worker']}: {stats['hashes']} hashes, {stats['hash_rate']:.0f} H/s")
+        return True
+    
+    def find_transaction(self, tx_hash):
+        """(height, position, transaction) of a confirmed transaction, or None"""
+        location = self.index.locate(tx_hash)
+        return next(resolve(self.blockchain.chain, [location])) if location else None
+    
+    def account_history(self, account_name, limit=50, before=None):
+        """
+        A page of an account's confirmed transactions, newest first, as
+        (height, position, transaction); pass the last (height, position)
+        of a page as `before` for the next one
+        """
+        return list(resolve(self.blockchain.chain, self.index.history(account_name, limit, before)))
     
     def display_accounts(self):
         """Display all accounts and their balances"""
@@ -109,7 +521,9 @@ class BlockchainSystem:
             print("No accounts found!")
         else:
             for account, balance in self.accounts.items():
-                print(f"{account}: {balance}")
+                reserved = self.mempool.pending_debit(account)
+                print(f"{account}: {format_amount(balance)}"
+                      + (f" (reserved by pending: {format_amount(reserved)})" if reserved else ""))
         print("="*50)
     
     def display_blockchain(self):
@@ -123,48 +537,69 @@ class BlockchainSystem:
             print(f"Timestamp: {block.timestamp}")
             print(f"Previous Hash: {block.prev_hash}")
             print(f"Current Hash: {block.hash}")
+            print(f"Merkle Root: {block.merkle_root}")
             print(f"Roll No: {block.roll_no}")
+            print(f"Nonce: {block.nonce} (difficulty: {block.difficulty} bits)")
             
             if i == 0:  # Genesis block
-                print(f"Transactions: {block.transactions}")
+                print("Transactions: Genesis Block")
             else:
                 print("Transactions:")
-                try:
-                    transactions = json.loads(block.transactions)
-                    for j, tx in enumerate(transactions, 1):
-                        print(f"  {j}. Main: {tx['main_transaction']}")
-                        print(f"     Zakat: {tx['zakat_transaction']}")
-                        print(f"     Total Deducted: {tx['total_deducted']}")
-                except:
-                    print(f"  {block.transactions}")
+                for j, tx in enumerate(block.transactions, 1):
+                    print(f"  {j}. Main: {tx.sender} -> {tx.receiver}: {format_amount(tx.amount)}")
+                    print(f"     Zakat: {tx.sender} -> {ZAKAT_ACCOUNT}: {format_amount(tx.zakat)}")
+                    print(f"     Total Deducted: {format_amount(tx.total_deducted)}")
             
             print("-" * 70)
+        
+        if hasattr(self.blockchain.chain, "cache"):
+            stats = self.blockchain.chain.cache.stats()
+            print(f"Block cache: {stats['hits']} hits, {stats['misses']} misses, {stats['blocks']} blocks "
+                  f"({stats['bytes'] / 1e6:.1f} of {stats['max_bytes'] / 1e6:.0f} MB)")
     
-    def validate_blockchain(self):
-        """Validate the blockchain"""
-        is_valid = self.blockchain.is_valid()
-        print(f"\nBlockchain validation: {'VALID' if is_valid else 'INVALID'}")
+    def validate_blockchain(self, full=False):
+        """Validate the blockchain (incrementally, or a full parallel audit)"""
+        is_valid = self.blockchain.is_valid(full=full)
+        self._report(f"\nBlockchain validation: {'VALID' if is_valid else 'INVALID'}")
+        self.reconcile_supply()
         return is_valid
     
+    def reconcile_supply(self):
+        """Check that transfers never created or destroyed money"""
+        mismatches = self.accounts.reconcile()
+        if not mismatches:
+            self._report(f"Supply reconciliation: OK (total supply {format_amount(self.accounts.minted)})")
+            return True
+        for height, minted, change in mismatches:
+            where = "current balances" if height is None else f"block #{height}"
+            self._report(f"Supply mismatch in {where}: minted {format_amount(minted)}, balances changed by {format_amount(change)}")
+        return False
+    
     def display_pending_transactions(self):
         """Display pending transactions"""
         print("\n" + "="*50)
         print("PENDING TRANSACTIONS")
         print("="*50)
-        if not self.pending_transactions:
+        if not len(self.mempool):
             print("No pending transactions!")
         else:
-            for i, tx in enumerate(self.pending_transactions, 1):
-                print(f"{i}. Main: {tx['main_transaction']}")
-                print(f"   Zakat: {tx['zakat_transaction']}")
-                print(f"   Total Deducted: {tx['total_deducted']}")
+            for i, tx in enumerate(self.mempool, 1):
+                print(f"{i}. Main: {tx.sender} -> {tx.receiver}: {format_amount(tx.amount)}")
+                print(f"   Zakat: {tx.sender} -> {ZAKAT_ACCOUNT}: {format_amount(tx.zakat)}")
+                print(f"   Total Deducted: {format_amount(tx.total_deducted)}")
         print("="*50)
 
 
 def main():
     # Initialize blockchain system
+    # Optional first argument: directory to persist the chain in
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else None
+    # BLOCKCHAIN_METRICS=1 records timings; `kill -USR1 <pid>` prints them
+    if os.environ.get("BLOCKCHAIN_METRICS"):
+        metrics.enable()
+        metrics.dump_on_signal()
     roll_no = input("Enter your roll number (default: 0000): ").strip() or "0000"
-    system = BlockchainSystem(roll_no)
+    system = BlockchainSystem(roll_no, data_dir=data_dir)
     
     print("\n" + "="*60)
     print("MINI BLOCKCHAIN SYSTEM")
@@ -178,8 +613,8 @@ def main():
         print("1. Create Account")
         print("2. View Account Balances")
         print("3. Create Transaction")
-        # print("4. View Pending Transactions")
-        # print("5. Mine Block")
+        print("4. View Pending Transactions")
+        print("5. Mine Block")
         print("6. View Blockchain")
         print("7. Validate Blockchain")
         print("8. Exit")
@@ -190,7 +625,7 @@ def main():
         if choice == "1":
             account_name = input("Enter account name: ").strip()
             try:
-                balance = float(input("Enter initial balance: "))
+                balance = to_units(input("Enter initial balance: "))
                 system.create_account(account_name, balance)
             except ValueError:
                 print("Invalid balance! Please enter a numeric value.")
@@ -202,8 +637,9 @@ def main():
             sender = input("Enter sender account: ").strip()
             receiver = input("Enter receiver account: ").strip()
             try:
-                amount = float(input("Enter transaction amount: "))
-                system.create_transaction(sender, receiver, amount)
+                amount = to_units(input("Enter transaction amount: "))
+                fee = to_units(input("Enter fee for priority (default: 0): ").strip() or 0)
+                system.create_transaction(sender, receiver, amount, fee)
             except ValueError:
                 print("Invalid amount! Please enter a numeric value.")
         
@@ -220,6 +656,10 @@ def main():
             system.validate_blockchain()
         
         elif choice == "8":
+            if data_dir:
+                system.blockchain.chain.close()
+            system.accounts.close()
+            system.index.close()
             print("Thank you for using Mini Blockchain System!")
             break
         
@@ -0,0 +1,229 @@
+import heapq, itertools
+from collections import deque
+
+
+class _Entry:
+    __slots__ = ("tx", "size", "fee_rate", "seq", "removed")
+
+    def __init__(self, tx, seq):
+        self.tx = tx
+        self.size = len(tx.serialize())
+        self.fee_rate = tx.fee / self.size
+        self.seq = seq
+        self.removed = False
+
+
+class Mempool:
+    def __init__(self, max_bytes=5_000_000):
+        """
+        Pending transactions ordered by fee per byte.
+
+        Each sender's transactions form a nonce-ordered queue; only the head
+        of a queue is eligible for the next block and only the tail may be
+        evicted, so a sender's nonces never develop gaps. Two lazily pruned
+        heaps give O(log n) access to the best head and the cheapest tail;
+        both are rebuilt from the queues once their stale items outnumber
+        the pending transactions, so they never hold more than a few items
+        per transaction.
+        """
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries = {}    # tx hash -> _Entry, in arrival order
+        self._queues = {}     # sender -> deque of _Entry by nonce
+        self._ready = []      # max-heap by fee rate (then age) over queue heads
+        self._tails = []      # min-heap by fee rate (then youth) over queue tails
+        self._debits = {}     # sender -> total reserved by pending transactions
+        self._seq = itertools.count()
+        self._pushes = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return (entry.tx for entry in self._entries.values())
+
+    def __contains__(self, tx_hash):
+        return tx_hash in self._entries
+
+    def get(self, tx_hash):
+        """Pending transaction by hash, or None"""
+        entry = self._entries.get(tx_hash)
+        return entry.tx if entry is not None else None
+
+    def pending_debit(self, sender):
+        """Funds already reserved by the sender's pending transactions"""
+        return self._debits.get(sender, 0)
+
+    def next_nonce(self, sender, confirmed_nonce):
+        """Nonce for the sender's next transaction"""
+        queue = self._queues.get(sender)
+        return queue[-1].tx.nonce + 1 if queue else confirmed_nonce
+
+    def add(self, tx):
+        """
+        Admit a transaction, evicting the lowest fee-rate tails if the pool
+        is over its byte limit. Returns the evicted transactions.
+        """
+        if tx.hash in self._entries:
+            raise Exception("Transaction already in mempool.")
+        entry = _Entry(tx, next(self._seq))
+        queue = self._queues.get(tx.sender)
+        if queue and tx.nonce <= queue[-1].tx.nonce:
+            raise Exception("Transaction nonce is out of order.")
+
+        # Make room first; a transaction that pays no more than what it
+        # would displace is refused
+        evicted = []
+        while self.size_bytes + entry.size > self.max_bytes:
+            cheapest = self._peek(self._tails)
+            # Never evict the transaction the new one builds on
+            if cheapest is None or cheapest.fee_rate >= entry.fee_rate or cheapest.tx.sender == tx.sender:
+                for tx_back in reversed(evicted):
+                    self._insert(_Entry(tx_back, next(self._seq)))
+                raise Exception("Mempool full: fee too low.")
+            self._remove_tail(cheapest)
+            evicted.append(cheapest.tx)
+
+        self._insert(entry)
+        self._compact()
+        return evicted
+
+    def _insert(self, entry):
+        tx = entry.tx
+        queue = self._queues.setdefault(tx.sender, deque())
+        queue.append(entry)
+        self._entries[tx.hash] = entry
+        self.size_bytes += entry.size
+        self._debits[tx.sender] = self._debits.get(tx.sender, 0) + tx.total_deducted
+        if len(queue) == 1:
+            self._push_ready(entry)
+        self._push_tail(entry)
+
+    # Heap items carry a unique push counter so entries themselves are never compared
+    def _push_ready(self, entry):
+        heapq.heappush(self._ready, (-entry.fee_rate, entry.seq, next(self._pushes), entry))
+
+    def _push_tail(self, entry):
+        heapq.heappush(self._tails, (entry.fee_rate, -entry.seq, next(self._pushes), entry))
+
+    def _compact(self):
+        """Rebuild both heaps from the queues once stale items outnumber live transactions"""
+        stale = len(self._ready) + len(self._tails) - 2 * len(self._queues)
+        if stale <= len(self._entries):
+            return
+        self._ready = [(-q[0].fee_rate, q[0].seq, next(self._pushes), q[0]) for q in self._queues.values()]
+        self._tails = [(q[-1].fee_rate, -q[-1].seq, next(self._pushes), q[-1]) for q in self._queues.values()]
+        heapq.heapify(self._ready)
+        heapq.heapify(self._tails)
+
+    def _peek(self, heap):
+        """Top of a heap after discarding stale items"""
+        while heap:
+            entry = heap[0][-1]
+            queue = self._queues.get(entry.tx.sender)
+            stale = entry.removed or (heap is self._ready and queue[0] is not entry) \
+                or (heap is self._tails and queue[-1] is not entry)
+            if not stale:
+                return entry
+            heapq.heappop(heap)
+        return None
+
+    def _detach(self, entry):
+        entry.removed = True
+        tx = entry.tx
+        del self._entries[tx.hash]
+        self.size_bytes -= entry.size
+        self._debits[tx.sender] -= tx.total_deducted
+        if not self._queues[tx.sender]:
+            del self._queues[tx.sender]
+            del self._debits[tx.sender]
+
+    def _remove_tail(self, entry):
+        queue = self._queues[entry.tx.sender]
+        queue.pop()
+        self._detach(entry)
+        if queue:
+            self._push_tail(queue[-1])
+
+    def _remove_head(self, entry):
+        queue = self._queues[entry.tx.sender]
+        queue.popleft()
+        self._detach(entry)
+        if queue:
+            self._push_ready(queue[0])
+
+    def remove(self, tx_hash):
+        """
+        Drop a transaction (e.g. one confirmed elsewhere). Removing from the
+        middle of a sender queue also drops the later nonces that depend on it.
+        """
+        entry = self._entries.get(tx_hash)
+        if entry is None:
+            return []
+        queue = self._queues[entry.tx.sender]
+        dropped = []
+        while queue[-1] is not entry:
+            dropped.append(queue[-1].tx)
+            self._remove_tail(queue[-1])
+        if queue[0] is entry:
+            self._remove_head(entry)
+        else:
+            self._remove_tail(entry)
+        self._compact()
+        return [entry.tx] + dropped
+
+    def prune(self, sender, next_nonce):
+        """
+        Drop the sender's queued transactions whose nonces a block already
+        used, e.g. after accepting a block mined elsewhere
+        """
+        queue = self._queues.get(sender)
+        dropped = []
+        while queue and queue[0].tx.nonce < next_nonce:
+            dropped.append(queue[0].tx)
+            self._remove_head(queue[0])
+            queue = self._queues.get(sender)
+        self._compact()
+        return dropped
+
+    def pop_block(self, max_bytes=1_000_000, max_count=None):
+        """
+        Remove and return the best transactions that fit in a block,
+        highest fee per byte first while keeping each sender's nonce order
+        """
+        selected = []
+        skipped = []
+        used = 0
+        while max_count is None or len(selected) < max_count:
+            entry = self._peek(self._ready)
+            if entry is None:
+                break
+            heapq.heappop(self._ready)
+            if used + entry.size > max_bytes:
+                skipped.append(entry)   # Too big for what is left; try smaller ones
+                continue
+            used += entry.size
+            self._remove_head(entry)
+            selected.append(entry.tx)
+        for entry in skipped:
+            self._push_ready(entry)
+        self._compact()
+        return selected
+
+    def restore(self, transactions):
+        """Put popped transactions back at the front of their sender queues"""
+        senders = set()
+        for tx in reversed(transactions):
+            entry = _Entry(tx, next(self._seq))
+            queue = self._queues.setdefault(tx.sender, deque())
+            queue.appendleft(entry)
+            self._entries[tx.hash] = entry
+            self.size_bytes += entry.size
+            self._debits[tx.sender] = self._debits.get(tx.sender, 0) + tx.total_deducted
+            if len(queue) == 1:
+                self._push_tail(entry)
+            senders.add(tx.sender)
+        # Only each queue's final head is eligible; a replaced head's item goes stale
+        for sender in senders:
+            self._push_ready(self._queues[sender][0])
+        self._compact()
@@ -0,0 +1,71 @@
+import hashlib
+
+# Leaves and interior nodes are hashed with different prefixes so a leaf
+# can never be passed off as an interior node (second-preimage attack).
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+
+def hash_leaf(data):
+    """Hash raw leaf bytes (e.g. a serialized transaction)"""
+    return hashlib.sha256(LEAF_PREFIX + data).digest()
+
+
+def hash_node(left, right):
+    """Hash two child digests into their parent"""
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+class MerkleTree:
+    def __init__(self, leaves):
+        """
+        Build every level of the tree over a list of 32-byte leaf hashes.
+        An odd node at the end of a level is promoted unchanged.
+        """
+        self.levels = [list(leaves)]
+        while len(self.levels[-1]) > 1:
+            level = self.levels[-1]
+            parents = [hash_node(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+            if len(level) % 2:
+                parents.append(level[-1])
+            self.levels.append(parents)
+
+    @property
+    def root(self):
+        """Root digest; the hash of nothing for an empty tree"""
+        if not self.levels[0]:
+            return hashlib.sha256(b"").digest()
+        return self.levels[-1][0]
+
+    def proof(self, index):
+        """
+        Inclusion proof for leaf `index`: a list of (sibling hex, side)
+        pairs from the leaf upwards, side being "L" or "R"
+        """
+        if not 0 <= index < len(self.levels[0]):
+            raise IndexError("Leaf index out of range.")
+        path = []
+        for level in self.levels[:-1]:
+            sibling = index ^ 1
+            if sibling < len(level):
+                path.append((level[sibling].hex(), "L" if sibling < index else "R"))
+            index //= 2
+        return path
+
+
+def merkle_root(leaves):
+    """Root digest over a list of leaf hashes"""
+    return MerkleTree(leaves).root
+
+
+def verify_proof(leaf, proof, root):
+    """
+    Check an inclusion proof in O(log n) hashes.
+    `leaf` and `root` are 32-byte digests or their hex form.
+    """
+    node = bytes.fromhex(leaf) if isinstance(leaf, str) else leaf
+    root = bytes.fromhex(root) if isinstance(root, str) else root
+    for sibling, side in proof:
+        sibling = bytes.fromhex(sibling)
+        node = hash_node(sibling, node) if side == "L" else hash_node(node, sibling)
+    return node == root
@@ -0,0 +1,159 @@
+"""
+Process-wide metrics: counters, gauges and histograms, rendered in the
+Prometheus text exposition format.
+
+Recording is off until enable() is called. While off, counters and timers
+return after a single flag check, and gauges cost nothing at all because
+they are read only when the metrics are rendered.
+"""
+import bisect, functools, signal, sys, time
+
+enabled = False
+
+# Seconds; the last bucket (+Inf) is implicit
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, amount=1):
+        if enabled:
+            self.value += amount
+
+    def samples(self):
+        yield self.name, self.value
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name, help, read=None):
+        """
+        A value that goes up and down; `read` is called at render time
+        """
+        self.name = name
+        self.help = help
+        self.read = read
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self):
+        yield self.name, self.read() if self.read is not None else self.value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        if enabled:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            yield f'{self.name}_bucket{{le="{bound}"}}', cumulative
+        yield f"{self.name}_sum", self.sum
+        yield f"{self.name}_count", self.count
+
+
+_registry = {}   # name -> metric, in registration order
+
+
+def _register(cls, name, help, *args):
+    metric = _registry.get(name)
+    if metric is None:
+        metric = _registry[name] = cls(name, help, *args)
+    return metric
+
+
+def counter(name, help=""):
+    return _register(Counter, name, help)
+
+
+def histogram(name, help="", buckets=DEFAULT_BUCKETS):
+    return _register(Histogram, name, help, buckets)
+
+
+def gauge(name, help="", read=None):
+    """
+    Get or create a gauge; passing `read` (re)binds it to a callback, e.g.
+    to the system that currently owns the value
+    """
+    metric = _register(Gauge, name, help)
+    if read is not None:
+        metric.read = read
+    return metric
+
+
+def timed(name, help=""):
+    """
+    Decorator recording each call's duration in the histogram `name`
+    """
+    metric = histogram(name, help)
+
+    def decorate(func):
+        @functools.wraps(func)
+        def timed_call(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metric.observe(time.perf_counter() - start)
+        return timed_call
+    return decorate
+
+
+def render():
+    """
+    Every metric in the Prometheus text format
+    """
+    lines = []
+    for metric in _registry.values():
+        if metric.help:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for sample, value in metric.samples():
+            lines.append(f"{sample} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def dump(stream=None):
+    """
+    Write the current values, e.g. from a shell or a signal handler
+    """
+    (stream or sys.stderr).write(render())
+
+
+def dump_on_signal(signum=getattr(signal, "SIGUSR1", None)):
+    """
+    Dump the metrics to stderr whenever the process receives `signum`
+    (SIGUSR1 by default; unavailable on Windows)
+    """
+    if signum is not None:
+        signal.signal(signum, lambda *_: dump())
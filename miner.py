@@ -1,39 +1,485 @@
-from block import Block
+import os, time
+from block import Block, NONCE, difficulty_target
+from retarget import Retargeter, MEDIAN_SPAN
+import metrics
+
+HASHES = metrics.counter("blockchain_hashes_total", "Proof-of-work hashes computed while mining")
+
+
+def _scan(midstate, first, last, target):
+    """
+    Try nonces in [first, last) against a precomputed header midstate.
+    Returns (nonce, hex hash) of the first hit or None.
+    """
+    pack = NONCE.pack
+    from_bytes = int.from_bytes
+    for nonce in range(first, last):
+        sha = midstate.copy()
+        sha.update(pack(nonce))
+        digest = sha.digest()
+        if from_bytes(digest, "big") < target:
+            return nonce, digest.hex()
+    return None
+
+
+def _search_nonces(block, worker_id, workers, chunk_size, found, results):
+    """
+    Worker loop: scan nonce chunks worker_id, worker_id + workers, ...
+    until this worker or another one finds a hash below the target
+    """
+    midstate = block.midstate()
+    target = difficulty_target(block.difficulty)
+    hashes = 0
+    start = time.perf_counter()
+    chunk = worker_id
+    while not found.is_set():
+        first = chunk * chunk_size
+        hit = _scan(midstate, first, first + chunk_size, target)
+        if hit is not None:
+            hashes += hit[0] - first + 1
+            found.set()
+            results.put(("found", worker_id) + hit)
+            break
+        hashes += chunk_size
+        chunk += workers
+    results.put(("stats", worker_id, hashes, time.perf_counter() - start))
+
+
+def _block_is_consistent(block):
+    """
+    Self-contained checks for one block: header hash, merkle root, proof-of-work
+    """
+    return (block.hash == block.compute_hash()
+            and block.merkle_root == block.compute_merkle_root()
+            and block.has_valid_proof())
+
+
+def block_work(difficulty):
+    """
+    Expected number of hashes needed to find a block at `difficulty` bits
+    """
+    return 1 << difficulty
+
+
+def _verify_chunk(blocks):
+    """
+    Pool task: offset of the first inconsistent block in the chunk, or -1
+    """
+    for offset, block in enumerate(blocks):
+        if not _block_is_consistent(block):
+            return offset
+    return -1
+
+
+def _worker_stats(worker_id, hashes, elapsed):
+    return {
+        'worker': worker_id,
+        'hashes': hashes,
+        'seconds': elapsed,
+        'hash_rate': hashes / elapsed if elapsed > 0 else 0.0
+    }
+
+
+class ParallelMiner:
+    def __init__(self, workers=None, chunk_size=10000):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+    @metrics.timed("blockchain_pow_seconds", "Time spent searching for a proof-of-work nonce")
+    def mine(self, block):
+        """
+        Search the nonce space of `block` for a hash meeting its difficulty.
+        Sets block.nonce / block.hash and returns per-worker statistics.
+        """
+        if block.difficulty <= 0 or self.workers == 1:
+            return self._mine_serial(block)
+
+        import multiprocessing
+        found = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=_search_nonces,
+                args=(block, worker_id, self.workers, self.chunk_size, found, results),
+                daemon=True
+            )
+            for worker_id in range(self.workers)
+        ]
+        for process in processes:
+            process.start()
+
+        # Drain the queue before joining so no worker blocks on a full pipe
+        winner = None
+        stats = []
+        while len(stats) < self.workers:
+            message = results.get()
+            if message[0] == "found":
+                if winner is None:
+                    winner = message[2:]
+            else:
+                stats.append(_worker_stats(*message[1:]))
+        for process in processes:
+            process.join()
+
+        block.nonce, block.hash = winner
+        return sorted(stats, key=lambda s: s['worker'])
+
+    def _mine_serial(self, block):
+        midstate = block.midstate()
+        target = difficulty_target(block.difficulty)
+        start = time.perf_counter()
+        first = 0
+        hit = None
+        while hit is None:
+            hit = _scan(midstate, first, first + self.chunk_size, target)
+            first += self.chunk_size
+        block.nonce, block.hash = hit
+        hashes = hit[0] + 1
+        return [_worker_stats(0, hashes, time.perf_counter() - start)]
+
 
 class Blockchain:
-    def __init__(self, roll_no="0000"):
-        self.chain = []
-        self.create_genesis_block(roll_no)
+    def __init__(self, roll_no="0000", difficulty=0, workers=1, store=None, genesis=None,
+                 target_interval=None, retarget_window=60):
+        # `store` is any list-like block container, e.g. storage.BlockStore;
+        # nodes that share a network must start from the same `genesis` block
+        self.chain = store if store is not None else []
+        self.difficulty = difficulty   # Required for the next block
+        self.initial_difficulty = difficulty
+        # With a target interval (seconds) the difficulty follows the hash rate
+        # and block timestamps must pass the median-time-past rule
+        self.retarget = Retargeter(target_interval, retarget_window) if target_interval else None
+        self.miner = ParallelMiner(workers)
+        self.last_mining_stats = []
+        self.max_reorg_depth = 1000
+        # Blocks off the main chain: hash -> (block, height, cumulative work)
+        self._side = {}
+        self._best_side = None   # Side block with the most cumulative work
+        self._work = []          # Cumulative work by main-chain height, filled lazily
+        self._heights = None     # Main-chain hash -> height, built on first lookup
+        if len(self.chain) == 0:
+            if genesis is not None:
+                self.chain.append(genesis)
+            else:
+                self.create_genesis_block(roll_no)
+        # Highest block known to be valid; the genesis hash is only looked up
+        # by the first validation, so opening a stored chain reads no blocks
+        # (with retargeting, just the headers of the window)
+        self.validated_height = 0
+        self.validated_hash = None
+        self._reset_retarget()
 
     def create_genesis_block(self, roll_no):
         """
         Create the first block (genesis block)
         """
-        genesis_block = Block(transactions="Genesis Block", prev_hash="0", roll_no=roll_no)
+        genesis_block = Block(transactions=[], prev_hash="0", roll_no=roll_no)
         self.chain.append(genesis_block)
 
     def add_block(self, transactions, roll_no):
         """
-        Add a block to the chain after verifying previous hash
+        Mine a block at the current difficulty and add it to the chain
+        after verifying previous hash
         """
         prev_block = self.chain[-1]
-        new_block = Block(transactions=transactions, prev_hash=prev_block.hash, roll_no=roll_no)
+        new_block = Block(transactions=transactions, prev_hash=prev_block.hash, roll_no=roll_no,
+                          difficulty=self.difficulty)
+        self.last_mining_stats = self.mine(new_block)
 
-        if new_block.prev_hash == prev_block.hash:
-            self.chain.append(new_block)
+        if new_block.prev_hash == prev_block.hash and new_block.has_valid_proof():
+            self._append(new_block)
             return True
         return False
 
-    def is_valid(self):
+    def mine(self, block):
         """
-        Validate the blockchain by checking hashes
+        Search the nonce of `block`; returns per-worker statistics. Reads
+        nothing from the chain, so it can run while the chain is in use.
         """
-        for i in range(1, len(self.chain)):
+        stats = self.miner.mine(block)
+        HASHES.inc(sum(s['hashes'] for s in stats))
+        return stats
+
+    def _append(self, block):
+        self.chain.append(block)
+        if self._heights is not None:
+            self._heights[block.hash] = len(self.chain) - 1
+        if self._work and len(self._work) == len(self.chain) - 1:
+            self._work.append(self._work[-1] + block_work(block.difficulty))
+        if self.retarget is not None:
+            self.retarget.push(block.timestamp, block.difficulty)
+            self.difficulty = self.retarget.next_difficulty(block.difficulty)
+
+    # ------------------------------------------------------------- retargeting
+
+    def _tail(self, prev_hash):
+        """
+        (timestamp, difficulty) of the blocks after genesis that the
+        retargeting window and median-time-past look at, ending at `prev_hash`
+        """
+        span = max(self.retarget.window, MEDIAN_SPAN)
+        tail = []
+        while len(tail) < span:
+            height = self.height_of(prev_hash)
+            if height is not None:
+                first = max(1, height - (span - len(tail)) + 1)
+                tail.extend((self.chain[h].timestamp, self.chain[h].difficulty)
+                            for h in range(height, first - 1, -1))
+                break
+            if prev_hash not in self._side:
+                break
+            block = self._side[prev_hash][0]
+            tail.append((block.timestamp, block.difficulty))
+            prev_hash = block.prev_hash
+        return tail[::-1]
+
+    def _reset_retarget(self):
+        if self.retarget is None:
+            return
+        self.retarget.reset(self._tail(self.chain[-1].hash))
+        tip = self.chain[-1]
+        self.difficulty = (self.retarget.next_difficulty(tip.difficulty) if len(self.chain) > 1
+                           else self.initial_difficulty)
+
+    def _fits_schedule(self, block):
+        """
+        Whether `block` carries the difficulty its parent requires and, when
+        retargeting, a timestamp that passes the median-time-past rule
+        """
+        if self.retarget is None:
+            return block.difficulty >= self.difficulty
+        if block.prev_hash == self.chain[-1].hash:
+            rules, expected = self.retarget, self.difficulty
+        else:
+            tail = self._tail(block.prev_hash)
+            rules = self.retarget.spawn(tail)
+            expected = rules.next_difficulty(tail[-1][1]) if tail else self.initial_difficulty
+        return block.difficulty == expected and rules.timestamp_ok(block.timestamp)
+
+    def _follows_schedule(self, start):
+        """
+        Whether main-chain blocks from `start` to the tip carry the
+        difficulty the schedule required of them (and, when retargeting,
+        timestamps passing the median-time-past rule), replaying the
+        retarget window from the headers before `start`. Reads headers only.
+        """
+        if self.retarget is None:
+            return all(self.chain[i].difficulty >= self.initial_difficulty
+                       for i in range(start, len(self.chain)))
+        span = max(self.retarget.window, MEDIAN_SPAN)
+        rules = self.retarget.spawn((self.chain[h].timestamp, self.chain[h].difficulty)
+                                    for h in range(max(1, start - span), start))
+        previous = self.chain[start - 1].difficulty
+        for i in range(start, len(self.chain)):
+            block = self.chain[i]
+            expected = rules.next_difficulty(previous) if i > 1 else self.initial_difficulty
+            if block.difficulty != expected or not rules.timestamp_ok(block.timestamp):
+                return False
+            rules.push(block.timestamp, block.difficulty)
+            previous = block.difficulty
+        return True
+
+    def append_block(self, block, verified=False):
+        """
+        Add a block mined elsewhere after checking that it extends the tip
+        with a valid hash, merkle root and proof-of-work. `verified` skips the
+        self-contained checks for blocks the caller has already verified.
+        """
+        if block.prev_hash != self.chain[-1].hash or not self._fits_schedule(block):
+            return False
+        if not verified and not _block_is_consistent(block):
+            return False
+        if self._side.pop(block.hash, None) is not None:
+            self._refresh_best_side()
+        self._append(block)
+        return True
+
+    # ------------------------------------------------------------ block tree
+
+    def height_of(self, block_hash):
+        """
+        Main-chain height of a block, or None. The tip is answered without
+        the hash -> height map, which is built from every stored header the
+        first time a block below the tip or off the main chain is looked up.
+        """
+        if self._heights is None:
+            if block_hash == self.chain[-1].hash:
+                return len(self.chain) - 1
+            self._heights = {self.chain[height].hash: height for height in range(len(self.chain))}
+        return self._heights.get(block_hash)
+
+    def knows(self, block_hash):
+        """
+        Whether the block is on the main chain or a side branch
+        """
+        return block_hash in self._side or self.height_of(block_hash) is not None
+
+    def get_block(self, block_hash):
+        height = self.height_of(block_hash)
+        if height is not None:
+            return self.chain[height]
+        entry = self._side.get(block_hash)
+        return entry[0] if entry is not None else None
+
+    def chain_work(self, height=None):
+        """
+        Cumulative work of the main chain up to `height` (default: the tip)
+        """
+        if height is None:
+            height = len(self.chain) - 1
+        while len(self._work) <= height:
+            previous = self._work[-1] if self._work else 0
+            self._work.append(previous + block_work(self.chain[len(self._work)].difficulty))
+        return self._work[height]
+
+    def best_tip(self):
+        """
+        (hash, cumulative work) of the most-work block known, in O(1)
+        """
+        tip = (self.chain[-1].hash, self.chain_work())
+        if self._best_side is not None:
+            block, _, work = self._side[self._best_side]
+            if work > tip[1]:
+                return block.hash, work
+        return tip
+
+    def add_side_block(self, block):
+        """
+        Store a valid block whose parent is known but is not the tip.
+        Returns its cumulative work, or None if it cannot be placed.
+        """
+        if self.knows(block.hash):
+            return None
+        parent_height = self.height_of(block.prev_hash)
+        if parent_height is not None:
+            height, parent_work = parent_height + 1, self.chain_work(parent_height)
+        elif block.prev_hash in self._side:
+            _, parent_height, parent_work = self._side[block.prev_hash]
+            height = parent_height + 1
+        else:
+            return None
+        if height < len(self.chain) - self.max_reorg_depth:
+            return None
+        if not self._fits_schedule(block) or not _block_is_consistent(block):
+            return None
+
+        work = parent_work + block_work(block.difficulty)
+        self._side[block.hash] = (block, height, work)
+        if self._best_side is None or work > self._side[self._best_side][2]:
+            self._best_side = block.hash
+        return work
+
+    def branch(self, tip_hash):
+        """
+        Walk a side branch back to the main chain.
+        Returns (fork height, branch blocks oldest first).
+        """
+        blocks = []
+        while tip_hash in self._side:
+            block = self._side[tip_hash][0]
+            blocks.append(block)
+            tip_hash = block.prev_hash
+        return self.height_of(tip_hash), blocks[::-1]
+
+    def truncate(self, height):
+        """
+        Detach main-chain blocks above `height`; they stay known as a side branch
+        """
+        for h in range(len(self.chain) - 1, height, -1):
+            block = self.chain[h]
+            self._side[block.hash] = (block, h, self.chain_work(h))
+            if self._heights is not None:
+                del self._heights[block.hash]
+        if hasattr(self.chain, "truncate"):
+            self.chain.truncate(height + 1)
+        else:
+            del self.chain[height + 1:]
+        del self._work[height + 1:]
+        self._refresh_best_side()
+        self._reset_retarget()
+        if self.validated_height > height:
+            self._checkpoint(height)
+
+    def forget(self, block_hash):
+        """
+        Drop a side block found to be invalid, along with its descendants
+        """
+        doomed = {block_hash}
+        for h, (block, _, _) in sorted(self._side.items(), key=lambda item: item[1][1]):
+            if block.prev_hash in doomed:
+                doomed.add(h)
+        for h in doomed:
+            self._side.pop(h, None)
+        self._refresh_best_side()
+
+    def _refresh_best_side(self):
+        self._best_side = max(self._side, key=lambda h: self._side[h][2], default=None)
+
+    def hash_rate(self):
+        """
+        Combined hashes/second of all workers during the last mined block
+        """
+        return sum(s['hash_rate'] for s in self.last_mining_stats)
+
+    @metrics.timed("blockchain_chain_validation_seconds", "Time to validate the chain")
+    def is_valid(self, full=False):
+        """
+        Validate the blockchain by checking hashes, merkle roots, proof-of-work
+        and that each block's difficulty follows the schedule. Only blocks
+        appended since the last successful check are re-verified unless
+        `full` is set, which runs a parallel audit from genesis.
+        """
+        if full:
+            return self.audit()
+
+        start = self.validated_height + 1
+        # Start over if the checkpointed block was replaced or truncated away
+        if (self.validated_height >= len(self.chain)
+                or self.chain[self.validated_height].hash != self.validated_hash):
+            start = 1
+
+        for i in range(start, len(self.chain)):
             current = self.chain[i]
             prev = self.chain[i - 1]
 
             if current.prev_hash != prev.hash:
                 return False
-            if current.hash != current.compute_hash():
+            if not _block_is_consistent(current):
                 return False
-        return True
\ No newline at end of file
+        if not self._follows_schedule(start):
+            return False
+
+        self._checkpoint(len(self.chain) - 1)
+        return True
+
+    def audit(self, workers=None, chunk_size=5000):
+        """
+        Full re-validation from genesis: block hashes are recomputed in chunks
+        on a process pool, then prev-hash links and the difficulty schedule
+        are checked in one linear pass over the headers
+        """
+        blocks = self.chain[1:]
+        chunks = [blocks[i:i + chunk_size] for i in range(0, len(blocks), chunk_size)]
+        workers = workers or os.cpu_count() or 1
+
+        if workers == 1 or len(chunks) <= 1:
+            results = map(_verify_chunk, chunks)
+        else:
+            import multiprocessing
+            with multiprocessing.Pool(workers) as pool:
+                results = pool.map(_verify_chunk, chunks)
+        if any(result != -1 for result in results):
+            return False
+
+        for i in range(1, len(self.chain)):
+            if self.chain[i].prev_hash != self.chain[i - 1].hash:
+                return False
+        if not self._follows_schedule(1):
+            return False
+
+        self._checkpoint(len(self.chain) - 1)
+        return True
+
+    def _checkpoint(self, height):
+        self.validated_height = height
+        self.validated_hash = self.chain[height].hash
@@ -0,0 +1,406 @@
+"""
+Peer-to-peer gossip of transactions and blocks between BlockchainSystem nodes.
+
+Nodes talk over TCP with length-prefixed binary frames. New transactions
+and blocks are announced by hash (INV); a peer fetches only what it lacks
+(GETDATA) and relays what it accepts. Initial sync learns the missing block
+hashes from the tallest peer (GETBLOCKS/HASHES) and then fetches the bodies
+from every peer that has them in parallel; blocks that arrive ahead of their
+parent wait in an orphan buffer until it lands. Blocks on competing branches
+are handed to BlockchainSystem.accept_block, which reorganizes onto the
+branch with the most work.
+
+All nodes of a network must be created with the same genesis block.
+"""
+import asyncio, json, struct
+from collections import deque
+from block import Block
+from transaction import Transaction
+
+# Frame: message type (u8) | payload length (u32) | payload
+_HEADER = struct.Struct(">BI")
+_HEIGHT = struct.Struct(">I")
+VERSION, INV, GETDATA, TX, BLOCK, GETBLOCKS, HASHES, NOTFOUND = range(8)
+INV_TX, INV_BLOCK = 1, 2
+MAX_FRAME = 32 * 1024 * 1024
+MAX_HASHES = 500     # Block hashes per HASHES reply
+MAX_ORPHANS = 2000
+MAX_MALFORMED = 10   # Undecodable messages tolerated from a peer before dropping it
+# What decoding a malformed payload raises
+_MALFORMED = (ValueError, IndexError, struct.error)
+
+
+def _inventory(kind, hashes):
+    return bytes([kind]) + b"".join(bytes.fromhex(h) for h in hashes)
+
+
+def _parse_inventory(payload):
+    return payload[0], [payload[i:i + 32].hex() for i in range(1, len(payload), 32)]
+
+
+class Peer:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.height = -1        # Best height the peer is known to have
+        self.inflight = set()   # Block hashes requested from this peer
+        self.hashes = None      # Future for an outstanding GETBLOCKS reply
+        self.malformed = 0      # Messages from this peer that failed to decode
+        self.task = None
+
+    def send(self, kind, payload=b""):
+        self.writer.write(_HEADER.pack(kind, len(payload)) + payload)
+
+    async def receive(self):
+        kind, length = _HEADER.unpack(await self.reader.readexactly(_HEADER.size))
+        if length > MAX_FRAME:
+            raise ConnectionError("Frame too large.")
+        return kind, await self.reader.readexactly(length)
+
+    def close(self):
+        self.writer.close()
+
+
+class Node:
+    def __init__(self, system, host="127.0.0.1", port=0, sync_batch=32, timeout=10.0):
+        self.system = system
+        self.host = host
+        self.port = port
+        self.sync_batch = sync_batch   # Blocks per GETDATA during sync
+        self.timeout = timeout
+        self.peers = []
+        self.server = None
+        self._orphans = {}     # hash -> block whose parent has not arrived
+        self._children = {}    # parent hash -> orphan hash
+        self._requested = {}   # block hash -> future resolved when the block arrives
+        self._waiters = {}     # block hash -> futures from wait_for_block
+        self._syncing = False
+        self._lock = None      # Serializes everything that reads or changes the system
+
+    @property
+    def height(self):
+        return len(self.system.blockchain.chain) - 1
+
+    # ------------------------------------------------------------ connections
+
+    async def start(self):
+        """Listen for peers; returns the bound port"""
+        self._lock = asyncio.Lock()
+        self.server = await asyncio.start_server(self._accept, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def connect(self, host, port):
+        """Open a connection to another node and exchange versions"""
+        peer = Peer(*await asyncio.open_connection(host, port))
+        peer.send(VERSION, self._version())
+        if not self._handshake(peer, *await peer.receive()):
+            return None
+        peer.task = asyncio.ensure_future(self._serve(peer))
+        return peer
+
+    async def _accept(self, reader, writer):
+        peer = Peer(reader, writer)
+        peer.task = asyncio.current_task()
+        try:
+            if self._handshake(peer, *await peer.receive()):
+                peer.send(VERSION, self._version())
+                await self._serve(peer)
+        except (asyncio.IncompleteReadError, ConnectionError, *_MALFORMED):
+            peer.close()
+
+    def _version(self):
+        chain = self.system.blockchain.chain
+        return json.dumps({"height": self.height, "genesis": chain[0].hash}).encode()
+
+    def _handshake(self, peer, kind, payload):
+        version = json.loads(payload) if kind == VERSION else {}
+        if version.get("genesis") != self.system.blockchain.chain[0].hash:
+            peer.close()
+            return False
+        peer.height = version["height"]
+        self.peers.append(peer)
+        return True
+
+    async def _serve(self, peer):
+        try:
+            while True:
+                kind, payload = await peer.receive()
+                try:
+                    await self._handle(peer, kind, payload)
+                except _MALFORMED:
+                    # Skip the message; a peer that keeps sending garbage is dropped
+                    peer.malformed += 1
+                    if peer.malformed >= MAX_MALFORMED:
+                        break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._drop(peer)
+
+    def _drop(self, peer):
+        if peer in self.peers:
+            self.peers.remove(peer)
+        for block_hash in peer.inflight:
+            future = self._requested.pop(block_hash, None)
+            if future is not None and not future.done():
+                future.set_result(None)
+        if peer.hashes is not None and not peer.hashes.done():
+            peer.hashes.set_result((0, []))
+        peer.close()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        tasks = [peer.task for peer in self.peers if peer.task is not None]
+        for peer in list(self.peers):
+            self._drop(peer)
+        # Closed connections end each read loop at EOF
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # --------------------------------------------------------------- messages
+
+    async def _handle(self, peer, kind, payload):
+        if kind == INV:
+            inv_kind, hashes = _parse_inventory(payload)
+            if inv_kind == INV_TX:
+                wanted = [h for h in hashes if h not in self.system.mempool]
+                if wanted:
+                    peer.send(GETDATA, _inventory(INV_TX, wanted))
+            elif inv_kind == INV_BLOCK:
+                self._request_blocks(peer, hashes)
+
+        elif kind == GETDATA:
+            inv_kind, hashes = _parse_inventory(payload)
+            missing = []
+            async with self._lock:   # Reads the mempool and block store writers change
+                for h in hashes:
+                    if inv_kind == INV_TX:
+                        tx = self.system.mempool.get(h)
+                        if tx is None:
+                            missing.append(h)
+                        else:
+                            peer.send(TX, tx.serialize())
+                    else:
+                        raw = self._block_bytes(h)
+                        if raw is None:
+                            missing.append(h)
+                        else:
+                            peer.send(BLOCK, raw)
+            if missing:
+                peer.send(NOTFOUND, _inventory(inv_kind, missing))
+            await peer.writer.drain()
+
+        elif kind == TX:
+            tx = Transaction.from_bytes(payload)
+            async with self._lock:
+                admitted = self.system.accept_transaction(tx)
+            if admitted:
+                self._announce(INV_TX, [tx.hash], exclude=peer)
+
+        elif kind == BLOCK:
+            await self._receive_block(Block.from_bytes(payload), peer)
+
+        elif kind == GETBLOCKS:
+            # Payload is a block locator: hashes from the peer's tip back to genesis
+            start = 1
+            async with self._lock:
+                for i in range(0, len(payload), 32):
+                    height = self.system.blockchain.height_of(payload[i:i + 32].hex())
+                    if height is not None:
+                        start = height + 1
+                        break
+                chain = self.system.blockchain.chain
+                end = min(len(chain), start + MAX_HASHES)
+                hashes = b"".join(bytes.fromhex(chain[h].hash) for h in range(start, end))
+            peer.send(HASHES, _HEIGHT.pack(start) + hashes)
+
+        elif kind == HASHES:
+            if peer.hashes is not None and not peer.hashes.done():
+                (start,) = _HEIGHT.unpack_from(payload)
+                peer.hashes.set_result((start, [payload[i:i + 32].hex() for i in range(_HEIGHT.size, len(payload), 32)]))
+
+        elif kind == NOTFOUND:
+            inv_kind, hashes = _parse_inventory(payload)
+            for h in hashes if inv_kind == INV_BLOCK else ():
+                peer.inflight.discard(h)
+                future = self._requested.pop(h, None)
+                if future is not None and not future.done():
+                    future.set_result(None)
+
+    def _block_bytes(self, block_hash):
+        height = self.system.blockchain.height_of(block_hash)
+        if height is None:
+            block = self.system.blockchain.get_block(block_hash)   # Side branch
+            return block.serialize() if block is not None else None
+        chain = self.system.blockchain.chain
+        # A BlockStore can hand out the stored bytes without decoding them
+        return chain.read_raw(height) if hasattr(chain, "read_raw") else chain[height].serialize()
+
+    def _announce(self, inv_kind, hashes, exclude=None):
+        payload = _inventory(inv_kind, hashes)
+        for peer in self.peers:
+            if peer is not exclude:
+                peer.send(INV, payload)
+
+    def _request_blocks(self, peer, hashes):
+        """Ask `peer` for the blocks we neither have nor already requested; returns their futures"""
+        loop = asyncio.get_running_loop()
+        futures = []
+        wanted = []
+        for h in hashes:
+            if self.system.blockchain.knows(h) or h in self._orphans:
+                continue
+            future = self._requested.get(h)
+            if future is None:
+                future = self._requested[h] = loop.create_future()
+                peer.inflight.add(h)
+                wanted.append(h)
+            futures.append(future)
+        if wanted:
+            peer.send(GETDATA, _inventory(INV_BLOCK, wanted))
+        return futures
+
+    # ----------------------------------------------------------------- blocks
+
+    async def _receive_block(self, block, source):
+        source.inflight.discard(block.hash)
+        future = self._requested.pop(block.hash, None)
+        if future is not None and not future.done():
+            future.set_result(block)
+        blockchain = self.system.blockchain
+        if blockchain.knows(block.hash) or block.hash in self._orphans:
+            return
+
+        async with self._lock:
+            if not blockchain.knows(block.prev_hash):
+                if len(self._orphans) < MAX_ORPHANS:
+                    # Parent missing: keep the block and catch up with whoever sent it
+                    self._orphans[block.hash] = block
+                    self._children[block.prev_hash] = block.hash
+                    source.height = max(source.height, self.height + 1)
+                    if not self._syncing:
+                        asyncio.ensure_future(self.sync())
+                return
+
+            accepted = []
+            while block is not None:
+                connected = self.system.accept_block(block)
+                if connected is False:
+                    break
+                for main_block in connected:
+                    self._register(main_block)
+                accepted.append(block.hash)
+                child = self._children.pop(block.hash, None)
+                block = self._orphans.pop(child, None) if child else None
+        source.height = max(source.height, self.height)
+        if accepted and not self._syncing:
+            self._announce(INV_BLOCK, accepted, exclude=source)
+
+    def _register(self, block):
+        for waiter in self._waiters.pop(block.hash, ()):
+            if not waiter.done():
+                waiter.set_result(self.height)
+
+    async def wait_for_block(self, block_hash):
+        """Wait until the block is part of our chain; returns its height"""
+        height = self.system.blockchain.height_of(block_hash)
+        if height is not None:
+            return height
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(block_hash, []).append(future)
+        return await future
+
+    async def sync(self):
+        """
+        Catch up with the tallest peers: learn the missing block hashes, then
+        fetch them in batches from every peer that has them concurrently
+        """
+        if self._syncing:
+            return
+        self._syncing = True
+        try:
+            while True:
+                taller = [peer for peer in self.peers if peer.height > self.height]
+                if not taller:
+                    break
+                best = max(taller, key=lambda peer: peer.height)
+                best.hashes = asyncio.get_running_loop().create_future()
+                best.send(GETBLOCKS, self._locator())
+                try:
+                    start, hashes = await asyncio.wait_for(best.hashes, self.timeout)
+                except asyncio.TimeoutError:
+                    start, hashes = 0, []
+                if not hashes:
+                    best.height = self.height   # Nothing new there after all
+                    continue
+                last = start + len(hashes) - 1
+                best.height = max(best.height, last)
+
+                tip = self.system.blockchain.chain[-1].hash
+                sources = [peer for peer in self.peers if peer.height >= last] or [best]
+                batches = deque(hashes[i:i + self.sync_batch] for i in range(0, len(hashes), self.sync_batch))
+                await asyncio.gather(*(self._fetch(peer, batches) for peer in sources))
+                if self.system.blockchain.chain[-1].hash == tip:
+                    break   # No progress; give up until the next announcement
+        finally:
+            self._syncing = False
+        if self.height > 0:
+            self._announce(INV_BLOCK, [self.system.blockchain.chain[-1].hash])
+
+    def _locator(self):
+        """
+        Our main-chain hashes from the tip back to genesis, densely at first
+        and then at doubling steps, so a peer can find where our chains meet
+        """
+        chain = self.system.blockchain.chain
+        hashes = []
+        height, step = self.height, 1
+        while height > 0:
+            hashes.append(chain[height].hash)
+            if len(hashes) >= 10:
+                step *= 2
+            height -= step
+        hashes.append(chain[0].hash)
+        return b"".join(bytes.fromhex(h) for h in hashes)
+
+    async def _fetch(self, peer, batches):
+        """Download batches from one peer until none are left or it stops answering"""
+        while batches and peer in self.peers:
+            batch = batches.popleft()
+            futures = self._request_blocks(peer, batch)
+            try:
+                blocks = await asyncio.wait_for(asyncio.gather(*futures), self.timeout)
+            except asyncio.TimeoutError:
+                blocks = [None]
+            if any(block is None for block in blocks):
+                batches.append(batch)   # Let another peer try
+                return
+
+    # ------------------------------------------------------- local operations
+
+    async def create_transaction(self, sender, receiver, amount, fee=0):
+        """Create a transaction locally and announce it; returns it or False"""
+        async with self._lock:
+            tx = self.system.create_transaction(sender, receiver, amount, fee)
+        if tx:
+            self._announce(INV_TX, [tx.hash])
+        return tx
+
+    async def mine_block(self):
+        """
+        Mine a block and announce it; returns it or None. The lock is held
+        only to build the block and to connect it; the nonce search runs off
+        the event loop without it, so gossip keeps flowing meanwhile.
+        """
+        async with self._lock:
+            block = self.system.block_template()
+        if not block:
+            return None
+        stats = await asyncio.get_running_loop().run_in_executor(None, self.system.blockchain.mine, block)
+        async with self._lock:
+            if not self.system.connect_mined_block(block, stats):
+                return None
+            self._register(block)
+        self._announce(INV_BLOCK, [block.hash])
+        return block
@@ -0,0 +1,98 @@
+import bisect, math, time
+from collections import deque
+
+MEDIAN_SPAN = 11          # Blocks in the median-time-past
+MAX_FUTURE_DRIFT = 7200   # Seconds a timestamp may run ahead of the local clock
+
+
+class Retargeter:
+    def __init__(self, target_interval, window=60, max_step=2, min_difficulty=0, max_difficulty=255):
+        """
+        Difficulty retargeting from a moving window of block timestamps.
+
+        The window holds the timestamps and work of the last `window`
+        blocks after genesis, with the window's total work kept as a
+        running sum, so each new block costs O(1) rather than a rescan.
+        The hash rate the window implies gives the difficulty at which a
+        block takes `target_interval` seconds on average; a step is clamped
+        to `max_step` bits (a factor of 2**max_step in work) so one skewed
+        window cannot swing it far. The last MEDIAN_SPAN timestamps are also
+        kept in sorted order for the median-time-past rule.
+        """
+        self.target_interval = target_interval
+        self.window = window
+        self.max_step = max_step
+        self.min_difficulty = min_difficulty
+        self.max_difficulty = max_difficulty
+        self._times = deque()      # (timestamp, work), oldest first
+        self._work = 0             # Work of every block in the window but the oldest
+        self._recent = deque()     # Last MEDIAN_SPAN timestamps, in chain order
+        self._sorted = []          # The same timestamps, sorted
+
+    def push(self, timestamp, difficulty):
+        """
+        Slide the window forward over a newly connected block
+        """
+        work = 1 << difficulty
+        if self._times:
+            self._work += work
+        self._times.append((timestamp, work))
+        if len(self._times) > self.window:
+            self._times.popleft()
+            self._work -= self._times[0][1]
+
+        self._recent.append(timestamp)
+        bisect.insort(self._sorted, timestamp)
+        if len(self._recent) > MEDIAN_SPAN:
+            self._sorted.pop(bisect.bisect_left(self._sorted, self._recent.popleft()))
+
+    def reset(self, blocks):
+        """
+        Rebuild the window from the (timestamp, difficulty) of the blocks
+        ending at the tip, e.g. after opening a chain or a reorg
+        """
+        self._times.clear()
+        self._work = 0
+        self._recent.clear()
+        self._sorted = []
+        for timestamp, difficulty in blocks:
+            self.push(timestamp, difficulty)
+
+    def spawn(self, blocks):
+        """
+        A retargeter with the same settings over a different chain tail
+        """
+        other = Retargeter(self.target_interval, self.window, self.max_step,
+                           self.min_difficulty, self.max_difficulty)
+        other.reset(blocks)
+        return other
+
+    def median_time_past(self):
+        """
+        Median timestamp of the last MEDIAN_SPAN blocks, or None
+        """
+        if not self._sorted:
+            return None
+        return self._sorted[len(self._sorted) // 2]
+
+    def timestamp_ok(self, timestamp, now=None):
+        """
+        A new block must be later than the median time past and not too
+        far ahead of the local clock
+        """
+        mtp = self.median_time_past()
+        if mtp is not None and timestamp <= mtp:
+            return False
+        return timestamp <= (time.time() if now is None else now) + MAX_FUTURE_DRIFT
+
+    def next_difficulty(self, current):
+        """
+        Difficulty for the block after the tip, whose difficulty is `current`
+        """
+        if len(self._times) < 2:
+            return current
+        timespan = max(self._times[-1][0] - self._times[0][0], 1e-3)
+        hash_rate = self._work / timespan
+        wanted = round(math.log2(max(hash_rate * self.target_interval, 1)))
+        wanted = max(current - self.max_step, min(current + self.max_step, wanted))
+        return max(self.min_difficulty, min(self.max_difficulty, wanted))
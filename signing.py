@@ -0,0 +1,108 @@
+import multiprocessing
+from collections import OrderedDict
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from cryptography.hazmat.primitives.serialization import Encoding, PrivateFormat, PublicFormat, NoEncryption
+
+KEY_SIZE = 32
+
+
+def generate_keypair():
+    """
+    New Ed25519 key pair as raw 32-byte (private key, public key)
+    """
+    private = Ed25519PrivateKey.generate()
+    return (private.private_bytes(Encoding.Raw, PrivateFormat.Raw, NoEncryption()),
+            private.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw))
+
+
+def sign(tx, private_key):
+    """
+    Sign the transaction's canonical serialization in place
+    """
+    tx.signature = Ed25519PrivateKey.from_private_bytes(private_key).sign(tx.signing_payload())
+    return tx
+
+
+def _verify(public_key, payload, signature):
+    try:
+        Ed25519PublicKey.from_public_bytes(public_key).verify(signature, payload)
+        return True
+    except (InvalidSignature, ValueError):
+        return False
+
+
+def _verify_chunk(items):
+    """
+    Pool task: offset of the first bad (public key, payload, signature), or -1
+    """
+    for offset, item in enumerate(items):
+        if not _verify(*item):
+            return offset
+    return -1
+
+
+class SignatureVerifier:
+    def __init__(self, workers=1, chunk_size=256, parallel_threshold=1024, cache_size=100_000):
+        """
+        Checks transaction signatures against account public keys.
+
+        A transaction that verifies is remembered by hash, which covers the
+        signature, so one already checked on mempool admission is skipped
+        when its block arrives. When a block brings at least
+        `parallel_threshold` unchecked signatures they are verified in
+        chunks on a process pool.
+        """
+        self.workers = workers or multiprocessing.cpu_count()
+        self.chunk_size = chunk_size
+        self.parallel_threshold = parallel_threshold
+        self.cache_size = cache_size
+        self._verified = OrderedDict()   # tx hash -> None, least recently used first
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, tx_hash):
+        self._verified[tx_hash] = None
+        if len(self._verified) > self.cache_size:
+            self._verified.popitem(last=False)
+
+    def _cached(self, tx_hash):
+        if tx_hash in self._verified:
+            self._verified.move_to_end(tx_hash)
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def check(self, tx, public_key):
+        """
+        Whether `tx` carries a valid signature by `public_key`
+        """
+        if self._cached(tx.hash):
+            return True
+        if not _verify(public_key, tx.signing_payload(), tx.signature):
+            return False
+        self._remember(tx.hash)
+        return True
+
+    def check_all(self, items):
+        """
+        Verify (transaction, public key) pairs; returns the index of the
+        first pair whose signature is invalid, or -1
+        """
+        pending = [i for i, (tx, _) in enumerate(items) if not self._cached(tx.hash)]
+        work = [(items[i][1], items[i][0].signing_payload(), items[i][0].signature) for i in pending]
+        chunks = [work[i:i + self.chunk_size] for i in range(0, len(work), self.chunk_size)]
+
+        if self.workers == 1 or len(work) < self.parallel_threshold:
+            results = map(_verify_chunk, chunks)
+        else:
+            with multiprocessing.Pool(self.workers) as pool:
+                results = pool.map(_verify_chunk, chunks)
+        for number, result in enumerate(results):
+            if result != -1:
+                return pending[number * self.chunk_size + result]
+
+        for i in pending:
+            self._remember(items[i][0].hash)
+        return -1
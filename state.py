@@ -0,0 +1,311 @@
+import json, sqlite3
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    account TEXT NOT NULL,
+    height  INTEGER NOT NULL,
+    before  INTEGER,         -- NULL when the account was created in this block
+    after   INTEGER NOT NULL,
+    PRIMARY KEY (account, height)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS history_by_height ON history (height);
+CREATE TABLE IF NOT EXISTS mints (
+    height  INTEGER NOT NULL,
+    account TEXT NOT NULL,
+    amount  INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS mints_by_height ON mints (height);
+CREATE TABLE IF NOT EXISTS pending_mints (
+    account TEXT NOT NULL,   -- Opened since the last commit; moved into mints by it
+    amount  INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    height   INTEGER PRIMARY KEY,
+    balances TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS account_keys (
+    account    TEXT PRIMARY KEY,
+    public_key BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS nonces (
+    account TEXT PRIMARY KEY,
+    nonce   INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS nonce_history (
+    account TEXT NOT NULL,
+    height  INTEGER NOT NULL,
+    before  INTEGER,         -- NULL when the account first sent in this block
+    after   INTEGER NOT NULL,
+    PRIMARY KEY (account, height)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class StateStore(Mapping):
+    def __init__(self, path=":memory:", snapshot_interval=100):
+        """
+        Account balances, in integer minor units, backed by SQLite.
+
+        Current balances live in memory and behave like a dict. commit(height)
+        writes the accounts changed since the last commit to a per-block
+        history (before/after rows, doubling as the undo log) and takes a full
+        snapshot every `snapshot_interval` blocks. Reopening loads the latest
+        snapshot and replays only the history recorded after it.
+
+        New money only enters through mint(); every mint is logged per block
+        so reconcile() can prove that transfers conserve the total supply.
+        A mint is written to disk as soon as it is made and joins the next
+        committed block, so an account opened after the last block survives
+        a restart.
+        Writes made inside batch() share one SQLite transaction.
+        Public keys registered for accounts are kept in `public_keys`.
+        The next transaction nonce of each sender is kept in `nonces`,
+        set through set_nonce() and committed and rolled back with the
+        balances, so confirmed transactions cannot be replayed after a
+        restart or a reorg.
+        """
+        self.snapshot_interval = snapshot_interval
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(_SCHEMA)
+        self._balances = {}
+        self._dirty = {}   # account -> balance before its first change since commit
+        self._mints = []   # (account, amount) minted since the last commit
+        self.height = -1   # Last committed block height
+        self.minted = 0    # Total supply created so far
+        self.public_keys = {}   # account -> Ed25519 public key its transactions must be signed with
+        self.nonces = {}        # sender -> nonce of its next transaction
+        self._dirty_nonces = {}   # sender -> nonce before its first change since commit
+        self._batch_depth = 0     # Open batch() blocks; writes are committed when the last one closes
+        self._load()
+
+    def _load(self):
+        """(Re)build the in-memory state from what the database holds"""
+        self._balances = {}
+        self._dirty = {}
+        self._mints = []
+        self._dirty_nonces = {}
+        self.height = -1
+        self.minted = 0
+        self.public_keys = dict(self.db.execute("SELECT account, public_key FROM account_keys"))
+        self.nonces = dict(self.db.execute("SELECT account, nonce FROM nonces"))
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'height'").fetchone()
+        if row is not None:
+            self.height = row[0]
+            self.minted = self.db.execute("SELECT COALESCE(SUM(amount), 0) FROM mints").fetchone()[0]
+
+            snapshot = self.db.execute(
+                "SELECT height, balances FROM snapshots ORDER BY height DESC LIMIT 1").fetchone()
+            since = -1
+            if snapshot is not None:
+                since, balances = snapshot
+                self._balances = json.loads(balances)
+            for account, after in self.db.execute(
+                    "SELECT account, after FROM history WHERE height > ? ORDER BY height", (since,)):
+                self._balances[account] = after
+        # Accounts opened after the last commit
+        for account, amount in self.db.execute("SELECT account, amount FROM pending_mints ORDER BY rowid").fetchall():
+            self._credit(account, amount)
+
+    @contextmanager
+    def batch(self):
+        """
+        Group every write made inside into one SQLite transaction, committed
+        on leaving, e.g. while replaying many blocks. If an exception escapes,
+        the writes are rolled back and the in-memory state reloaded to match.
+        """
+        self._batch_depth += 1
+        try:
+            yield
+        except BaseException:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.db.rollback()
+                self._load()
+            raise
+        self._batch_depth -= 1
+        if not self._batch_depth:
+            self.db.commit()
+
+    @contextmanager
+    def _writing(self):
+        if self._batch_depth:
+            yield
+        else:
+            with self.db:
+                yield
+
+    # ---------------------------------------------------------------- mapping
+
+    def __getitem__(self, account):
+        return self._balances[account]
+
+    def __setitem__(self, account, balance):
+        if account not in self._dirty:
+            self._dirty[account] = self._balances.get(account)
+        self._balances[account] = balance
+
+    def __iter__(self):
+        return iter(self._balances)
+
+    def __len__(self):
+        return len(self._balances)
+
+    def mint(self, account, amount):
+        """
+        Create `amount` new units in `account`, e.g. an opening balance
+        """
+        if not isinstance(amount, int) or amount < 0:
+            raise Exception("Minted amount must be a non-negative integer of minor units.")
+        with self._writing():
+            self.db.execute("INSERT INTO pending_mints (account, amount) VALUES (?, ?)", (account, amount))
+        self._credit(account, amount)
+
+    def _credit(self, account, amount):
+        self[account] = self._balances.get(account, 0) + amount
+        self._mints.append((account, amount))
+        self.minted += amount
+
+    def set_key(self, account, public_key):
+        """
+        Tie `account` to a public key; a registered key cannot be replaced
+        """
+        if self.public_keys.get(account, public_key) != public_key:
+            raise Exception(f"Account '{account}' already has a different key.")
+        with self._writing():
+            self.db.execute("INSERT OR IGNORE INTO account_keys (account, public_key) VALUES (?, ?)",
+                            (account, public_key))
+        self.public_keys[account] = public_key
+
+    def set_nonce(self, account, nonce):
+        """Record the nonce `account`'s next transaction must carry"""
+        if account not in self._dirty_nonces:
+            self._dirty_nonces[account] = self.nonces.get(account)
+        self.nonces[account] = nonce
+
+    @property
+    def pending_mints(self):
+        """(account, amount) minted since the last commit"""
+        return list(self._mints)
+
+    # ---------------------------------------------------------- block commits
+
+    def commit(self, height):
+        """
+        Record every balance changed since the last commit as part of block `height`
+        """
+        with self._writing():
+            self.db.executemany(
+                "INSERT INTO history (account, height, before, after) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (account, height) DO UPDATE SET after = excluded.after",
+                [(account, height, before, self._balances[account])
+                 for account, before in self._dirty.items()])
+            self.db.executemany("INSERT INTO mints (height, account, amount) VALUES (?, ?, ?)",
+                                [(height, account, amount) for account, amount in self._mints])
+            self.db.execute("DELETE FROM pending_mints")
+            self.db.executemany(
+                "INSERT INTO nonce_history (account, height, before, after) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (account, height) DO UPDATE SET after = excluded.after",
+                [(account, height, before, self.nonces[account])
+                 for account, before in self._dirty_nonces.items()])
+            self.db.executemany("INSERT OR REPLACE INTO nonces (account, nonce) VALUES (?, ?)",
+                                [(account, self.nonces[account]) for account in self._dirty_nonces])
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('height', ?)", (height,))
+            if self.snapshot_interval and height % self.snapshot_interval == 0:
+                self.db.execute("INSERT OR REPLACE INTO snapshots (height, balances) VALUES (?, ?)",
+                                (height, json.dumps(self._balances)))
+        self._dirty = {}
+        self._mints = []
+        self._dirty_nonces = {}
+        self.height = height
+
+    def discard(self):
+        """
+        Drop changes made since the last commit; returns the dropped mints
+        """
+        for account, before in self._dirty.items():
+            if before is None:
+                del self._balances[account]
+            else:
+                self._balances[account] = before
+        self._dirty = {}
+        for account, before in self._dirty_nonces.items():
+            if before is None:
+                del self.nonces[account]
+            else:
+                self.nonces[account] = before
+        self._dirty_nonces = {}
+        with self._writing():
+            self.db.execute("DELETE FROM pending_mints")
+        mints, self._mints = self._mints, []
+        self.minted -= sum(amount for _, amount in mints)
+        return mints
+
+    def rollback(self):
+        """
+        Undo the most recently committed block using its before-values,
+        sender nonces included. Returns the mints undone with it, uncommitted ones included.
+        """
+        mints = self.discard()
+        height = self.height
+        with self._writing():
+            for account, before in self.db.execute(
+                    "SELECT account, before FROM history WHERE height = ?", (height,)).fetchall():
+                if before is None:
+                    self._balances.pop(account, None)
+                else:
+                    self._balances[account] = before
+            self.db.execute("DELETE FROM history WHERE height = ?", (height,))
+            for account, before in self.db.execute(
+                    "SELECT account, before FROM nonce_history WHERE height = ?", (height,)).fetchall():
+                if before is None:
+                    self.nonces.pop(account, None)
+                    self.db.execute("DELETE FROM nonces WHERE account = ?", (account,))
+                else:
+                    self.nonces[account] = before
+                    self.db.execute("UPDATE nonces SET nonce = ? WHERE account = ?", (before, account))
+            self.db.execute("DELETE FROM nonce_history WHERE height = ?", (height,))
+            committed = self.db.execute(
+                "SELECT account, amount FROM mints WHERE height = ? ORDER BY rowid", (height,)).fetchall()
+            self.db.execute("DELETE FROM mints WHERE height = ?", (height,))
+            self.db.execute("DELETE FROM snapshots WHERE height >= ?", (height,))
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('height', ?)", (height - 1,))
+        self.height = height - 1
+        self.minted -= sum(amount for _, amount in committed)
+        return committed + mints
+
+    # ----------------------------------------------------------------- queries
+
+    def balance_at(self, account, height):
+        """
+        Balance of `account` after block `height`; a single index seek
+        """
+        row = self.db.execute(
+            "SELECT after FROM history WHERE account = ? AND height <= ? "
+            "ORDER BY height DESC LIMIT 1", (account, height)).fetchone()
+        return row[0] if row is not None else 0
+
+    def reconcile(self):
+        """
+        Check that supply is conserved: every committed block changed the
+        sum of balances by exactly what it minted, and the current balances
+        add up to the total minted. Returns a list of (height, minted, net
+        change) mismatches, with height None for the live balances.
+        """
+        mismatches = self.db.execute(
+            "SELECT height, SUM(minted), SUM(delta) FROM ("
+            "  SELECT height, 0 AS minted, after - COALESCE(before, 0) AS delta FROM history"
+            "  UNION ALL SELECT height, amount, 0 FROM mints"
+            ") GROUP BY height HAVING SUM(minted) != SUM(delta) ORDER BY height").fetchall()
+        total = sum(self._balances.values())
+        if total != self.minted:
+            mismatches.append((None, self.minted, total))
+        return mismatches
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,267 @@
+import mmap, os, struct, threading
+from collections import OrderedDict
+from block import Block
+from transaction import Transaction
+
+# Segment files hold length-prefixed block records appended back to back.
+# index.dat holds one fixed-size (segment, offset) entry per block height,
+# so a height lookup is a single read and opening the store reads nothing
+# but the file sizes.
+_RECORD_LEN = struct.Struct(">I")
+_INDEX_ENTRY = struct.Struct(">IQ")
+INDEX_FILE = "index.dat"
+# Rough memory of one decoded transaction record, on top of its block's serialized size
+DECODED_TX_BYTES = 400
+
+
+def _open_unbuffered(path):
+    """Open a file for unbuffered read/write, creating it if missing"""
+    if not os.path.exists(path):
+        open(path, "wb").close()
+    return open(path, "r+b", buffering=0)
+
+
+class BlockCache:
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        """
+        Decoded blocks by height, least recently used evicted first once the
+        cached blocks are charged more than `max_bytes`. A block is charged
+        its serialized size, plus DECODED_TX_BYTES per transaction once its
+        body has been decoded; a lazy block decoded after it was handed out
+        is recharged the next time it is looked up.
+        """
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._blocks = OrderedDict()   # height -> [block, bytes charged, decoded when charged]
+
+    def get(self, height):
+        entry = self._blocks.get(height)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._blocks.move_to_end(height)
+        self.hits += 1
+        block = entry[0]
+        if not entry[2] and block.is_decoded:
+            extra = block.tx_count * DECODED_TX_BYTES
+            entry[1] += extra
+            entry[2] = True
+            self.bytes += extra
+            self._evict()
+        return block
+
+    def put(self, height, block, size):
+        decoded = block.is_decoded
+        if decoded:
+            size += block.tx_count * DECODED_TX_BYTES
+        if size > self.max_bytes:
+            return
+        old = self._blocks.pop(height, None)
+        if old is not None:
+            self.bytes -= old[1]
+        self._blocks[height] = [block, size, decoded]
+        self.bytes += size
+        self._evict()
+
+    def _evict(self):
+        while self.bytes > self.max_bytes:
+            _, (_, evicted, _) = self._blocks.popitem(last=False)
+            self.bytes -= evicted
+
+    def discard_from(self, height):
+        """
+        Forget every block at `height` and above
+        """
+        for h in [h for h in self._blocks if h >= height]:
+            self.bytes -= self._blocks.pop(h)[1]
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "blocks": len(self._blocks),
+                "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+
+class BlockStore:
+    def __init__(self, directory, segment_size=64 * 1024 * 1024, sync_every=100, cache_bytes=32 * 1024 * 1024,
+                 tx_type=Transaction):
+        """
+        Open (or create) an append-only block store in `directory`.
+        Appends are fsynced in batches of `sync_every` blocks. Blocks read
+        back are decoded lazily (header first, body on first use) as
+        `tx_type` records, e.g. utxo.CoinTransaction, and kept in an LRU
+        cache of up to `cache_bytes`, counting decoded transactions too.
+        """
+        self.directory = directory
+        self.tx_type = tx_type
+        self.segment_size = segment_size
+        self.sync_every = sync_every
+        self._unsynced = 0
+        self._maps = {}   # segment number -> (mmap, mapped length)
+        self.cache = BlockCache(cache_bytes)
+        self._read_lock = threading.RLock()   # Reads seek a shared file handle and update the cache
+        os.makedirs(directory, exist_ok=True)
+
+        self._index = _open_unbuffered(os.path.join(directory, INDEX_FILE))
+        self._height = os.fstat(self._index.fileno()).st_size // _INDEX_ENTRY.size
+        self._recover()
+
+    # ------------------------------------------------------------------ files
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"segment-{segment:05d}.dat")
+
+    def _index_entry(self, height):
+        self._index.seek(height * _INDEX_ENTRY.size)
+        return _INDEX_ENTRY.unpack(self._index.read(_INDEX_ENTRY.size))
+
+    def _open_segment(self, segment):
+        self._segment = segment
+        self._segment_file = _open_unbuffered(self._segment_path(segment))
+        self._segment_end = os.fstat(self._segment_file.fileno()).st_size
+
+    def _recover(self):
+        """
+        Drop index entries whose records never fully reached disk, then
+        trim any partial record left at the end of the active segment
+        """
+        self._index.truncate(self._height * _INDEX_ENTRY.size)
+        while self._height:
+            segment, offset = self._index_entry(self._height - 1)
+            path = self._segment_path(segment)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if offset + _RECORD_LEN.size <= size:
+                with open(path, "rb") as f:
+                    f.seek(offset)
+                    (length,) = _RECORD_LEN.unpack(f.read(_RECORD_LEN.size))
+                if offset + _RECORD_LEN.size + length <= size:
+                    self._open_segment(segment)
+                    self._segment_end = offset + _RECORD_LEN.size + length
+                    self._segment_file.truncate(self._segment_end)
+                    return
+            self._height -= 1
+            self._index.truncate(self._height * _INDEX_ENTRY.size)
+        self._open_segment(0)
+        self._segment_file.truncate(0)
+        self._segment_end = 0
+
+    def _map(self, segment, needed):
+        """
+        Memory-map a segment, remapping the active one when it has grown
+        """
+        mapped = self._maps.get(segment)
+        if mapped is None or mapped[1] < needed:
+            if mapped is not None:
+                mapped[0].close()
+            with open(self._segment_path(segment), "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                mapped = (mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ), size)
+            self._maps[segment] = mapped
+        return mapped[0]
+
+    # --------------------------------------------------------------- sequence
+
+    def __len__(self):
+        return self._height
+
+    def __iter__(self):
+        for height in range(self._height):
+            yield self.read(height)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.read(height) for height in range(*item.indices(self._height))]
+        if item < 0:
+            item += self._height
+        if not 0 <= item < self._height:
+            raise IndexError("Block height out of range.")
+        return self.read(item)
+
+    def read_raw(self, height):
+        """
+        Serialized bytes of the block at `height`, read through mmap
+        """
+        with self._read_lock:
+            segment, offset = self._index_entry(height)
+            view = self._map(segment, offset + _RECORD_LEN.size)
+            (length,) = _RECORD_LEN.unpack_from(view, offset)
+            start = offset + _RECORD_LEN.size
+            view = self._map(segment, start + length)
+            return view[start:start + length]
+
+    def read(self, height):
+        with self._read_lock:
+            block = self.cache.get(height)
+            if block is None:
+                raw = self.read_raw(height)
+                block = Block.from_bytes(raw, tx_type=self.tx_type, lazy=True)
+                self.cache.put(height, block, len(raw))
+            return block
+
+    def append(self, block):
+        """
+        Append a block record and its index entry
+        """
+        payload = block.serialize()
+        record = _RECORD_LEN.pack(len(payload)) + payload
+        with self._read_lock:   # Readers seek the same index handle
+            if self._segment_end and self._segment_end + len(record) > self.segment_size:
+                self.sync()
+                self._segment_file.close()
+                self._open_segment(self._segment + 1)
+
+            self._segment_file.seek(self._segment_end)
+            self._segment_file.write(record)
+            self._index.seek(self._height * _INDEX_ENTRY.size)
+            self._index.write(_INDEX_ENTRY.pack(self._segment, self._segment_end))
+            self._segment_end += len(record)
+            self._height += 1
+
+            self._unsynced += 1
+            if self._unsynced >= self.sync_every:
+                self.sync()
+
+    def truncate(self, length):
+        """
+        Drop every block at height `length` and above, e.g. when switching
+        to another branch. The index shrinks first so it never points past data.
+        """
+        if length >= self._height:
+            return
+        with self._read_lock:
+            segment, offset = self._index_entry(length)
+            self._height = length
+            self.cache.discard_from(length)
+            self._index.truncate(length * _INDEX_ENTRY.size)
+            os.fsync(self._index.fileno())
+
+            for number in list(self._maps):
+                if number >= segment:
+                    self._maps.pop(number)[0].close()
+            self._segment_file.close()
+            for number in range(segment + 1, self._segment + 1):
+                os.remove(self._segment_path(number))
+            self._open_segment(segment)
+            self._segment_file.truncate(offset)
+            self._segment_end = offset
+            os.fsync(self._segment_file.fileno())
+            self._unsynced = 0
+
+    # -------------------------------------------------------------- lifecycle
+
+    def sync(self):
+        """
+        Flush pending appends: segment data first, then the index pointing at it
+        """
+        if self._unsynced:
+            os.fsync(self._segment_file.fileno())
+            os.fsync(self._index.fileno())
+            self._unsynced = 0
+
+    def close(self):
+        self.sync()
+        for view, _ in self._maps.values():
+            view.close()
+        self._maps.clear()
+        self._segment_file.close()
+        self._index.close()
@@ -1,146 +1,71 @@
 import streamlit as st
-import json
-import pandas as pd
+import io, json, sys
 from datetime import datetime
-from transaction import Transaction
-from miner import Blockchain
+from transaction import ZAKAT_ACCOUNT
+from amounts import to_units, from_units, format_amount, calculate_zakat
+from main import BlockchainSystem
+from engine import Engine
+# pandas and chainfile are imported by the pages that use them, so the app
+# starts without paying for them
+
+def format_time(timestamp):
+    """Human readable form of a Unix timestamp"""
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+@st.cache_resource
+def get_engine():
+    """
+    The blockchain every session works on. Created once per process; a
+    session only keeps view state (page, cursors, roll number) of its own.
+    `streamlit run streamlit_app.py -- <data_dir>` opens a stored chain; only
+    the blocks a page shows are read from disk.
+    """
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else None
+    return Engine(BlockchainSystem("3669", data_dir=data_dir))
 
-class BlockchainSystemStreamlit:
-    def __init__(self, roll_no="0000"):
-        if 'blockchain' not in st.session_state:
-            st.session_state.blockchain = Blockchain(roll_no)
-        if 'accounts' not in st.session_state:
-            st.session_state.accounts = {}
-        if 'pending_transactions' not in st.session_state:
-            st.session_state.pending_transactions = []
-        if 'roll_no' not in st.session_state:
-            st.session_state.roll_no = roll_no
-        
-        self.blockchain = st.session_state.blockchain
-        self.accounts = st.session_state.accounts
-        self.pending_transactions = st.session_state.pending_transactions
-        self.roll_no = st.session_state.roll_no
-    
-    def create_account(self, account_name, initial_balance):
-        """Create a new account with initial balance"""
-        if account_name in self.accounts:
-            return False, f"Account '{account_name}' already exists!"
-        
-        self.accounts[account_name] = initial_balance
-        st.session_state.accounts = self.accounts
-        return True, f"Account '{account_name}' created with balance: {initial_balance}"
-    
-    def get_balance(self, account_name):
-        """Get account balance"""
-        return self.accounts.get(account_name, 0)
-    
-    def calculate_zakat(self, amount):
-        """Calculate zakat (2.5% of transaction amount)"""
-        return round(amount * 0.025, 2)
-    
-    def create_transaction(self, sender, receiver, amount):
-        """Create and add a transaction with automatic zakat deduction"""
-        try:
-            # Check if accounts exist
-            if sender not in self.accounts:
-                return False, f"Sender account '{sender}' does not exist!"
-            if receiver not in self.accounts:
-                return False, f"Receiver account '{receiver}' does not exist!"
-            
-            # Calculate zakat
-            zakat_amount = self.calculate_zakat(amount)
-            total_deduction = amount + zakat_amount
-            
-            # Check if sender has sufficient balance
-            if self.accounts[sender] < total_deduction:
-                return False, f"Insufficient balance! Required: {total_deduction} (Amount: {amount} + Zakat: {zakat_amount})"
-            
-            # Create main transaction
-            transaction = Transaction(sender, receiver, amount)
-            
-            # Apply transaction
-            self.accounts = transaction.apply(self.accounts)
-            
-            # Deduct zakat from sender
-            self.accounts[sender] -= zakat_amount
-            
-            # Add zakat to a special zakat account (create if doesn't exist)
-            if "ZAKAT_FUND" not in self.accounts:
-                self.accounts["ZAKAT_FUND"] = 0
-            self.accounts["ZAKAT_FUND"] += zakat_amount
-            
-            # Add to pending transactions
-            self.pending_transactions.append({
-                'main_transaction': f"{sender} -> {receiver}: {amount}",
-                'zakat_transaction': f"{sender} -> ZAKAT_FUND: {zakat_amount}",
-                'total_deducted': total_deduction,
-                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            })
-            
-            # Update session state
-            st.session_state.accounts = self.accounts
-            st.session_state.pending_transactions = self.pending_transactions
-            
-            return True, f"Transaction successful! Amount: {amount}, Zakat: {zakat_amount}, Total deducted: {total_deduction}"
-            
-        except Exception as e:
-            return False, f"Transaction failed: {str(e)}"
-    
-    def mine_block(self):
-        """Mine a block with pending transactions"""
-        if not self.pending_transactions:
-            return False, "No pending transactions to mine!"
-        
-        # Convert transactions to string format for block
-        transactions_str = json.dumps(self.pending_transactions, indent=2)
-        
-        # Add block to blockchain
-        success = self.blockchain.add_block(transactions_str, self.roll_no)
-        
-        if success:
-            block_num = len(self.blockchain.chain) - 1
-            tx_count = len(self.pending_transactions)
-            self.pending_transactions = []  # Clear pending transactions
-            
-            # Update session state
-            st.session_state.blockchain = self.blockchain
-            st.session_state.pending_transactions = self.pending_transactions
-            
-            return True, f"Block #{block_num} mined successfully with {tx_count} transactions!"
-        else:
-            return False, "Failed to mine block!"
-    
-    def validate_blockchain(self):
-        """Validate the blockchain"""
-        is_valid = self.blockchain.is_valid()
-        return is_valid
-    
-    def get_blockchain_data(self):
-        """Get blockchain data for display"""
-        blocks_data = []
-        for i, block in enumerate(self.blockchain.chain):
-            block_info = {
-                'Block #': i,
-                'Timestamp': datetime.fromtimestamp(block.timestamp).strftime("%Y-%m-%d %H:%M:%S"),
-                'Previous Hash': block.prev_hash[:16] + "..." if len(block.prev_hash) > 16 else block.prev_hash,
-                'Current Hash': block.hash[:16] + "..." if len(block.hash) > 16 else block.hash,
-                'Roll No': block.roll_no,
-                'Transactions': "Genesis Block" if i == 0 else f"{len(json.loads(block.transactions))} transactions"
-            }
-            blocks_data.append(block_info)
-        return blocks_data
-    
-    def get_transaction_details(self, block_index):
-        """Get detailed transaction information for a specific block"""
-        if block_index == 0:
-            return []
-        
-        block = self.blockchain.chain[block_index]
-        try:
-            transactions = json.loads(block.transactions)
-            return transactions
-        except:
-            return []
+
+@st.cache_data(max_entries=64)
+def block_page(tip_hash, first, last, _engine):
+    """
+    Explorer rows for blocks first..last. Cached per chain tip, so a page is
+    rebuilt only after the chain changes; `_engine` is not part of the key.
+    """
+    return [{
+        'Block #': height,
+        'Timestamp': format_time(timestamp),
+        'Current Hash': block_hash[:16] + "...",
+        'Previous Hash': prev_hash[:16] + "..." if len(prev_hash) > 16 else prev_hash,
+        'Roll No': roll_no,
+        'Transactions': transactions,
+        'Size (bytes)': size,
+        'Volume': format_amount(volume),
+        'Zakat': format_amount(zakat),
+    } for height, block_hash, prev_hash, timestamp, roll_no, transactions, size, volume, zakat
+        in _engine.read(lambda system: system.index.block_summaries(first, last))]
+
+
+def overview(system):
+    """Snapshot of what most pages show, taken under one read lock"""
+    chain = system.blockchain
+    return {
+        'accounts': dict(system.accounts),
+        'pending': len(system.mempool),
+        'height': len(chain.chain) - 1,
+        'tip': chain.chain[-1].hash,
+        'difficulty': chain.difficulty,
+        'validated_height': chain.validated_height,
+        'mining_stats': list(chain.last_mining_stats),
+        'roll_no': system.roll_no,
+        'stored': system.data_dir is not None,
+    }
+
+
+def show_outcome(outcome, fallback):
+    """Report a write through the messages the system printed while doing it"""
+    result, lines = outcome
+    (st.success if result else st.error)("\n\n".join(lines) or fallback)
+    return result
 
 
 def main():
@@ -199,12 +124,11 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
-    # Initialize system
-    if 'system' not in st.session_state:
-        roll_no = st.sidebar.text_input("Enter Roll Number", value="3669", key="roll_input")
-        st.session_state.system = BlockchainSystemStreamlit(roll_no)
-    
-    system = st.session_state.system
+    # Shared engine; this session only holds view state
+    engine = get_engine()
+    roll_no = st.sidebar.text_input("Enter Roll Number", value="3669", key="roll_input")
+    view = engine.read(overview)
+    accounts = view['accounts']
     
     # Sidebar navigation
     st.sidebar.title("Navigation")
@@ -220,30 +144,33 @@ def main():
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("Total Accounts", len(system.accounts))
+            st.metric("Total Accounts", len(accounts))
         
         with col2:
-            st.metric("Pending Transactions", len(system.pending_transactions))
+            st.metric("Pending Transactions", view['pending'])
         
         with col3:
-            st.metric("Blocks Mined", len(system.blockchain.chain) - 1)
+            st.metric("Blocks Mined", view['height'])
         
         with col4:
-            total_balance = sum(system.accounts.values()) if system.accounts else 0
-            st.metric("Total Balance", f"{total_balance:.2f}")
+            total_balance = sum(accounts.values()) if accounts else 0
+            st.metric("Total Balance", format_amount(total_balance))
         
         # Recent activity
         st.subheader("Recent Activity")
-        if system.pending_transactions:
-            for i, tx in enumerate(system.pending_transactions[-5:], 1):
-                st.info(f"🔄 {tx['main_transaction']} | Zakat: {tx['zakat_transaction'].split(': ')[1]} | {tx['timestamp']}")
+        recent = engine.read(lambda system: list(system.mempool)[-5:])
+        if recent:
+            for i, tx in enumerate(recent, 1):
+                st.info(f"🔄 {tx.sender} -> {tx.receiver}: {format_amount(tx.amount)} | Zakat: {format_amount(tx.zakat)} | {format_time(tx.timestamp)}")
         else:
             st.info("No recent transactions")
         
         # Account balances chart
-        if system.accounts:
+        if accounts:
             st.subheader("Account Balances")
-            df = pd.DataFrame(list(system.accounts.items()), columns=['Account', 'Balance'])
+            import pandas as pd
+            df = pd.DataFrame([(name, from_units(units)) for name, units in accounts.items()],
+                              columns=['Account', 'Balance'])
             st.bar_chart(df.set_index('Account'))
     
     # Account Management
@@ -257,28 +184,68 @@ def main():
             with st.form("create_account_form"):
                 account_name = st.text_input("Account Name")
                 initial_balance = st.number_input("Initial Balance", min_value=0.0, step=0.01)
+                signed = st.checkbox("Require signed transactions (Ed25519 key)")
                 submitted = st.form_submit_button("Create Account")
                 
                 if submitted:
                     if account_name:
-                        success, message = system.create_account(account_name, initial_balance)
-                        if success:
-                            st.success(message)
-                        else:
-                            st.error(message)
+                        show_outcome(engine.write(lambda system: system.create_account(
+                            account_name, to_units(initial_balance), signed=signed)), "Account not created")
                         st.rerun()
                     else:
                         st.error("Please enter an account name")
         
         with tab2:
             st.subheader("All Accounts")
-            if system.accounts:
-                df = pd.DataFrame(list(system.accounts.items()), columns=['Account', 'Balance'])
+            if accounts:
+                import pandas as pd
+                df = pd.DataFrame([(name, format_amount(units)) for name, units in accounts.items()],
+                                  columns=['Account', 'Balance'])
                 st.dataframe(df, use_container_width=True)
                 
                 # Zakat fund highlight
-                if "ZAKAT_FUND" in system.accounts:
-                    st.info(f"💰 Zakat Fund Balance: {system.accounts['ZAKAT_FUND']:.2f}")
+                if ZAKAT_ACCOUNT in accounts:
+                    st.info(f"💰 Zakat Fund Balance: {format_amount(accounts[ZAKAT_ACCOUNT])}")
+                
+                # Historical balance lookup
+                st.subheader("Balance at Block")
+                col1, col2 = st.columns(2)
+                with col1:
+                    history_account = st.selectbox("Account", options=list(accounts.keys()))
+                with col2:
+                    history_height = st.number_input("Block #", min_value=0, max_value=view['height'],
+                                                     value=view['height'], step=1)
+                balance = engine.read(lambda system: system.get_balance(history_account, int(history_height)))
+                st.info(f"Balance after block #{history_height}: {format_amount(balance)}")
+                
+                # Paginated statement from the transaction index
+                st.subheader("Account Statement")
+                statement_account = st.selectbox("Statement for", options=list(accounts.keys()),
+                                                 key="statement_account")
+                cursors = st.session_state.setdefault('statement_cursors', {})
+                pages = cursors.setdefault(statement_account, [None])   # `before` cursor of each page seen
+                page_size = 20
+                rows = engine.read(lambda system: system.account_history(statement_account, page_size, pages[-1]))
+                if rows:
+                    st.dataframe(pd.DataFrame([{
+                        'Block #': height,
+                        'Direction': "Sent" if tx.sender == statement_account else "Received",
+                        'Counterparty': tx.receiver if tx.sender == statement_account else tx.sender,
+                        'Amount': format_amount(tx.amount),
+                        'Zakat': format_amount(tx.zakat) if tx.sender == statement_account else "",
+                        'Time': format_time(tx.timestamp),
+                    } for height, position, tx in rows]), use_container_width=True)
+                else:
+                    st.info("No confirmed transactions")
+                col1, col2 = st.columns(2)
+                with col1:
+                    if len(pages) > 1 and st.button("⬅️ Newer", key="statement_newer"):
+                        pages.pop()
+                        st.rerun()
+                with col2:
+                    if len(rows) == page_size and st.button("Older ➡️", key="statement_older"):
+                        pages.append(rows[-1][:2])
+                        st.rerun()
             else:
                 st.info("No accounts created yet")
     
@@ -291,51 +258,55 @@ def main():
         with tab1:
             st.subheader("Create New Transaction")
             
-            if len(system.accounts) < 2:
+            if len(accounts) < 2:
                 st.warning("You need at least 2 accounts to create a transaction")
             else:
                 with st.form("transaction_form"):
                     col1, col2 = st.columns(2)
                     
                     with col1:
-                        sender = st.selectbox("Sender", options=list(system.accounts.keys()))
+                        sender = st.selectbox("Sender", options=list(accounts.keys()))
                         if sender:
-                            st.info(f"Current Balance: {system.accounts[sender]:.2f}")
+                            available = engine.read(lambda system: system.get_available_balance(sender))
+                            st.info(f"Current Balance: {format_amount(accounts[sender])} | "
+                                    f"Available: {format_amount(available)}")
                     
                     with col2:
-                        receiver_options = [acc for acc in system.accounts.keys() if acc != sender]
+                        receiver_options = [acc for acc in accounts.keys() if acc != sender]
                         receiver = st.selectbox("Receiver", options=receiver_options)
                     
                     amount = st.number_input("Amount", min_value=0.01, step=0.01)
+                    fee = st.number_input("Fee (higher fees are mined first)", min_value=0.0, step=0.01)
                     
                     if amount > 0:
-                        zakat = system.calculate_zakat(amount)
-                        total_deduction = amount + zakat
-                        st.info(f"Zakat (2.5%): {zakat:.2f} | Total Deduction: {total_deduction:.2f}")
+                        zakat = calculate_zakat(to_units(amount))
+                        total_deduction = to_units(amount) + zakat + to_units(fee)
+                        st.info(f"Zakat (2.5%): {format_amount(zakat)} | Total Deduction: {format_amount(total_deduction)}")
                     
                     submitted = st.form_submit_button("Create Transaction")
                     
                     if submitted:
                         if sender and receiver and amount > 0:
-                            success, message = system.create_transaction(sender, receiver, amount)
-                            if success:
-                                st.success(message)
-                            else:
-                                st.error(message)
+                            show_outcome(engine.write(lambda system: system.create_transaction(
+                                sender, receiver, to_units(amount), to_units(fee))), "Transaction failed")
                             st.rerun()
                         else:
                             st.error("Please fill all fields with valid values")
         
         with tab2:
             st.subheader("Pending Transactions")
-            if system.pending_transactions:
-                for i, tx in enumerate(system.pending_transactions, 1):
-                    with st.expander(f"Transaction #{i} - {tx['timestamp']}"):
-                        st.write(f"**Main Transaction:** {tx['main_transaction']}")
-                        st.write(f"**Zakat Transaction:** {tx['zakat_transaction']}")
-                        st.write(f"**Total Deducted:** {tx['total_deducted']}")
+            pending, size_bytes, max_bytes = engine.read(
+                lambda system: (list(system.mempool), system.mempool.size_bytes, system.mempool.max_bytes))
+            if pending:
+                for i, tx in enumerate(pending, 1):
+                    with st.expander(f"Transaction #{i} - {format_time(tx.timestamp)}"):
+                        st.write(f"**Main Transaction:** {tx.sender} -> {tx.receiver}: {format_amount(tx.amount)}")
+                        st.write(f"**Zakat Transaction:** {tx.sender} -> {ZAKAT_ACCOUNT}: {format_amount(tx.zakat)}")
+                        st.write(f"**Fee:** {format_amount(tx.fee)}")
+                        st.write(f"**Total Deducted:** {format_amount(tx.total_deducted)}")
                 
-                st.success(f"Total pending transactions: {len(system.pending_transactions)}")
+                st.success(f"Total pending transactions: {len(pending)} "
+                           f"({size_bytes:,} of {max_bytes:,} bytes)")
             else:
                 st.info("No pending transactions")
     
@@ -347,52 +318,85 @@ def main():
         
         with col1:
             st.subheader("Mine New Block")
-            if system.pending_transactions:
-                st.info(f"Ready to mine {len(system.pending_transactions)} pending transactions")
+            if view['pending']:
+                st.info(f"Ready to mine {view['pending']} pending transactions")
                 
                 if st.button("🔨 Mine Block", type="primary"):
                     with st.spinner("Mining block..."):
-                        success, message = system.mine_block()
-                        if success:
-                            st.success(message)
+                        if show_outcome(engine.mine(roll_no),
+                                        "Failed to mine block!"):
                             st.balloons()
-                        else:
-                            st.error(message)
                         st.rerun()
             else:
                 st.warning("No pending transactions to mine")
         
         with col2:
             st.subheader("Mining Stats")
-            st.metric("Blocks Mined", len(system.blockchain.chain) - 1)
+            st.metric("Blocks Mined", view['height'])
             st.metric("Genesis Block", "✅")
+            st.metric("Difficulty", f"{view['difficulty']} bits")
+            if view['mining_stats']:
+                st.metric("Last Hash Rate", f"{sum(s['hash_rate'] for s in view['mining_stats']):,.0f} H/s")
+                import pandas as pd
+                st.dataframe(pd.DataFrame(view['mining_stats']), use_container_width=True)
             
-            # Blockchain validation
+            # Blockchain validation (moves the validated checkpoint, so it takes the write lock)
+            full_audit = st.checkbox("Full audit from genesis")
             if st.button("🔍 Validate Blockchain"):
                 with st.spinner("Validating blockchain..."):
-                    is_valid = system.validate_blockchain()
+                    (is_valid, mismatches, minted), _ = engine.write(lambda system: (
+                        system.blockchain.is_valid(full=full_audit), system.accounts.reconcile(),
+                        system.accounts.minted))
                     if is_valid:
                         st.success("✅ Blockchain is VALID")
                     else:
                         st.error("❌ Blockchain is INVALID")
+                    if mismatches:
+                        st.error(f"❌ Supply mismatch at {len(mismatches)} point(s)")
+                    else:
+                        st.success(f"✅ Supply conserved: {format_amount(minted)}")
+            st.caption(f"Verified up to block #{engine.read(lambda system: system.blockchain.validated_height)}")
     
     # Blockchain Explorer
     elif page == "Blockchain Explorer":
         st.header("🔍 Blockchain Explorer")
         
-        # Blockchain overview
-        blocks_data = system.get_blockchain_data()
-        if blocks_data:
+        # Transaction lookup through the index
+        search_hash = st.text_input("Find transaction by hash").strip()
+        if search_hash:
+            found = engine.read(lambda system: system.find_transaction(search_hash))
+            if found is None:
+                st.warning("No confirmed transaction with that hash")
+            else:
+                height, position, tx = found
+                st.success(f"Block #{height}, transaction #{position + 1}: "
+                           f"{tx.sender} -> {tx.receiver}: {format_amount(tx.amount)} "
+                           f"(zakat {format_amount(tx.zakat)}, {format_time(tx.timestamp)})")
+        
+        # Blockchain overview, one page of precomputed block summaries at a time
+        tip = view['height']
+        if tip >= 0:
             st.subheader("Blockchain Overview")
-            df = pd.DataFrame(blocks_data)
-            st.dataframe(df, use_container_width=True)
+            col1, col2 = st.columns(2)
+            with col1:
+                page_size = st.selectbox("Blocks per page", [25, 50, 100], key="explorer_page_size")
+            pages = tip // page_size + 1
+            with col2:
+                page_number = st.number_input(f"Page (of {pages}, newest first)", min_value=1,
+                                              max_value=pages, value=1, step=1, key="explorer_page")
+            last = tip - (int(page_number) - 1) * page_size
+            rows = block_page(view['tip'], max(last - page_size + 1, 0), last, engine)
+            import pandas as pd
+            st.dataframe(pd.DataFrame(rows), use_container_width=True)
             
             # Block details
             st.subheader("Block Details")
-            selected_block = st.selectbox("Select Block", range(len(system.blockchain.chain)))
+            selected_block = int(st.number_input("Block #", min_value=0, max_value=tip, value=tip, step=1,
+                                                 key="explorer_block"))
             
             if selected_block is not None:
-                block = system.blockchain.chain[selected_block]
+                # Blocks are immutable, so the details are built outside the lock
+                block = engine.read(lambda system: system.blockchain.chain[selected_block])
                 
                 col1, col2 = st.columns(2)
                 
@@ -400,24 +404,32 @@ def main():
                     st.write(f"**Block Number:** {selected_block}")
                     st.write(f"**Timestamp:** {datetime.fromtimestamp(block.timestamp)}")
                     st.write(f"**Roll Number:** {block.roll_no}")
+                    st.write(f"**Nonce:** {block.nonce} (difficulty: {block.difficulty} bits)")
                 
                 with col2:
                     st.write(f"**Previous Hash:** `{block.prev_hash}`")
                     st.write(f"**Current Hash:** `{block.hash}`")
+                    st.write(f"**Merkle Root:** `{block.merkle_root}`")
                 
                 # Transaction details
                 if selected_block == 0:
                     st.info("Genesis Block - No transactions")
                 else:
                     st.subheader("Transactions in this Block")
-                    transactions = system.get_transaction_details(selected_block)
-                    if transactions:
-                        for i, tx in enumerate(transactions, 1):
+                    if block.transactions:
+                        for i, tx in enumerate(block.transactions, 1):
                             with st.expander(f"Transaction #{i}"):
-                                st.write(f"**Main:** {tx['main_transaction']}")
-                                st.write(f"**Zakat:** {tx['zakat_transaction']}")
-                                st.write(f"**Total Deducted:** {tx['total_deducted']}")
-                                st.write(f"**Timestamp:** {tx.get('timestamp', 'N/A')}")
+                                st.write(f"**Main:** {tx.sender} -> {tx.receiver}: {format_amount(tx.amount)}")
+                                st.write(f"**Zakat:** {tx.sender} -> {ZAKAT_ACCOUNT}: {format_amount(tx.zakat)}")
+                                st.write(f"**Total Deducted:** {format_amount(tx.total_deducted)}")
+                                st.write(f"**Timestamp:** {format_time(tx.timestamp)}")
+                                st.write(f"**Hash:** `{tx.hash}`")
+                                # O(log n) proof checked against the block merkle root
+                                proof = block.inclusion_proof(i - 1)
+                                if block.verify_transaction(tx, proof):
+                                    st.write(f"**Merkle Proof:** ✅ verified with {len(proof)} sibling hashes")
+                                else:
+                                    st.write("**Merkle Proof:** ❌ not committed by this block")
         else:
             st.info("No blocks in blockchain")
     
@@ -429,23 +441,29 @@ def main():
         
         with col1:
             st.subheader("System Information")
-            st.info(f"**Roll Number:** {system.roll_no}")
+            st.info(f"**Roll Number:** {roll_no} (node default {view['roll_no']})")
             st.info(f"**Zakat Rate:** 2.5%")
-            st.info(f"**Total Accounts:** {len(system.accounts)}")
-            st.info(f"**Blockchain Length:** {len(system.blockchain.chain)}")
+            st.info(f"**Total Accounts:** {len(accounts)}")
+            st.info(f"**Blockchain Length:** {view['height'] + 1}")
         
         with col2:
             st.subheader("Actions")
             
-            if st.button("🧹 Clear All Data", type="secondary"):
-                if st.checkbox("I understand this will delete all data"):
-                    st.session_state.clear()
-                    st.success("All data cleared! Please refresh the page.")
+            # Clearing and importing build an in-memory chain, which would
+            # silently stop writing to the data directory
+            if view['stored']:
+                st.caption("Clearing and importing are disabled while the app runs on a data directory.")
+            confirm = st.checkbox("I understand this will delete all data", disabled=view['stored'])
+            if st.button("🧹 Clear All Data", type="secondary", disabled=view['stored'] or not confirm):
+                # The chain is shared, so this clears it for every session
+                engine.replace(BlockchainSystem(view['roll_no']))
+                st.session_state.clear()
+                st.success("All data cleared! Please refresh the page.")
             
             st.subheader("Export Data")
-            if system.accounts:
+            if accounts:
                 # Export accounts
-                accounts_json = json.dumps(system.accounts, indent=2)
+                accounts_json = json.dumps({name: format_amount(units) for name, units in accounts.items()}, indent=2)
                 st.download_button(
                     label="📄 Download Accounts (JSON)",
                     data=accounts_json,
@@ -453,26 +471,36 @@ def main():
                     mime="application/json"
                 )
             
-            if len(system.blockchain.chain) > 1:
-                # Export blockchain
-                blockchain_data = []
-                for i, block in enumerate(system.blockchain.chain):
-                    blockchain_data.append({
-                        'block_number': i,
-                        'timestamp': block.timestamp,
-                        'prev_hash': block.prev_hash,
-                        'current_hash': block.hash,
-                        'roll_no': block.roll_no,
-                        'transactions': block.transactions
-                    })
-                
-                blockchain_json = json.dumps(blockchain_data, indent=2)
-                st.download_button(
-                    label="🔗 Download Blockchain (JSON)",
-                    data=blockchain_json,
-                    file_name="blockchain.json",
-                    mime="application/json"
-                )
+            if view['height'] > 0:
+                # Binary chain export: headers, account openings, compressed bodies
+                if st.button("📦 Prepare Blockchain Export"):
+                    from chainfile import export_chain
+                    out = io.BytesIO()
+                    engine.read(lambda system: export_chain(system, out))
+                    st.session_state.chain_export = out.getvalue()
+                if 'chain_export' in st.session_state:
+                    st.download_button(
+                        label=f"🔗 Download Blockchain ({len(st.session_state.chain_export) / 1024:,.1f} KB)",
+                        data=st.session_state.chain_export,
+                        file_name="blockchain.mbchain",
+                        mime="application/octet-stream"
+                    )
+            
+            st.subheader("Import Blockchain")
+            uploaded = st.file_uploader("Chain export file", type=["mbchain"], disabled=view['stored'])
+            if uploaded is not None and st.button("📥 Replace Chain With Import", disabled=view['stored']):
+                from chainfile import import_chain
+                try:
+                    imported = import_chain(uploaded, difficulty=view['difficulty'])
+                except ValueError as e:
+                    st.error(f"Import failed: {e}")
+                else:
+                    # Built off to the side, then swapped in for every session at once
+                    engine.replace(imported)
+                    st.session_state.pop('chain_export', None)
+                    st.session_state.pop('statement_cursors', None)
+                    st.success(f"Imported {len(imported.blockchain.chain)} blocks and "
+                               f"{len(imported.accounts)} accounts. Refresh to see them.")
     
     # Footer
     st.markdown("---")
@@ -1,8 +1,114 @@
+import hashlib, struct, time
+
+ZAKAT_ACCOUNT = "ZAKAT_FUND"
+FEE_ACCOUNT = "MINER_FEES"
+
+# Binary layout (big-endian):
+#   sender length (u16) + utf-8 | receiver length (u16) + utf-8
+#   | amount (i64) | zakat (i64) | fee (i64) | nonce (u64) | timestamp (f64)
+#   | signature length (u8) + signature
+# Amounts are integer minor units (see amounts.py). The signature covers
+# everything before it (signing_payload); unsigned transactions carry none.
+_NAME_LEN = struct.Struct(">H")
+_FIELDS = struct.Struct(">qqqQd")
+_SIG_LEN = struct.Struct(">B")
+
+
 class Transaction:
-    def __init__(self, sender, receiver, amount):
+    __slots__ = ("sender", "receiver", "amount", "zakat", "fee", "nonce", "timestamp", "_signature", "_hash")
+
+    def __init__(self, sender, receiver, amount, zakat=0, fee=0, nonce=0, timestamp=None, signature=b""):
         self.sender = sender
         self.receiver = receiver
         self.amount = amount
+        self.zakat = zakat
+        self.fee = fee
+        self.nonce = nonce
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self._signature = signature
+        self._hash = None
+
+    @property
+    def total_deducted(self):
+        """Everything leaving the sender's account"""
+        return self.amount + self.zakat + self.fee
+
+    @property
+    def signature(self):
+        return self._signature
+
+    @signature.setter
+    def signature(self, signature):
+        self._signature = signature
+        self._hash = None   # The hash covers the signature
+
+    def signing_payload(self):
+        """
+        The bytes a signature commits to: every field but the signature
+        """
+        sender = self.sender.encode()
+        receiver = self.receiver.encode()
+        return (_NAME_LEN.pack(len(sender)) + sender + _NAME_LEN.pack(len(receiver)) + receiver
+                + _FIELDS.pack(self.amount, self.zakat, self.fee, self.nonce, self.timestamp))
+
+    def serialize(self):
+        """
+        Deterministic binary encoding
+        """
+        return self.signing_payload() + _SIG_LEN.pack(len(self.signature)) + self.signature
+
+    @classmethod
+    def unpack_from(cls, data, offset=0):
+        """
+        Decode one transaction starting at `offset`; returns (tx, end offset)
+        """
+        tx = cls.__new__(cls)
+        (length,) = _NAME_LEN.unpack_from(data, offset)
+        offset += 2
+        tx.sender = str(data[offset:offset + length], "utf-8")
+        offset += length
+        (length,) = _NAME_LEN.unpack_from(data, offset)
+        offset += 2
+        tx.receiver = str(data[offset:offset + length], "utf-8")
+        offset += length
+        tx.amount, tx.zakat, tx.fee, tx.nonce, tx.timestamp = _FIELDS.unpack_from(data, offset)
+        offset += _FIELDS.size
+        (length,) = _SIG_LEN.unpack_from(data, offset)
+        offset += _SIG_LEN.size
+        tx._signature = bytes(data[offset:offset + length])
+        if len(tx._signature) != length:
+            raise ValueError("Transaction signature is truncated.")
+        tx._hash = None
+        return tx, offset + length
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls.unpack_from(data)[0]
+
+    @property
+    def hash(self):
+        """
+        SHA-256 of the serialized transaction, signature included, computed once
+        """
+        if self._hash is None:
+            self._hash = hashlib.sha256(self.serialize()).hexdigest()
+        return self._hash
+
+    def to_dict(self):
+        return {
+            'hash': self.hash,
+            'sender': self.sender,
+            'receiver': self.receiver,
+            'amount': self.amount,
+            'zakat': self.zakat,
+            'fee': self.fee,
+            'nonce': self.nonce,
+            'timestamp': self.timestamp,
+            'signature': self.signature.hex()
+        }
+
+    def __repr__(self):
+        return f"Transaction({self.sender} -> {self.receiver}: {self.amount}, zakat={self.zakat}, nonce={self.nonce})"
 
     def apply(self, accounts):
         """
@@ -12,10 +118,16 @@ class Transaction:
         if self.sender not in accounts or self.receiver not in accounts:
             raise Exception("Sender or receiver does not exist.")
 
-        if accounts[self.sender] < self.amount:
+        if accounts[self.sender] < self.total_deducted:
             raise Exception("Insufficient balance.")
 
-        accounts[self.sender] -= self.amount
+        accounts[self.sender] -= self.total_deducted
         accounts[self.receiver] += self.amount
 
-        return accounts
\ No newline at end of file
+        # Zakat and fees go to special accounts (created if they don't exist)
+        if self.zakat:
+            accounts[ZAKAT_ACCOUNT] = accounts.get(ZAKAT_ACCOUNT, 0) + self.zakat
+        if self.fee:
+            accounts[FEE_ACCOUNT] = accounts.get(FEE_ACCOUNT, 0) + self.fee
+
+        return accounts
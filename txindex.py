@@ -0,0 +1,177 @@
+import sqlite3
+from contextlib import contextmanager
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tx_locations (
+    hash     BLOB PRIMARY KEY,
+    height   INTEGER NOT NULL,
+    position INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tx_locations_by_height ON tx_locations (height);
+CREATE TABLE IF NOT EXISTS account_txs (
+    account  TEXT NOT NULL,
+    height   INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (account, height, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS account_txs_by_height ON account_txs (height);
+CREATE TABLE IF NOT EXISTS block_summaries (
+    height       INTEGER PRIMARY KEY,
+    hash         TEXT NOT NULL,
+    prev_hash    TEXT NOT NULL,
+    timestamp    REAL NOT NULL,
+    roll_no      TEXT NOT NULL,
+    transactions INTEGER NOT NULL,
+    size         INTEGER NOT NULL,   -- serialized bytes
+    volume       INTEGER NOT NULL,   -- sum of transferred amounts
+    zakat        INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class TxIndex:
+    def __init__(self, path=":memory:"):
+        """
+        Secondary index over main-chain transactions, backed by SQLite:
+        transaction hash -> (height, position) and account -> the positions
+        of every transaction it sent or received. Blocks are added as they
+        are connected and dropped on reorg, so lookups and account
+        statements cost O(results) instead of a scan of the chain.
+        The zakat pool is credited by every transaction and is not indexed.
+        A per-block summary row lets explorers page through the chain
+        without decoding blocks. Writes made inside batch() share one SQLite
+        transaction.
+        """
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(_SCHEMA)
+        self.height = self._committed_height()   # Last indexed block height
+        self._batch_depth = 0   # Open batch() blocks; writes are committed when the last one closes
+
+    @contextmanager
+    def batch(self):
+        """
+        Group every write made inside into one SQLite transaction, committed
+        on leaving, e.g. while replaying many blocks. If an exception escapes,
+        the writes are rolled back.
+        """
+        self._batch_depth += 1
+        try:
+            yield
+        except BaseException:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.db.rollback()
+                self.height = self._committed_height()
+            raise
+        self._batch_depth -= 1
+        if not self._batch_depth:
+            self.db.commit()
+
+    @contextmanager
+    def _writing(self):
+        if self._batch_depth:
+            yield
+        else:
+            with self.db:
+                yield
+
+    def _committed_height(self):
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'height'").fetchone()
+        return row[0] if row is not None else -1
+
+    def add_block(self, height, block):
+        """
+        Index the transactions of the main-chain block at `height`
+        """
+        with self._writing():
+            self.db.executemany(
+                "INSERT OR REPLACE INTO tx_locations (hash, height, position) VALUES (?, ?, ?)",
+                [(bytes.fromhex(tx.hash), height, position) for position, tx in enumerate(block.transactions)])
+            self.db.executemany(
+                "INSERT OR IGNORE INTO account_txs (account, height, position) VALUES (?, ?, ?)",
+                [(account, height, position) for position, tx in enumerate(block.transactions)
+                 for account in (tx.sender, tx.receiver)])
+            self.db.execute(
+                "INSERT OR REPLACE INTO block_summaries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (height, block.hash, block.prev_hash, block.timestamp, block.roll_no, len(block.transactions),
+                 len(block.serialize()), sum(tx.amount for tx in block.transactions),
+                 sum(tx.zakat for tx in block.transactions)))
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('height', ?)", (height,))
+        self.height = height
+
+    def truncate(self, height):
+        """
+        Forget every block above `height`, e.g. before a reorg replaces them
+        """
+        if height >= self.height:
+            return
+        with self._writing():
+            self.db.execute("DELETE FROM tx_locations WHERE height > ?", (height,))
+            self.db.execute("DELETE FROM account_txs WHERE height > ?", (height,))
+            self.db.execute("DELETE FROM block_summaries WHERE height > ?", (height,))
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('height', ?)", (height,))
+        self.height = height
+
+    def catch_up(self, chain):
+        """
+        Bring the index in line with `chain` after reopening: drop heights
+        the chain no longer has and index blocks it never saw
+        """
+        self.truncate(len(chain) - 1)
+        for height in range(self.height + 1, len(chain)):
+            self.add_block(height, chain[height])
+
+    # ----------------------------------------------------------------- queries
+
+    def locate(self, tx_hash):
+        """
+        (height, position) of a confirmed transaction, or None
+        """
+        try:
+            key = bytes.fromhex(tx_hash)
+        except ValueError:
+            return None
+        return self.db.execute(
+            "SELECT height, position FROM tx_locations WHERE hash = ?", (key,)).fetchone()
+
+    def history(self, account, limit=50, before=None):
+        """
+        Up to `limit` (height, position) pairs for `account`, newest first.
+        Pass the last pair of a page as `before` to get the next one.
+        """
+        if before is None:
+            return self.db.execute(
+                "SELECT height, position FROM account_txs WHERE account = ? "
+                "ORDER BY height DESC, position DESC LIMIT ?", (account, limit)).fetchall()
+        return self.db.execute(
+            "SELECT height, position FROM account_txs WHERE account = ? AND (height, position) < (?, ?) "
+            "ORDER BY height DESC, position DESC LIMIT ?", (account, before[0], before[1], limit)).fetchall()
+
+    def block_summaries(self, first, last):
+        """
+        Summary rows for heights first..last (inclusive), newest first:
+        (height, hash, prev_hash, timestamp, roll_no, transactions, size, volume, zakat)
+        """
+        return self.db.execute(
+            "SELECT * FROM block_summaries WHERE height BETWEEN ? AND ? ORDER BY height DESC",
+            (first, last)).fetchall()
+
+    def close(self):
+        self.db.close()
+
+
+def resolve(chain, locations):
+    """
+    (height, position, transaction) for each location, decoding every
+    block at most once
+    """
+    block, height = None, None
+    for location in locations:
+        if location[0] != height:
+            height = location[0]
+            block = chain[height]
+        yield height, location[1], block.transactions[location[1]]
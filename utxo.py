@@ -0,0 +1,519 @@
+"""
+UTXO ledger library: coins instead of account balances.
+
+Every transaction output becomes an unspent coin addressed by its outpoint
+(transaction hash, output index). A coin transaction names the exact coins
+it spends, so whether it is valid depends only on those coins. Transactions
+with disjoint inputs can therefore be checked in parallel, where the
+account model has to apply one transfer after another.
+
+Coins live in an on-disk open-addressing hash table (UTXOTable) behind a
+write-back cache (UTXOSet). Memory use is bounded by the cache size rather
+than the number of coins.
+
+This is a building block, not a mode of BlockchainSystem: the CLI, API,
+p2p node, chain files and web app all use account balances. Spends are
+authorized by the owner's account name only, with no signature check, and
+undo data lives in memory, so a reopened ledger cannot roll blocks back.
+"""
+import hashlib, json, mmap, os, struct, time
+from collections import OrderedDict
+from amounts import calculate_zakat
+from transaction import ZAKAT_ACCOUNT, FEE_ACCOUNT
+
+# Outpoint: transaction hash (32 bytes) + output index (u32)
+_OUTPOINT = struct.Struct(">32sI")
+# Table slot: state (u8) | outpoint (36 bytes) | owner id (20 bytes) | amount (i64)
+_SLOT = struct.Struct(">B36s20sq")
+_TABLE_HEADER = struct.Struct(">8sQQQ")   # magic, capacity, live slots, tombstones
+_TABLE_MAGIC = b"UTXOTAB1"
+_EMPTY, _USED, _DELETED = 0, 1, 2
+_GOLDEN = 0x9E3779B97F4A7C15
+_NAME_LEN = struct.Struct(">H")
+_COUNT = struct.Struct(">H")
+_AMOUNT = struct.Struct(">q")
+_TAIL = struct.Struct(">qqd")   # zakat, fee, timestamp
+
+
+def outpoint(tx_hash, index):
+    """36-byte key of output `index` of the transaction with hex hash `tx_hash`"""
+    return _OUTPOINT.pack(bytes.fromhex(tx_hash), index)
+
+
+def owner_id(account):
+    """Fixed-size id an account's coins are stored under"""
+    return hashlib.sha256(account.encode()).digest()[:20]
+
+
+def _check_coins(tx, coins):
+    """
+    Check one transaction given the coins its inputs name (None where a
+    coin is missing or spent). Pure, so it can run on a worker process.
+    """
+    if not tx.inputs:
+        raise Exception("Transaction spends no coins.")
+    sender = owner_id(tx.sender)
+    total = 0
+    for coin in coins:
+        if coin is None:
+            raise Exception("Transaction spends a missing or spent coin.")
+        if coin[0] != sender:
+            raise Exception(f"Coin is not owned by '{tx.sender}'.")
+        total += coin[1]
+    if any(amount <= 0 for _, amount in tx.outputs) or tx.zakat < 0 or tx.fee < 0:
+        raise Exception("Output amounts must be positive.")
+    paid = sum(amount for account, amount in tx.outputs if account != tx.sender)
+    if tx.zakat != calculate_zakat(paid):
+        raise Exception("Zakat does not match the amount paid out.")
+    if total != sum(amount for _, amount in tx.outputs) + tx.zakat + tx.fee:
+        raise Exception("Inputs and outputs do not balance.")
+
+
+def _check_chunk(items):
+    """
+    Pool task: (position, error) of the first bad (position, transaction,
+    coins) in `items`, or None
+    """
+    for position, tx, coins in items:
+        try:
+            _check_coins(tx, coins)
+        except Exception as e:
+            return position, str(e)
+    return None
+
+
+class UTXOTable:
+    def __init__(self, path=None, capacity=1 << 16):
+        """
+        Fixed-slot hash table with linear probing, memory-mapped from `path`
+        (anonymous memory if None). It doubles once 70% of slots are taken.
+        """
+        self.path = path
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                magic, capacity, _, _ = _TABLE_HEADER.unpack(f.read(_TABLE_HEADER.size))
+            if magic != _TABLE_MAGIC:
+                raise Exception(f"{path} is not a UTXO table.")
+            self._open(capacity, create=False)
+        else:
+            self._open(capacity, create=True)
+
+    def _open(self, capacity, create):
+        size = _TABLE_HEADER.size + capacity * _SLOT.size
+        if self.path:
+            if create:
+                with open(self.path, "wb") as f:
+                    f.truncate(size)
+            self._file = open(self.path, "r+b")
+            self._map = mmap.mmap(self._file.fileno(), size)
+        else:
+            self._file = None
+            self._map = mmap.mmap(-1, size)
+        if create:
+            _TABLE_HEADER.pack_into(self._map, 0, _TABLE_MAGIC, capacity, 0, 0)
+        _, self.capacity, self.count, self.tombstones = _TABLE_HEADER.unpack_from(self._map, 0)
+        self._mask = capacity - 1
+
+    def _slot(self, key):
+        """Index of the slot holding `key`, or of the first free slot on its probe path"""
+        (prefix,) = struct.unpack_from(">Q", key, 0)
+        (index,) = struct.unpack_from(">I", key, 32)
+        slot = (prefix ^ (index * _GOLDEN)) & self._mask
+        free = None
+        view = self._map
+        while True:
+            offset = _TABLE_HEADER.size + slot * _SLOT.size
+            state = view[offset]
+            if state == _EMPTY:
+                return (slot if free is None else free), False
+            if state == _DELETED:
+                if free is None:
+                    free = slot
+            elif view[offset + 1:offset + 37] == key:
+                return slot, True
+            slot = (slot + 1) & self._mask
+
+    def get(self, key):
+        """(owner id, amount) of an unspent outpoint, or None"""
+        slot, found = self._slot(key)
+        if not found:
+            return None
+        _, _, owner, amount = _SLOT.unpack_from(self._map, _TABLE_HEADER.size + slot * _SLOT.size)
+        return owner, amount
+
+    def put(self, key, owner, amount):
+        if (self.count + self.tombstones + 1) * 10 > self.capacity * 7:
+            # Double when genuinely full; otherwise rehashing just clears tombstones
+            self._resize(self.capacity * 2 if (self.count + 1) * 2 > self.capacity else self.capacity)
+        slot, found = self._slot(key)
+        offset = _TABLE_HEADER.size + slot * _SLOT.size
+        if not found:
+            if self._map[offset] == _DELETED:
+                self.tombstones -= 1
+            self.count += 1
+        _SLOT.pack_into(self._map, offset, _USED, key, owner, amount)
+
+    def delete(self, key):
+        slot, found = self._slot(key)
+        if found:
+            self._map[_TABLE_HEADER.size + slot * _SLOT.size] = _DELETED
+            self.count -= 1
+            self.tombstones += 1
+        return found
+
+    def __len__(self):
+        return self.count
+
+    def items(self):
+        """Every (outpoint, owner id, amount), in slot order"""
+        for slot in range(self.capacity):
+            state, key, owner, amount = _SLOT.unpack_from(self._map, _TABLE_HEADER.size + slot * _SLOT.size)
+            if state == _USED:
+                yield key, owner, amount
+
+    def _resize(self, capacity):
+        """
+        Rehash into a fresh table, dropping tombstones, streaming slot by
+        slot from the old mapping; on disk the new file replaces the old one
+        """
+        self.flush()
+        old_map, old_file, old_capacity = self._map, self._file, self.capacity
+        final_path = self.path
+        if final_path:
+            self.path = final_path + ".resize"
+        self._open(capacity, create=True)
+        count = 0
+        for slot in range(old_capacity):
+            state, key, owner, amount = _SLOT.unpack_from(old_map, _TABLE_HEADER.size + slot * _SLOT.size)
+            if state == _USED:
+                new_slot, _ = self._slot(key)
+                _SLOT.pack_into(self._map, _TABLE_HEADER.size + new_slot * _SLOT.size, _USED, key, owner, amount)
+                count += 1
+        self.count = count
+        old_map.close()
+        if old_file is not None:
+            old_file.close()
+        if final_path:
+            self.close()
+            os.replace(self.path, final_path)
+            self.path = final_path
+            self._open(capacity, create=False)
+
+    def flush(self):
+        _TABLE_HEADER.pack_into(self._map, 0, _TABLE_MAGIC, self.capacity, self.count, self.tombstones)
+        if self._file is not None:
+            self._map.flush()
+
+    def close(self):
+        self.flush()
+        self._map.close()
+        if self._file is not None:
+            self._file.close()
+
+
+class UTXOSet:
+    def __init__(self, table, max_cached=100_000):
+        """
+        Write-back cache in front of a UTXOTable. Recently used coins and
+        every change since the last flush stay in memory; spends are kept
+        as None until flushed. Going past `max_cached` entries flushes the
+        dirty ones and evicts the least recently used.
+        """
+        self.table = table
+        self.max_cached = max_cached
+        self._cache = OrderedDict()   # outpoint -> (owner id, amount), or None once spent
+        self._dirty = set()
+        self.hits = 0
+        self.misses = 0
+
+    def peek(self, key):
+        """Read without touching the cache order or counters, e.g. to check a block"""
+        if key in self._cache:
+            return self._cache[key]
+        return self.table.get(key)
+
+    def get(self, key):
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return self._cache[key]
+        self.misses += 1
+        coin = self.table.get(key)
+        if coin is not None:
+            self._store(key, coin)
+        return coin
+
+    def add(self, key, owner, amount):
+        self._store(key, (owner, amount))
+        self._dirty.add(key)
+
+    def spend(self, key):
+        """Mark a coin spent; returns it, or None if it was not unspent"""
+        coin = self.get(key)
+        if coin is not None:
+            self._store(key, None)
+            self._dirty.add(key)
+        return coin
+
+    def _store(self, key, value):
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.max_cached:
+            self.flush()
+            while len(self._cache) > self.max_cached // 2:
+                self._cache.popitem(last=False)
+
+    def flush(self):
+        """Write every dirty entry through to the table"""
+        for key in self._dirty:
+            coin = self._cache[key]
+            if coin is None:
+                self.table.delete(key)
+            else:
+                self.table.put(key, *coin)
+        self._dirty.clear()
+        self.table.flush()
+
+    def __len__(self):
+        """Unspent coins, counting changes not yet flushed"""
+        pending = 0
+        for key in self._dirty:
+            stored = self.table.get(key) is not None
+            pending += (self._cache[key] is not None) - stored
+        return len(self.table) + pending
+
+
+class CoinTransaction:
+    __slots__ = ("sender", "inputs", "outputs", "zakat", "fee", "timestamp", "_hash")
+
+    def __init__(self, sender, inputs, outputs, zakat=0, fee=0, timestamp=None):
+        """
+        Spend `inputs` (outpoints, all owned by `sender`) into `outputs`,
+        a list of (account, amount). Zakat and fee become extra outputs to
+        ZAKAT_FUND and MINER_FEES at the end of the output list.
+        """
+        self.sender = sender
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.zakat = zakat
+        self.fee = fee
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self._hash = None
+
+    def serialize(self):
+        sender = self.sender.encode()
+        parts = [_NAME_LEN.pack(len(sender)), sender, _COUNT.pack(len(self.inputs))]
+        parts.extend(self.inputs)
+        parts.append(_COUNT.pack(len(self.outputs)))
+        for account, amount in self.outputs:
+            name = account.encode()
+            parts += [_NAME_LEN.pack(len(name)), name, _AMOUNT.pack(amount)]
+        parts.append(_TAIL.pack(self.zakat, self.fee, self.timestamp))
+        return b"".join(parts)
+
+    @classmethod
+    def unpack_from(cls, data, offset=0):
+        tx = cls.__new__(cls)
+        (length,) = _NAME_LEN.unpack_from(data, offset)
+        offset += _NAME_LEN.size
+        tx.sender = str(data[offset:offset + length], "utf-8")
+        offset += length
+        (count,) = _COUNT.unpack_from(data, offset)
+        offset += _COUNT.size
+        tx.inputs = [bytes(data[i:i + _OUTPOINT.size]) for i in range(offset, offset + count * _OUTPOINT.size,
+                                                                     _OUTPOINT.size)]
+        offset += count * _OUTPOINT.size
+        (count,) = _COUNT.unpack_from(data, offset)
+        offset += _COUNT.size
+        tx.outputs = []
+        for _ in range(count):
+            (length,) = _NAME_LEN.unpack_from(data, offset)
+            offset += _NAME_LEN.size
+            account = str(data[offset:offset + length], "utf-8")
+            offset += length
+            (amount,) = _AMOUNT.unpack_from(data, offset)
+            offset += _AMOUNT.size
+            tx.outputs.append((account, amount))
+        tx.zakat, tx.fee, tx.timestamp = _TAIL.unpack_from(data, offset)
+        tx._hash = None
+        return tx, offset + _TAIL.size
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls.unpack_from(data)[0]
+
+    @property
+    def hash(self):
+        if self._hash is None:
+            self._hash = hashlib.sha256(self.serialize()).hexdigest()
+        return self._hash
+
+    def created(self):
+        """(outpoint, account, amount) for every coin this transaction creates"""
+        outputs = self.outputs + [(ZAKAT_ACCOUNT, self.zakat), (FEE_ACCOUNT, self.fee)]
+        return [(outpoint(self.hash, index), account, amount)
+                for index, (account, amount) in enumerate(outputs) if amount > 0]
+
+    def to_dict(self):
+        return {
+            'hash': self.hash,
+            'sender': self.sender,
+            'inputs': [f"{key[:32].hex()}:{_OUTPOINT.unpack(key)[1]}" for key in self.inputs],
+            'outputs': [{'account': account, 'amount': amount} for account, amount in self.outputs],
+            'zakat': self.zakat,
+            'fee': self.fee,
+            'timestamp': self.timestamp
+        }
+
+    def __repr__(self):
+        return f"CoinTransaction({self.sender}: {len(self.inputs)} in -> {self.outputs}, zakat={self.zakat})"
+
+
+class UTXOLedger:
+    def __init__(self, directory=None, max_cached=100_000, workers=4, chunk_size=256, parallel_threshold=1024):
+        """
+        Coin ledger persisted in `directory` (in memory if None): the UTXO
+        table plus a small JSON file of per-account balances and the mint
+        counter. Undo data for the last `max_undo` blocks is kept in memory
+        only; after reopening, earlier blocks cannot be rolled back.
+        Blocks of at least `parallel_threshold` transactions are checked on
+        `workers` processes.
+        """
+        self.directory = directory
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.coins = UTXOSet(UTXOTable(os.path.join(directory, "utxo.dat") if directory else None), max_cached)
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.parallel_threshold = parallel_threshold
+        self.balances = {}   # account -> total of its unspent coins
+        self.mints = 0       # Coins minted so far, which makes each mint outpoint unique
+        self.max_undo = 1000
+        self._undo = OrderedDict()   # height -> (spent coins, created outpoints, balance changes)
+        meta = self._meta_path()
+        if meta and os.path.exists(meta):
+            with open(meta) as f:
+                saved = json.load(f)
+            self.balances, self.mints = saved["balances"], saved["mints"]
+
+    def _meta_path(self):
+        return os.path.join(self.directory, "utxo-meta.json") if self.directory else None
+
+    def mint(self, account, amount):
+        """Create a new coin for `account`; returns its outpoint"""
+        if not isinstance(amount, int) or amount <= 0:
+            raise Exception("Minted amount must be a positive integer of minor units.")
+        key = _OUTPOINT.pack(hashlib.sha256(f"mint:{self.mints}:{account}".encode()).digest(), 0)
+        self.mints += 1
+        self.coins.add(key, owner_id(account), amount)
+        self.balances[account] = self.balances.get(account, 0) + amount
+        return key
+
+    def transfer(self, sender, coins, receiver, amount, fee=0):
+        """
+        Build a transaction paying `amount` to `receiver` from the outpoints
+        in `coins`, with zakat and change back to the sender
+        """
+        zakat = calculate_zakat(amount)
+        total = 0
+        for key in coins:
+            coin = self.coins.get(key)
+            if coin is None:
+                raise Exception("Coin is already spent or does not exist.")
+            total += coin[1]
+        change = total - amount - zakat - fee
+        if change < 0:
+            raise Exception("Insufficient coins.")
+        outputs = [(receiver, amount)] + ([(sender, change)] if change else [])
+        return CoinTransaction(sender, coins, outputs, zakat=zakat, fee=fee)
+
+    # -------------------------------------------------------------- checking
+
+    def check_block(self, transactions):
+        """
+        Raise unless the transactions form a valid block. One pass over
+        the inputs in block order finds double spends and resolves coins
+        created earlier in the block; a coin created by a later transaction
+        is not available yet. Each transaction is then checked on its own
+        against the coins it names, in chunks on a process pool once the
+        block has `parallel_threshold` transactions. The error reported is
+        that of the first bad transaction in block order.
+        """
+        spent = set()
+        created = {}   # Coins made by the transactions before the current one
+        funded = {}    # Input -> coin created earlier in this block
+        for tx in transactions:
+            for key in tx.inputs:
+                if key in spent:
+                    raise Exception("Coin spent twice in one block.")
+                spent.add(key)
+                if key in created:
+                    funded[key] = created[key]
+            for key, account, amount in tx.created():
+                created[key] = (owner_id(account), amount)
+
+        items = [(position, tx, [funded.get(key) or self.coins.peek(key) for key in tx.inputs])
+                 for position, tx in enumerate(transactions)]
+        chunks = [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+        if self.workers == 1 or len(items) < self.parallel_threshold:
+            results = map(_check_chunk, chunks)
+        else:
+            import multiprocessing
+            with multiprocessing.Pool(self.workers) as pool:
+                results = pool.map(_check_chunk, chunks)
+        failures = [failure for failure in results if failure is not None]
+        if failures:
+            raise Exception(min(failures)[1])
+
+    # ------------------------------------------------------------- applying
+
+    def apply_block(self, transactions, height):
+        """Spend and create the block's coins, keeping undo data for `height`"""
+        spent, made, changes = [], [], {}
+        for tx in transactions:
+            for key in tx.inputs:
+                coin = self.coins.spend(key)
+                if coin is None:
+                    raise Exception("Transaction spends a missing or spent coin.")
+                owner, amount = coin
+                spent.append((key, owner, amount))
+                changes[tx.sender] = changes.get(tx.sender, 0) - amount
+            for key, account, amount in tx.created():
+                self.coins.add(key, owner_id(account), amount)
+                made.append(key)
+                changes[account] = changes.get(account, 0) + amount
+        for account, change in changes.items():
+            self.balances[account] = self.balances.get(account, 0) + change
+        self._undo[height] = (spent, made, changes)
+        while len(self._undo) > self.max_undo:
+            self._undo.popitem(last=False)
+
+    def connect_block(self, block, height):
+        """Check then apply a block; raises, leaving the coins untouched, if it is invalid"""
+        self.check_block(block.transactions)
+        self.apply_block(block.transactions, height)
+
+    def rollback(self, height):
+        """Undo the block applied at `height` (the most recent one)"""
+        spent, made, changes = self._undo.pop(height)
+        for key in made:
+            self.coins.spend(key)
+        for key, owner, amount in spent:
+            self.coins.add(key, owner, amount)
+        for account, change in changes.items():
+            self.balances[account] -= change
+            if not self.balances[account]:
+                del self.balances[account]
+
+    def flush(self):
+        """Write cached coin changes and balances to disk"""
+        self.coins.flush()
+        meta = self._meta_path()
+        if meta:
+            with open(meta + ".tmp", "w") as f:
+                json.dump({"balances": self.balances, "mints": self.mints}, f)
+            os.replace(meta + ".tmp", meta)
+
+    def close(self):
+        self.flush()
+        self.coins.table.close()